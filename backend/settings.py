@@ -76,6 +76,11 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock when a transaction starts, so two writers
+            # never deadlock upgrading from a read lock
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
@@ -115,9 +120,22 @@ MODERATION_FILES_DIR = MEDIA_ROOT / 'moderation_files'
 POLICY_UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 MODERATION_FILES_DIR.mkdir(parents=True, exist_ok=True)
 
+# Hash uploads while they are received so moderation never re-reads them for it
+FILE_UPLOAD_HANDLERS = [
+    'moderation.uploads.HashingMemoryFileUploadHandler',
+    'moderation.uploads.HashingTemporaryFileUploadHandler',
+]
+
 # Policy store directory for Chroma
 POLICY_STORE_DIR = BASE_DIR / 'policy_store'
 POLICY_STORE_DIR.mkdir(parents=True, exist_ok=True)
+# One subdirectory per tenant under POLICY_STORE_DIR, each with a version token here
+POLICY_STORE_VERSION_DIR = BASE_DIR / 'policy_store_versions'
+# Tenants' Chroma stores each process keeps open; the least recently used is closed beyond this
+POLICY_STORE_CACHE_SIZE = int(os.environ.get('POLICY_STORE_CACHE_SIZE', '16'))
+
+# Versioned triage classifiers written by the train_triage_classifier command
+TRIAGE_MODEL_DIR = BASE_DIR / 'triage_models'
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -202,6 +220,78 @@ LOGGING = {
 
 # Moderation settings
 GROQ_API_KEY = os.environ.get('GROQ_API_KEY', '')
+
+# Chat model backend: 'groq', 'openai' (any OpenAI-compatible API at LLM_BASE_URL,
+# e.g. `python manage.py serve_fake_llm`) or 'fake' (in-process, no network)
+LLM_BACKEND = os.environ.get('LLM_BACKEND', 'groq')
+LLM_MODEL = os.environ.get('LLM_MODEL', 'llama-3.3-70b-versatile')
+LLM_BASE_URL = os.environ.get('LLM_BASE_URL', '')  # Optional for groq, required for openai
+LLM_API_KEY = os.environ.get('LLM_API_KEY', '')  # openai backend; groq uses GROQ_API_KEY
+LLM_TIMEOUT = float(os.environ.get('LLM_TIMEOUT', '60'))  # seconds
+LLM_MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES', '2'))
+# USD per million tokens, used for the cost recorded on each moderation
+# (defaults: Groq's llama-3.3-70b-versatile list price)
+LLM_PROMPT_COST_PER_MTOK = float(os.environ.get('LLM_PROMPT_COST_PER_MTOK', '0.59'))
+LLM_COMPLETION_COST_PER_MTOK = float(os.environ.get('LLM_COMPLETION_COST_PER_MTOK', '0.79'))
+
+# Latency and verdict mix of the 'fake' backend
+FAKE_LLM_LATENCY_MS = float(os.environ.get('FAKE_LLM_LATENCY_MS', '200'))
+FAKE_LLM_JITTER_MS = float(os.environ.get('FAKE_LLM_JITTER_MS', '50'))
+FAKE_LLM_VIOLATION_RATE = float(os.environ.get('FAKE_LLM_VIOLATION_RATE', '0.05'))
+FAKE_LLM_REVIEW_RATE = float(os.environ.get('FAKE_LLM_REVIEW_RATE', '0.1'))
+
 EMBEDDING_MODEL = "all-MiniLM-L12-v2"
 CHUNK_SIZE = 1000
-CHUNK_OVERLAP = 100
\ No newline at end of file
+CHUNK_OVERLAP = 100
+
+# Maximum number of chunks sent to the LLM at the same time
+MODERATION_CONCURRENCY = int(os.environ.get('MODERATION_CONCURRENCY', '4'))
+
+# Number of file chunks judged in a single LLM request (1 = one request per chunk)
+MODERATION_BATCH_SIZE = int(os.environ.get('MODERATION_BATCH_SIZE', '1'))
+# Response tokens allowed per chunk in a batched request; keep
+# MODERATION_BATCH_SIZE times this within the model's output limit
+LLM_BATCH_TOKENS_PER_CHUNK = int(os.environ.get('LLM_BATCH_TOKENS_PER_CHUNK', '128'))
+
+# Verdict cache: reuse LLM verdicts for chunk text already judged against the same policy store
+MODERATION_CACHE_ENABLED = os.environ.get('MODERATION_CACHE_ENABLED', 'True') == 'True'
+MODERATION_CACHE_MAX_ENTRIES = int(os.environ.get('MODERATION_CACHE_MAX_ENTRIES', '50000'))
+MODERATION_CACHE_TTL = int(os.environ.get('MODERATION_CACHE_TTL', str(30 * 24 * 3600)))  # seconds
+# Minimum seconds between a process's eviction passes over one tenant's cache entries
+MODERATION_CACHE_EVICT_INTERVAL = int(os.environ.get('MODERATION_CACHE_EVICT_INTERVAL', '300'))
+# Most verdict cache entries deleted by one eviction pass, to keep it short
+MODERATION_CACHE_EVICT_BATCH_SIZE = int(os.environ.get('MODERATION_CACHE_EVICT_BATCH_SIZE', '1000'))
+
+# Chunks whose closest policy snippet has a relevance score (0-1) below this value are
+# marked OK without calling the LLM. Unset disables the gate; see calibrate_relevance_threshold.
+MODERATION_RELEVANCE_THRESHOLD = (
+    float(os.environ['MODERATION_RELEVANCE_THRESHOLD'])
+    if os.environ.get('MODERATION_RELEVANCE_THRESHOLD') else None
+)
+
+# Local triage classifier: chunks it considers compliant with at least this probability skip the LLM
+MODERATION_TRIAGE_ENABLED = os.environ.get('MODERATION_TRIAGE_ENABLED', 'False') == 'True'
+MODERATION_TRIAGE_OK_THRESHOLD = float(os.environ.get('MODERATION_TRIAGE_OK_THRESHOLD', '0.9'))
+
+# Policy ingestion: processes used to parse and split policy PDFs, and chunks embedded per batch
+POLICY_INGEST_WORKERS = int(os.environ.get('POLICY_INGEST_WORKERS', str(os.cpu_count() or 1)))
+POLICY_EMBED_BATCH_SIZE = int(os.environ.get('POLICY_EMBED_BATCH_SIZE', '64'))
+
+# Chunks read, embedded and retrieved together while a file is streamed through moderation
+MODERATION_WINDOW_SIZE = int(os.environ.get('MODERATION_WINDOW_SIZE', '64'))
+
+# SQLite connection tuning (WAL is always enabled); see moderation/db.py
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '10000'))
+SQLITE_CACHE_SIZE_KB = int(os.environ.get('SQLITE_CACHE_SIZE_KB', '20000'))
+SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', str(128 * 1024 * 1024)))
+
+# Bearer token required to scrape /metrics; without one, only direct
+# requests from METRICS_ALLOWED_NETWORKS are served
+METRICS_AUTH_TOKEN = os.environ.get('METRICS_AUTH_TOKEN', '')
+METRICS_ALLOWED_NETWORKS = os.environ.get(
+    'METRICS_ALLOWED_NETWORKS', '127.0.0.0/8,::1/128,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16'
+)
+
+# Directory where every web and worker process saves its metrics, so /metrics
+# reports all of them; empty serves each process's own. Clear it on restart.
+METRICS_SHARED_DIR = os.environ.get('METRICS_SHARED_DIR', '')
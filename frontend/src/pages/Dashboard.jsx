@@ -14,6 +14,8 @@ const Dashboard = () => {
   const [moderateFile, setModerateFile] = useState(null);
   const [policies, setPolicies] = useState([]);
   const [history, setHistory] = useState([]);
+  const [historyNext, setHistoryNext] = useState(null);
+  const [historyLoading, setHistoryLoading] = useState(false);
   const [policyLoading, setPolicyLoading] = useState(false);
   const [moderationLoading, setModerationLoading] = useState(false);
   const [selectedResult, setSelectedResult] = useState(null);
@@ -28,37 +30,17 @@ const Dashboard = () => {
     filesApproved: 0,      // verdict = 'clean'
     filesViolation: 0,     // verdict = 'violation_found'
     filesManualReview: 0,  // verdict = 'needs_review'
+    pendingReview: 0,      // final_verdict = 'pending'
   });
 
   useEffect(() => {
     loadPolicies();
-    loadHistory();
+    loadStats();
   }, []);
 
   useEffect(() => {
-    if (history.length > 0) {
-      // Count files by their AI verdict (3 states)
-      const approved = history.filter(h => h.verdict === 'clean').length;
-      const violation = history.filter(h => h.verdict === 'violation_found').length;
-      const manualReview = history.filter(h => h.verdict === 'needs_review').length;
-      
-      setStats({
-        totalPolicies: policies.length,
-        totalFiles: history.length,
-        filesApproved: approved,
-        filesViolation: violation,
-        filesManualReview: manualReview,
-      });
-    } else {
-      setStats({
-        totalPolicies: policies.length,
-        totalFiles: 0,
-        filesApproved: 0,
-        filesViolation: 0,
-        filesManualReview: 0,
-      });
-    }
-  }, [history, policies]);
+    loadHistory();
+  }, [filterStatus]);
 
   const showMessage = (type, text) => {
     setMessage({ type, text });
@@ -74,15 +56,48 @@ const Dashboard = () => {
     }
   };
 
+  // Totals come from server-side counters, not from the loaded history pages
+  const loadStats = async () => {
+    try {
+      const response = await moderationAPI.getStats();
+      setStats({
+        totalPolicies: response.data.policy_count,
+        totalFiles: response.data.total_results,
+        filesApproved: response.data.clean_results,
+        filesViolation: response.data.violation_results,
+        filesManualReview: response.data.review_results,
+        pendingReview: response.data.awaiting_decision_results,
+      });
+    } catch (error) {
+      console.error('Failed to load stats');
+    }
+  };
+
   const loadHistory = async () => {
+    const params = filterStatus === 'all' ? {} : { final_verdict: filterStatus };
     try {
-      const response = await moderationAPI.getHistory();
+      const response = await moderationAPI.getHistory(params);
       setHistory(response.data.results);
+      setHistoryNext(response.data.next);
     } catch (error) {
       console.error('Failed to load history');
     }
   };
 
+  const loadMoreHistory = async () => {
+    if (!historyNext) return;
+    setHistoryLoading(true);
+    try {
+      const response = await moderationAPI.getHistory({}, historyNext);
+      setHistory(prev => [...prev, ...response.data.results]);
+      setHistoryNext(response.data.next);
+    } catch (error) {
+      console.error('Failed to load more history');
+    } finally {
+      setHistoryLoading(false);
+    }
+  };
+
   const handlePolicyUpload = async (e) => {
     e.preventDefault();
     if (!policyFiles.length) {
@@ -97,6 +112,7 @@ const Dashboard = () => {
       setPolicyFiles([]);
       e.target.reset();
       loadPolicies();
+      loadStats();
     } catch (error) {
       showMessage('error', error.response?.data?.error || 'Failed to upload policies');
     } finally {
@@ -120,6 +136,7 @@ const Dashboard = () => {
       setModerateFile(null);
       e.target.reset();
       loadHistory();
+      loadStats();
       setActiveView('submissions');
     } catch (error) {
       showMessage('error', error.response?.data?.error || 'Failed to moderate file');
@@ -137,6 +154,7 @@ const Dashboard = () => {
       showMessage('success', 'All policies cleared');
       setPolicies([]);
       loadPolicies();
+      loadStats();
     } catch (error) {
       showMessage('error', 'Failed to clear policies');
     } finally {
@@ -149,6 +167,7 @@ const Dashboard = () => {
       await moderationAPI.updateFinalVerdict(resultId, verdict);
       showMessage('success', `Verdict updated: ${verdict === 'approved' ? 'Approved' : 'Rejected'}`);
       loadHistory();
+      loadStats();
       if (selectedResult && selectedResult.id === resultId) {
         setSelectedResult(null);
       }
@@ -170,14 +189,10 @@ const Dashboard = () => {
     }
   };
 
-  const filteredHistory = history.filter(item => {
-    const matchesSearch = item.filename.toLowerCase().includes(searchQuery.toLowerCase());
-    const matchesFilter = filterStatus === 'all' || 
-      (filterStatus === 'pending' && item.final_verdict === 'pending') ||
-      (filterStatus === 'approved' && item.final_verdict === 'approved') ||
-      (filterStatus === 'rejected' && item.final_verdict === 'rejected');
-    return matchesSearch && matchesFilter;
-  });
+  // The decision filter is applied by the server; search covers the loaded pages
+  const filteredHistory = history.filter(item =>
+    item.filename.toLowerCase().includes(searchQuery.toLowerCase())
+  );
 
   return (
     <div style={styles.container}>
@@ -598,6 +613,17 @@ const Dashboard = () => {
                     </tbody>
                   </table>
                 )}
+                {historyNext && (
+                  <div style={styles.loadMoreRow}>
+                    <button
+                      onClick={loadMoreHistory}
+                      style={styles.actionButton}
+                      disabled={historyLoading}
+                    >
+                      {historyLoading ? 'Loading...' : 'Load more'}
+                    </button>
+                  </div>
+                )}
               </div>
             </div>
           )}
@@ -93,7 +93,11 @@ export const moderationAPI = {
       },
     });
   },
-  getHistory: () => api.get('/api/moderation/history/'),
+  // Pass the `next` URL of a previous page as `cursorUrl` to load the page after it
+  getHistory: (params = {}, cursorUrl = null) => (
+    cursorUrl ? api.get(cursorUrl) : api.get('/api/moderation/history/', { params })
+  ),
+  getStats: () => api.get('/api/moderation/stats/'),
   getDetail: (id) => api.get(`/api/moderation/history/${id}/`),
   updateFinalVerdict: (id, verdict) => api.post(`/api/moderation/history/${id}/verdict/`, {
     final_verdict: verdict,
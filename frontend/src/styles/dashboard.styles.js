@@ -482,6 +482,12 @@ export const dashboardStyles = {
     color: '#374151',
     cursor: 'pointer',
   },
+  loadMoreRow: {
+    display: 'flex',
+    justifyContent: 'center',
+    padding: '1rem',
+    borderTop: '1px solid #e5e7eb',
+  },
   emptyState: {
     textAlign: 'center',
     padding: '4rem 2rem',
@@ -1,10 +1,11 @@
 from django.contrib import admin
-from .models import PolicyDocument, ModerationResult, ViolationDetail
+from .models import PolicyDocument, ModerationResult, ViolationDetail, VerdictCacheEntry, ModerationStats
+from .stats import recompute_stats
 
 @admin.register(PolicyDocument)
 class PolicyDocumentAdmin(admin.ModelAdmin):
-    list_display = ['filename', 'user', 'file_size', 'uploaded_at']
-    list_filter = ['uploaded_at', 'user']
+    list_display = ['filename', 'user', 'file_size', 'status', 'uploaded_at']
+    list_filter = ['status', 'uploaded_at', 'user']
     search_fields = ['filename', 'user__username']
     readonly_fields = ['uploaded_at']
     ordering = ['-uploaded_at']
@@ -18,12 +19,17 @@ class ViolationDetailInline(admin.TabularInline):
 @admin.register(ModerationResult)
 class ModerationResultAdmin(admin.ModelAdmin):
     list_display = [
-        'filename', 'user', 'verdict', 'total_chunks',
-        'violation_chunks', 'review_chunks', 'allowed_chunks', 'created_at'
+        'filename', 'user', 'verdict', 'status', 'total_chunks',
+        'violation_chunks', 'review_chunks', 'allowed_chunks', 'prompt_tokens',
+        'completion_tokens', 'llm_latency_p95', 'llm_cost', 'processing_seconds', 'created_at'
+    ]
+    list_filter = ['verdict', 'status', 'created_at', 'user']
+    search_fields = ['filename', 'file_sha256', 'user__username']
+    readonly_fields = [
+        'created_at', 'started_at', 'completed_at', 'prompt_tokens', 'completion_tokens',
+        'tokens_estimated', 'llm_calls', 'llm_seconds', 'llm_latency_p50', 'llm_latency_p95',
+        'llm_latency_p99', 'llm_cost', 'processing_seconds'
     ]
-    list_filter = ['verdict', 'created_at', 'user']
-    search_fields = ['filename', 'user__username']
-    readonly_fields = ['created_at']
     ordering = ['-created_at']
     inlines = [ViolationDetailInline]
 
@@ -32,4 +38,28 @@ class ViolationDetailAdmin(admin.ModelAdmin):
     list_display = ['chunk_id', 'verdict', 'moderation_result']
     list_filter = ['verdict']
     search_fields = ['chunk_id', 'chunk_text', 'explanation']
-    readonly_fields = ['moderation_result', 'chunk_id', 'chunk_text', 'verdict', 'explanation', 'sources']
\ No newline at end of file
+    readonly_fields = ['moderation_result', 'chunk_id', 'chunk_text', 'verdict', 'explanation', 'sources']
+
+@admin.register(VerdictCacheEntry)
+class VerdictCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ['key', 'tenant', 'verdict', 'policy_version', 'hits', 'created_at', 'last_used_at']
+    list_filter = ['verdict', 'tenant']
+    search_fields = ['key', 'explanation']
+    readonly_fields = ['key', 'tenant', 'policy_version', 'verdict', 'explanation', 'sources', 'hits', 'created_at', 'last_used_at']
+    ordering = ['-last_used_at']
+
+@admin.register(ModerationStats)
+class ModerationStatsAdmin(admin.ModelAdmin):
+    list_display = [
+        'user', 'total_results', 'clean_results', 'violation_results', 'review_results',
+        'awaiting_decision_results', 'policy_count', 'updated_at'
+    ]
+    search_fields = ['user__username']
+    readonly_fields = [field.name for field in ModerationStats._meta.fields]
+    actions = ['recompute']
+    
+    @admin.action(description='Recompute from moderation history')
+    def recompute(self, request, queryset):
+        for stats in queryset:
+            recompute_stats(stats.user_id)
+        self.message_user(request, f"Recomputed stats for {queryset.count()} user(s)")
@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.conf import settings
+from django.db.backends.signals import connection_created
 
 
 class ModerationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'moderation'
+
+    def ready(self):
+        from .db import configure_sqlite_connection
+        connection_created.connect(configure_sqlite_connection, dispatch_uid='moderation_sqlite_pragmas')
+
+        if settings.METRICS_SHARED_DIR:
+            from . import metrics
+            metrics.enable_shared_metrics(settings.METRICS_SHARED_DIR)
@@ -0,0 +1,25 @@
+"""
+Per-connection database tuning
+"""
+from django.conf import settings
+
+def configure_sqlite_connection(sender, connection, **kwargs):
+    """
+    Tune every new SQLite connection for concurrent web and worker writes.
+    
+    WAL lets readers run while a writer commits, the busy timeout makes a
+    writer wait for the lock instead of failing with "database is locked",
+    and synchronous=NORMAL is durable under WAL while fsyncing only at
+    checkpoints. Connected to connection_created in ModerationConfig.ready.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute(f'PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}')
+        # Negative cache_size is in KiB rather than pages
+        cursor.execute(f'PRAGMA cache_size=-{int(settings.SQLITE_CACHE_SIZE_KB)}')
+        cursor.execute(f'PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}')
+        cursor.execute('PRAGMA temp_store=MEMORY')
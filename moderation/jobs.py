@@ -0,0 +1,581 @@
+"""
+Background moderation and policy ingestion jobs backed by the
+ModerationResult and PolicyDocument tables
+"""
+import time
+from datetime import timedelta
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from .models import ModerationResult, ViolationDetail, PolicyDocument
+from . import metrics
+from .modules.policy_store import (
+    build_or_update_policy_store,
+    delete_policy_documents,
+    get_policy_store_version,
+    open_policy_store,
+    tenant_for_user
+)
+from .modules.llm import PROMPT_VERSION
+from .modules.moderation_engine import default_moderation_settings, moderate_file_against_policy
+from .stats import CHUNK_COUNTERS, refresh_policy_count, result_stats_snapshot, update_result_stats
+from .uploads import uploaded_file_sha256
+import logging
+
+logger = logging.getLogger('moderation')
+
+# Minimum seconds between progress writes for a running job; each write
+# also refreshes its heartbeat
+PROGRESS_UPDATE_INTERVAL = 1.0
+
+# Seconds between stale job checks in a running worker
+REQUEUE_CHECK_INTERVAL = 60.0
+
+# ViolationDetail rows per INSERT when recording a result
+VIOLATION_BATCH_SIZE = 500
+
+def record_moderation_result(moderation_result: ModerationResult, data: Dict) -> ModerationResult:
+    """
+    Store the output of moderate_file_against_policy on a ModerationResult
+    and create its ViolationDetail records.
+    
+    Args:
+        moderation_result: Saved ModerationResult to complete
+        data: Dictionary returned by moderate_file_against_policy
+    
+    Returns:
+        The updated ModerationResult
+    """
+    moderation_result.verdict = data['verdict']
+    moderation_result.total_chunks = data['total_chunks']
+    moderation_result.processed_chunks = data.get('evaluated_chunks', data['total_chunks'])
+    moderation_result.progress_total = data['total_chunks']
+    moderation_result.allowed_chunks = data['allowed_chunks']
+    moderation_result.review_chunks = data['review_chunks']
+    moderation_result.violation_chunks = data['violation_chunks']
+    moderation_result.evaluated_chunks = data.get('evaluated_chunks', 0)
+    moderation_result.cache_hits = data.get('cache_hits', 0)
+    moderation_result.cache_misses = data.get('cache_misses', 0)
+    moderation_result.llm_chunks = data.get('llm_chunks', 0)
+    moderation_result.auto_cleared_chunks = data.get('auto_cleared_chunks', 0)
+    moderation_result.auto_cleared_chunk_ids = data.get('auto_cleared_chunk_ids', [])
+    moderation_result.triaged_chunks = data.get('triaged_chunks', 0)
+    moderation_result.triaged_chunk_ids = data.get('triaged_chunk_ids', [])
+    moderation_result.policy_version = data.get('policy_version', '')
+    moderation_result.prompt_version = data.get('prompt_version', '')
+    moderation_result.triage_model_version = data.get('triage_model_version', '')
+    moderation_result.relevance_threshold = data.get('relevance_threshold')
+    moderation_result.prompt_tokens = data.get('prompt_tokens', 0)
+    moderation_result.completion_tokens = data.get('completion_tokens', 0)
+    moderation_result.tokens_estimated = data.get('tokens_estimated', False)
+    moderation_result.llm_calls = data.get('llm_calls', 0)
+    moderation_result.llm_seconds = data.get('llm_seconds', 0)
+    moderation_result.llm_latency_p50 = data.get('llm_latency_p50')
+    moderation_result.llm_latency_p95 = data.get('llm_latency_p95')
+    moderation_result.llm_latency_p99 = data.get('llm_latency_p99')
+    moderation_result.llm_cost = Decimal(str(round(data.get('llm_cost', 0), 6)))
+    moderation_result.processing_seconds = data.get('processing_seconds')
+    moderation_result.status = 'completed'
+    moderation_result.completed_at = timezone.now()
+    
+    # One transaction so a crash never leaves a result with half its details
+    started = time.perf_counter()
+    with transaction.atomic():
+        before = result_stats_snapshot(moderation_result)
+        moderation_result.save()
+        update_result_stats(moderation_result, before)
+        ViolationDetail.objects.bulk_create(
+            (
+                ViolationDetail(
+                    moderation_result=moderation_result,
+                    chunk_id=violation['chunk_id'],
+                    chunk_text=violation['chunk_text'],
+                    verdict=violation['verdict'],
+                    explanation=violation['explanation'],
+                    sources=violation['sources']
+                )
+                for violation in data['violations']
+            ),
+            batch_size=VIOLATION_BATCH_SIZE
+        )
+    metrics.observe_stage('persist', time.perf_counter() - started, len(data['violations']))
+    metrics.RESULTS.inc(outcome='completed')
+    
+    return moderation_result
+
+def record_moderation_failure(moderation_result: ModerationResult, error: Exception) -> ModerationResult:
+    """
+    Mark a ModerationResult as failed.
+    """
+    moderation_result.status = 'failed'
+    moderation_result.verdict = 'error'
+    moderation_result.error_message = str(error)
+    moderation_result.completed_at = timezone.now()
+    with transaction.atomic():
+        before = result_stats_snapshot(moderation_result)
+        if before is not None:
+            # Counts set by a record_moderation_result that rolled back were never stored
+            for field in CHUNK_COUNTERS:
+                setattr(moderation_result, field, before[field])
+        moderation_result.save(update_fields=['status', 'verdict', 'error_message', 'completed_at'])
+        update_result_stats(moderation_result, before)
+    metrics.RESULTS.inc(outcome='failed')
+    return moderation_result
+
+def create_moderation_result(user, uploaded_file, mode: str = 'full', status: str = 'running') -> ModerationResult:
+    """
+    Save an uploaded file to its final storage location and create its
+    ModerationResult. This is the only time the file is written; moderation
+    reads it back from moderation_result.file.path.
+    
+    Args:
+        user: User who submitted the file
+        uploaded_file: Django UploadedFile
+        mode: 'full' or 'fail_fast'
+        status: 'running' to moderate right away, 'queued' for a worker
+    
+    Returns:
+        The saved ModerationResult
+    """
+    started = timezone.now() if status == 'running' else None
+    with transaction.atomic():
+        moderation_result = ModerationResult.objects.create(
+            user=user,
+            file=uploaded_file,
+            filename=uploaded_file.name,
+            file_sha256=uploaded_file_sha256(uploaded_file),
+            file_size=uploaded_file.size,
+            mode=mode,
+            status=status,
+            started_at=started,
+            heartbeat_at=started
+        )
+        update_result_stats(moderation_result)
+    return moderation_result
+
+def find_duplicate_result(user, uploaded_file, mode: str = 'full') -> Optional[ModerationResult]:
+    """
+    Find a completed result for a byte-identical file that the user already
+    had moderated against the current version of their policy store, with
+    the same prompt, triage classifier and relevance threshold.
+    
+    Args:
+        user: User who submitted the file
+        uploaded_file: Django UploadedFile
+        mode: 'full' or 'fail_fast'
+    
+    Returns:
+        The most recent matching ModerationResult, or None
+    """
+    policy_version = get_policy_store_version(tenant_for_user(user))
+    if not policy_version:
+        return None
+    
+    return (
+        ModerationResult.objects
+        .filter(
+            user=user,
+            file_sha256=uploaded_file_sha256(uploaded_file),
+            mode=mode,
+            policy_version=policy_version,
+            prompt_version=PROMPT_VERSION,
+            status='completed',
+            **default_moderation_settings()
+        )
+        .order_by('-created_at', '-id')
+        .first()
+    )
+
+def clone_moderation_result(source: ModerationResult, uploaded_file) -> ModerationResult:
+    """
+    Record a resubmission as a new ModerationResult that copies the verdict
+    and violations of an earlier result and shares its stored file.
+    
+    Args:
+        source: Completed result for the same file content
+        uploaded_file: Django UploadedFile that was resubmitted
+    
+    Returns:
+        The new, completed ModerationResult
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        clone = ModerationResult.objects.create(
+            user=source.user,
+            file=source.file.name,
+            filename=uploaded_file.name,
+            file_sha256=source.file_sha256,
+            file_size=source.file_size,
+            mode=source.mode,
+            verdict=source.verdict,
+            total_chunks=source.total_chunks,
+            processed_chunks=source.processed_chunks,
+            allowed_chunks=source.allowed_chunks,
+            review_chunks=source.review_chunks,
+            violation_chunks=source.violation_chunks,
+            evaluated_chunks=source.evaluated_chunks,
+            auto_cleared_chunks=source.auto_cleared_chunks,
+            auto_cleared_chunk_ids=source.auto_cleared_chunk_ids,
+            triaged_chunks=source.triaged_chunks,
+            triaged_chunk_ids=source.triaged_chunk_ids,
+            policy_version=source.policy_version,
+            prompt_version=source.prompt_version,
+            triage_model_version=source.triage_model_version,
+            relevance_threshold=source.relevance_threshold,
+            duplicate_of_id=source.duplicate_of_id or source.pk,
+            status='completed',
+            started_at=now,
+            completed_at=now
+        )
+        update_result_stats(clone)
+        ViolationDetail.objects.bulk_create([
+            ViolationDetail(
+                moderation_result=clone,
+                chunk_id=violation.chunk_id,
+                chunk_text=violation.chunk_text,
+                verdict=violation.verdict,
+                explanation=violation.explanation,
+                sources=violation.sources
+            )
+            for violation in source.violations.all()
+        ], batch_size=VIOLATION_BATCH_SIZE)
+    
+    metrics.RESULTS.inc(outcome='duplicate')
+    logger.info(f"Reused moderation result {source.pk} for duplicate upload {uploaded_file.name}")
+    return clone
+
+def enqueue_moderation_job(user, uploaded_file, mode: str = 'full') -> ModerationResult:
+    """
+    Save an uploaded file and queue it for moderation by a worker.
+    
+    Args:
+        user: User who submitted the file
+        uploaded_file: Django UploadedFile
+        mode: 'full' or 'fail_fast'
+    
+    Returns:
+        The queued ModerationResult
+    """
+    job = create_moderation_result(user, uploaded_file, mode=mode, status='queued')
+    logger.info(f"Queued moderation job {job.pk} for {uploaded_file.name}")
+    return job
+
+def claim_next_job() -> Optional[ModerationResult]:
+    """
+    Atomically claim the oldest queued job.
+    
+    The status check in the UPDATE makes sure only one worker wins a job,
+    even when several workers poll the table at the same time.
+    
+    Returns:
+        The claimed ModerationResult, or None if the queue is empty
+    """
+    candidates = (
+        ModerationResult.objects
+        .filter(status='queued')
+        .order_by('created_at', 'id')
+        .values_list('id', flat=True)[:10]
+    )
+    for pk in candidates:
+        now = timezone.now()
+        claimed = ModerationResult.objects.filter(pk=pk, status='queued').update(
+            status='running',
+            started_at=now,
+            heartbeat_at=now
+        )
+        if claimed:
+            return ModerationResult.objects.select_related('user').get(pk=pk)
+    return None
+
+def progress_reporter(moderation_result: ModerationResult) -> Callable[[int, int], None]:
+    """
+    Build a progress callback that stores a running result's progress and
+    refreshes its heartbeat, at most every PROGRESS_UPDATE_INTERVAL seconds.
+    
+    Args:
+        moderation_result: ModerationResult in 'running' state
+    
+    Returns:
+        Callback taking (done, total) chunk counts
+    """
+    last_update = [0.0]
+    
+    def report_progress(done: int, total: int):
+        now = time.monotonic()
+        if done < total and now - last_update[0] < PROGRESS_UPDATE_INTERVAL:
+            return
+        last_update[0] = now
+        # total_chunks is left to record_moderation_result, which counts it in the user's stats
+        ModerationResult.objects.filter(pk=moderation_result.pk).update(
+            processed_chunks=done,
+            progress_total=total,
+            heartbeat_at=timezone.now()
+        )
+    
+    return report_progress
+
+def requeue_stale_jobs(max_age: timedelta) -> int:
+    """
+    Put back jobs left 'running' by a worker that died, and policy documents
+    left 'processing' (ingestion is incremental, so a retry is cheap).
+    
+    A running job's heartbeat is refreshed with every progress update, so
+    only work that stopped making progress is requeued, however long it
+    has been running. Workers call this at startup and then every
+    REQUEUE_CHECK_INTERVAL seconds (see run_worker).
+    
+    Args:
+        max_age: Jobs and policy uploads without a heartbeat for longer
+            than this are requeued
+    
+    Returns:
+        Number of jobs and policy documents requeued
+    """
+    cutoff = timezone.now() - max_age
+    # Work claimed before heartbeats were recorded falls back to its claim
+    # or upload time
+    count = ModerationResult.objects.filter(
+        Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff),
+        status='running'
+    ).update(status='queued', started_at=None, heartbeat_at=None, processed_chunks=0, progress_total=0)
+    count += PolicyDocument.objects.filter(
+        Q(heartbeat_at__lt=cutoff)
+        | Q(heartbeat_at__isnull=True, started_at__lt=cutoff)
+        | Q(heartbeat_at__isnull=True, started_at__isnull=True, uploaded_at__lt=cutoff),
+        status='processing'
+    ).exclude(ingest_batch='').update(status='queued', started_at=None, heartbeat_at=None)
+    if count:
+        logger.warning(f"Requeued {count} stale moderation job(s)")
+    return count
+
+def policy_document_key(pk: int) -> str:
+    """
+    Key the chunks of the PolicyDocument with this pk are tagged with in
+    its owner's policy store.
+    
+    Keys are per upload rather than per filename, so two rows never share
+    chunks and deleting one cannot remove another's vectors.
+    """
+    return f"policy-document:{pk}"
+
+def ingest_policy_documents(
+    user,
+    policy_docs: List[PolicyDocument],
+    progress_callback: Optional[Callable[[str, int, int], None]] = None
+) -> Dict:
+    """
+    Add saved policy documents to their owner's policy store, record their
+    vector IDs and mark them ready.
+    
+    A document replaces every earlier upload of the user with the same
+    filename, whatever its state: those rows are deleted together with
+    their chunks, and a replaced file with identical content is taken over
+    without re-embedding. If a document was itself replaced or deleted
+    while it was being ingested, its chunks are deleted again.
+    
+    Args:
+        user: Owner of the documents
+        policy_docs: Saved PolicyDocument records
+        progress_callback: Passed to build_or_update_policy_store
+    
+    Returns:
+        Ingestion report from build_or_update_policy_store
+    """
+    tenant = tenant_for_user(user)
+    earlier = (
+        PolicyDocument.objects
+        .filter(user=user, filename__in={policy_doc.filename for policy_doc in policy_docs})
+        .exclude(pk__in=[policy_doc.pk for policy_doc in policy_docs])
+        .values_list('pk', 'filename')
+    )
+    earlier_keys = {}
+    for pk, filename in earlier:
+        earlier_keys.setdefault(filename, []).append(policy_document_key(pk))
+    
+    keys = [policy_document_key(policy_doc.pk) for policy_doc in policy_docs]
+    report = build_or_update_policy_store(
+        tenant,
+        [policy_doc.file.path for policy_doc in policy_docs],
+        document_keys=keys,
+        # Chunks ingested before documents were keyed by upload carry the filename
+        replaced_keys=[earlier_keys.get(policy_doc.filename, []) + [policy_doc.filename]
+                       for policy_doc in policy_docs],
+        progress_callback=progress_callback
+    )
+    
+    try:
+        stale_keys = []
+        with transaction.atomic():
+            for policy_doc, key, document in zip(policy_docs, keys, report['documents']):
+                policy_doc.vector_ids = document['chunk_ids']
+                policy_doc.status = 'ready'
+                policy_doc.error_message = ''
+                if not PolicyDocument.objects.filter(pk=policy_doc.pk).update(
+                    vector_ids=policy_doc.vector_ids, status='ready', error_message=''
+                ):
+                    logger.info(f"{policy_doc.filename} was replaced or deleted during ingestion")
+                    stale_keys.append(key)
+            
+            superseded = Q(pk__in=[])
+            for policy_doc in policy_docs:
+                superseded |= Q(filename=policy_doc.filename, pk__lt=policy_doc.pk)
+            superseded = PolicyDocument.objects.filter(superseded, user=user)
+            stale_keys.extend(policy_document_key(pk) for pk in superseded.values_list('pk', flat=True))
+            superseded.delete()
+    except Exception:
+        # Don't leave chunks behind for rows that are not marked ready
+        delete_policy_documents(tenant, keys)
+        raise
+    
+    # Chunks a superseded upload wrote after this one started are removed here
+    delete_policy_documents(tenant, stale_keys)
+    refresh_policy_count(user.pk)
+    
+    return report
+
+def claim_policy_batch() -> List[PolicyDocument]:
+    """
+    Atomically claim the oldest queued policy upload.
+    
+    All documents of one upload are claimed with a single conditional
+    UPDATE, so the whole upload goes to one worker and is ingested as one
+    pipeline run.
+    
+    Returns:
+        The claimed PolicyDocuments, or an empty list if none are queued
+    """
+    candidates = (
+        PolicyDocument.objects
+        .filter(status='queued')
+        .exclude(ingest_batch='')
+        .order_by('uploaded_at', 'id')
+        .values_list('ingest_batch', flat=True)[:10]
+    )
+    for batch in dict.fromkeys(candidates):
+        now = timezone.now()
+        claimed = PolicyDocument.objects.filter(ingest_batch=batch, status='queued').update(
+            status='processing',
+            started_at=now,
+            heartbeat_at=now
+        )
+        if claimed:
+            return list(
+                PolicyDocument.objects
+                .filter(ingest_batch=batch, status='processing')
+                .select_related('user')
+            )
+    return []
+
+def run_policy_ingestion(policy_docs: List[PolicyDocument]) -> List[PolicyDocument]:
+    """
+    Ingest a claimed policy upload and store the outcome.
+    
+    Args:
+        policy_docs: PolicyDocuments of one upload in 'processing' state
+    
+    Returns:
+        The ready or failed PolicyDocuments
+    """
+    user = policy_docs[0].user
+    logger.info(f"Ingesting {len(policy_docs)} policy file(s) for {user.username}")
+    last_update = [0.0]
+    
+    def report_progress(stage: str, done: int, total: int):
+        now = time.monotonic()
+        if done < total and now - last_update[0] < PROGRESS_UPDATE_INTERVAL:
+            return
+        last_update[0] = now
+        logger.info(f"Policy ingestion for {user.username}: {stage} {done}/{total}")
+        PolicyDocument.objects.filter(
+            pk__in=[policy_doc.pk for policy_doc in policy_docs],
+            status='processing'
+        ).update(heartbeat_at=timezone.now())
+    
+    try:
+        report = ingest_policy_documents(user, policy_docs, progress_callback=report_progress)
+        logger.info(f"Policy ingestion for {user.username} complete: "
+                    f"{report['new_chunks']} new, {report['unchanged_chunks']} unchanged, "
+                    f"{report['removed_chunks']} removed chunks")
+    except Exception as e:
+        logger.exception(f"Policy ingestion for {user.username} failed")
+        for policy_doc in policy_docs:
+            policy_doc.status = 'failed'
+            policy_doc.error_message = str(e)
+        PolicyDocument.objects.bulk_update(policy_docs, ['status', 'error_message'])
+    
+    return policy_docs
+
+def run_moderation_job(job: ModerationResult) -> ModerationResult:
+    """
+    Run moderation for a claimed job and store the outcome.
+    
+    Args:
+        job: ModerationResult in 'running' state
+    
+    Returns:
+        The completed or failed ModerationResult
+    """
+    logger.info(f"Running moderation job {job.pk} for {job.filename}")
+    started = time.perf_counter()
+    try:
+        tenant = tenant_for_user(job.user)
+        with open_policy_store(tenant) as policy_store:
+            data = moderate_file_against_policy(
+                policy_store,
+                job.file.path,
+                job.filename,
+                tenant,
+                k=3,
+                fail_fast=job.mode == 'fail_fast',
+                progress_callback=progress_reporter(job)
+            )
+        record_moderation_result(job, data)
+        metrics.observe_file('worker', started)
+        logger.info(f"Moderation job {job.pk} complete: verdict={job.verdict}")
+    except Exception as e:
+        logger.exception(f"Moderation job {job.pk} failed")
+        record_moderation_failure(job, e)
+    
+    return job
+
+def run_worker(poll_interval: float = 2.0, once: bool = False,
+               requeue_after: Optional[timedelta] = None) -> int:
+    """
+    Drain the policy ingestion and moderation queues, polling for new jobs
+    when they are empty. Policy uploads go first since moderation depends
+    on them.
+    
+    Args:
+        poll_interval: Seconds to sleep when no job is queued
+        once: Exit as soon as the queue is empty instead of polling
+        requeue_after: If set, requeue jobs and policy uploads without a
+            heartbeat for longer than this every REQUEUE_CHECK_INTERVAL
+            seconds, so work held by a dead worker is picked up without a
+            restart
+    
+    Returns:
+        Number of jobs processed
+    """
+    processed = 0
+    last_requeue = time.monotonic()
+    while True:
+        if requeue_after is not None and time.monotonic() - last_requeue >= REQUEUE_CHECK_INTERVAL:
+            requeue_stale_jobs(requeue_after)
+            last_requeue = time.monotonic()
+        
+        policy_docs = claim_policy_batch()
+        if policy_docs:
+            run_policy_ingestion(policy_docs)
+            processed += 1
+            continue
+        
+        job = claim_next_job()
+        if job is None:
+            if once:
+                return processed
+            time.sleep(poll_interval)
+            continue
+        run_moderation_job(job)
+        processed += 1
@@ -0,0 +1,243 @@
+"""
+Benchmark the moderation engine offline with generated PDFs and a fake LLM
+"""
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import threading
+import time
+from collections import defaultdict
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from langchain_community.vectorstores import Chroma
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from moderation.modules.fake_llm import FakeModerationChatModel
+from moderation.modules.moderation_engine import moderate_file_against_policy
+from moderation.modules.policy_store import load_and_split_policy, registry
+from moderation.tests.fixtures import document_pages, policy_pages, write_fixture_pdf
+import logging
+
+logger = logging.getLogger('moderation')
+
+STAGES = ['load', 'split', 'cache', 'embed', 'triage', 'retrieve', 'llm', 'parse']
+
+class _StageRecorder:
+    """
+    Thread-safe collector for the engine's stage_callback.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.items = defaultdict(int)
+    
+    def __call__(self, stage: str, seconds: float, items: int):
+        with self._lock:
+            self.samples[stage].append(seconds)
+            self.items[stage] += items
+    
+    def summary(self):
+        stages = {}
+        for stage in STAGES + sorted(set(self.samples) - set(STAGES)):
+            samples = self.samples.get(stage)
+            if not samples:
+                continue
+            seconds = np.array(samples)
+            total = float(seconds.sum())
+            stages[stage] = {
+                'calls': len(samples),
+                'items': self.items[stage],
+                'total_seconds': round(total, 6),
+                'mean_ms': round(float(seconds.mean()) * 1000, 3),
+                'p50_ms': round(float(np.percentile(seconds, 50)) * 1000, 3),
+                'p95_ms': round(float(np.percentile(seconds, 95)) * 1000, 3),
+                'p99_ms': round(float(np.percentile(seconds, 99)) * 1000, 3),
+                'items_per_sec': round(self.items[stage] / total, 2) if total else None,
+            }
+        return stages
+
+def _git_commit():
+    try:
+        completed = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, timeout=5
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return completed.stdout.strip() or None
+
+class Command(BaseCommand):
+    help = (
+        "Run the moderation engine on generated PDFs with a deterministic fake LLM and "
+        "report chunks/sec and p50/p95/p99 latency per stage (load, split, embed, "
+        "retrieve, llm, parse). No network access or database writes are needed."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=20, help='Pages in the moderated fixture PDF (default: 20)')
+        parser.add_argument('--words-per-page', type=int, default=400, help='Words per fixture page (default: 400)')
+        parser.add_argument('--policy-pages', type=int, default=4, help='Pages in the fixture policy PDF (default: 4)')
+        parser.add_argument('--runs', type=int, default=3, help='Measured runs (default: 3)')
+        parser.add_argument('--warmup', type=int, default=1, help='Unmeasured runs before measuring (default: 1)')
+        parser.add_argument('--llm-latency-ms', type=float, default=200.0, help='Mean fake LLM latency per call (default: 200)')
+        parser.add_argument('--llm-jitter-ms', type=float, default=50.0, help='Fake LLM latency spread, +/- (default: 50)')
+        parser.add_argument('--violation-rate', type=float, default=0.05, help='Share of chunks judged VIOLATION (default: 0.05)')
+        parser.add_argument('--review-rate', type=float, default=0.10, help='Share of chunks judged REVIEW (default: 0.10)')
+        parser.add_argument('--concurrency', type=int, default=None, help='LLM concurrency (default: MODERATION_CONCURRENCY)')
+        parser.add_argument('--batch-size', type=int, default=None, help='Chunks per LLM call (default: MODERATION_BATCH_SIZE)')
+        parser.add_argument(
+            '--relevance-threshold', type=float, default=None,
+            help='Relevance gate threshold (default: MODERATION_RELEVANCE_THRESHOLD)'
+        )
+        parser.add_argument('--k', type=int, default=3, help='Retrieval depth (default: 3)')
+        parser.add_argument(
+            '--embeddings', choices=['model', 'fake'], default='model',
+            help="'model' uses EMBEDDING_MODEL (must be available locally when offline); "
+                 "'fake' uses deterministic hash embeddings"
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Seed for fixtures and fake verdicts (default: 0)')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+        parser.add_argument('--json', action='store_true', help='Print only the JSON report')
+    
+    def handle(self, *args, **options):
+        if options['runs'] < 1:
+            raise CommandError('--runs must be at least 1')
+        if not 0 <= options['violation_rate'] + options['review_rate'] <= 1:
+            raise CommandError('--violation-rate plus --review-rate must be between 0 and 1')
+        
+        concurrency = options['concurrency'] or settings.MODERATION_CONCURRENCY
+        batch_size = options['batch_size'] or settings.MODERATION_BATCH_SIZE
+        relevance_threshold = options['relevance_threshold']
+        if relevance_threshold is None:
+            relevance_threshold = settings.MODERATION_RELEVANCE_THRESHOLD
+        
+        if options['embeddings'] == 'fake':
+            embeddings = DeterministicFakeEmbedding(size=384)
+        else:
+            embeddings = registry.get_embeddings()
+        
+        llm = FakeModerationChatModel(
+            latency=options['llm_latency_ms'] / 1000,
+            jitter=options['llm_jitter_ms'] / 1000,
+            violation_rate=options['violation_rate'],
+            review_rate=options['review_rate'],
+            seed=options['seed']
+        )
+        
+        with tempfile.TemporaryDirectory(prefix='moderation-benchmark-') as workdir:
+            policy_path = os.path.join(workdir, 'policy.pdf')
+            write_fixture_pdf(policy_path, policy_pages(options['policy_pages'], options['seed']))
+            policy_chunks = load_and_split_policy(policy_path)
+            policy_store = Chroma.from_documents(
+                policy_chunks, embeddings, persist_directory=os.path.join(workdir, 'store')
+            )
+            
+            document_path = os.path.join(workdir, 'document.pdf')
+            write_fixture_pdf(
+                document_path,
+                document_pages(options['pages'], options['words_per_page'], options['seed'])
+            )
+            
+            def run(stage_callback=None):
+                return moderate_file_against_policy(
+                    policy_store,
+                    document_path,
+                    'benchmark.pdf',
+                    'benchmark',
+                    k=options['k'],
+                    concurrency=concurrency,
+                    batch_size=batch_size,
+                    use_cache=False,
+                    relevance_threshold=relevance_threshold,
+                    use_triage=False,
+                    llm=llm,
+                    stage_callback=stage_callback
+                )
+            
+            for _ in range(options['warmup']):
+                run()
+            
+            recorder = _StageRecorder()
+            durations = []
+            for _ in range(options['runs']):
+                started = time.perf_counter()
+                result = run(recorder)
+                durations.append(time.perf_counter() - started)
+            
+            document_bytes = os.path.getsize(document_path)
+        
+        durations = np.array(durations)
+        total_chunks = result['total_chunks']
+        report = {
+            'benchmark': 'moderation_engine',
+            'timestamp': timezone.now().isoformat(),
+            'git_commit': _git_commit(),
+            'python': platform.python_version(),
+            'cpu_count': os.cpu_count(),
+            'config': {
+                'pages': options['pages'],
+                'words_per_page': options['words_per_page'],
+                'policy_pages': options['policy_pages'],
+                'runs': options['runs'],
+                'warmup': options['warmup'],
+                'llm_latency_ms': options['llm_latency_ms'],
+                'llm_jitter_ms': options['llm_jitter_ms'],
+                'violation_rate': options['violation_rate'],
+                'review_rate': options['review_rate'],
+                'concurrency': concurrency,
+                'batch_size': batch_size,
+                'window_size': settings.MODERATION_WINDOW_SIZE,
+                'relevance_threshold': relevance_threshold,
+                'k': options['k'],
+                'embeddings': options['embeddings'],
+                'chunk_size': settings.CHUNK_SIZE,
+                'chunk_overlap': settings.CHUNK_OVERLAP,
+                'seed': options['seed'],
+            },
+            'fixture': {
+                'document_bytes': document_bytes,
+                'document_chunks': total_chunks,
+                'policy_chunks': len(policy_chunks),
+            },
+            'end_to_end': {
+                'chunks_per_sec': round(total_chunks * len(durations) / float(durations.sum()), 2),
+                'mean_seconds': round(float(durations.mean()), 4),
+                'p50_seconds': round(float(np.percentile(durations, 50)), 4),
+                'p95_seconds': round(float(np.percentile(durations, 95)), 4),
+                'p99_seconds': round(float(np.percentile(durations, 99)), 4),
+            },
+            'stages': recorder.summary(),
+            'verdict': {
+                'verdict': result['verdict'],
+                'allowed_chunks': result['allowed_chunks'],
+                'review_chunks': result['review_chunks'],
+                'violation_chunks': result['violation_chunks'],
+                'auto_cleared_chunks': result['auto_cleared_chunks'],
+            },
+        }
+        
+        report_json = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(report_json + '\n')
+        if options['json']:
+            self.stdout.write(report_json)
+            return
+        
+        end_to_end = report['end_to_end']
+        self.stdout.write(
+            f"{total_chunks} chunks x {options['runs']} runs: {end_to_end['chunks_per_sec']} chunks/sec, "
+            f"p50 {end_to_end['p50_seconds']}s / p95 {end_to_end['p95_seconds']}s per file"
+        )
+        self.stdout.write(f"{'stage':<10}{'calls':>8}{'items':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'items/s':>12}")
+        for stage, stats in report['stages'].items():
+            self.stdout.write(
+                f"{stage:<10}{stats['calls']:>8}{stats['items']:>8}{stats['p50_ms']:>10}"
+                f"{stats['p95_ms']:>10}{stats['p99_ms']:>10}{str(stats['items_per_sec']):>12}"
+            )
+        if options['output']:
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
@@ -0,0 +1,153 @@
+"""
+Suggest a MODERATION_RELEVANCE_THRESHOLD by replaying past moderation results
+"""
+import os
+from collections import defaultdict
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from moderation.models import ModerationResult, ViolationDetail
+from moderation.modules.policy_store import acquire_policy_store, release_policy_store, tenant_for_user
+from moderation.modules.moderation_engine import load_pdf_to_chunks, retrieve_policy_context
+import logging
+
+logger = logging.getLogger('moderation')
+
+def _top_scores(policy_store, chunks, k):
+    matches = retrieve_policy_context(policy_store, chunks, k)
+    return np.array([m[0][1] if m else 0.0 for m in matches])
+
+class _TenantStores:
+    """
+    Load each user's policy store at most once and hold it until close().
+    """
+    
+    def __init__(self):
+        self._stores = {}
+    
+    def get(self, user):
+        if user.pk not in self._stores:
+            tenant = tenant_for_user(user)
+            try:
+                self._stores[user.pk] = (tenant, acquire_policy_store(tenant))
+            except FileNotFoundError:
+                self._stores[user.pk] = (tenant, None)
+        return self._stores[user.pk][1]
+    
+    def close(self):
+        for tenant, store in self._stores.values():
+            if store is not None:
+                release_policy_store(tenant, store)
+        self._stores.clear()
+
+class Command(BaseCommand):
+    help = (
+        'Suggest a relevance threshold for the LLM fast path. Flagged chunks from past '
+        'results must stay above it; stored files are replayed to estimate how many '
+        'chunks would skip the LLM.'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target-recall', type=float, default=0.99,
+            help='Fraction of past flagged chunks that must still reach the LLM (default: 0.99)'
+        )
+        parser.add_argument(
+            '--margin', type=float, default=0.02,
+            help='Safety margin subtracted from the suggested threshold (default: 0.02)'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=5000,
+            help='Maximum number of recent flagged chunks to replay (default: 5000)'
+        )
+        parser.add_argument(
+            '--sample-files', type=int, default=20,
+            help='Number of recent moderated files to re-chunk for the skip-rate estimate (default: 20)'
+        )
+        parser.add_argument('--k', type=int, default=3, help='Retrieval depth (default: 3)')
+    
+    def handle(self, *args, **options):
+        target_recall = options['target_recall']
+        if not 0 < target_recall <= 1:
+            raise CommandError('--target-recall must be in (0, 1]')
+        
+        stores = _TenantStores()
+        try:
+            # Chunks the LLM flagged and a reviewer did not overturn, replayed
+            # against the policy store of the user who submitted them
+            flagged = (
+                ViolationDetail.objects
+                .filter(verdict__in=['violation', 'review'])
+                .exclude(moderation_result__final_verdict='approved')
+                # Duplicate resubmissions repeat their source's chunks
+                .filter(moderation_result__duplicate_of__isnull=True)
+                .select_related('moderation_result__user')
+                .order_by('-id')[:options['limit']]
+            )
+            flagged_by_user = defaultdict(list)
+            for detail in flagged:
+                if detail.chunk_text.strip():
+                    flagged_by_user[detail.moderation_result.user].append(
+                        {'page_content': detail.chunk_text, 'metadata': {}}
+                    )
+            
+            scores = []
+            for user, flagged_chunks in flagged_by_user.items():
+                policy_store = stores.get(user)
+                if policy_store is not None:
+                    scores.extend(_top_scores(policy_store, flagged_chunks, options['k']))
+            if not scores:
+                raise CommandError('No flagged chunks in the moderation history to calibrate against')
+            scores = np.array(scores)
+            
+            # Not clamped at 0: relevance scores can be negative, and a clamped
+            # threshold would sit above every flagged chunk
+            quantile = float(np.quantile(scores, 1 - target_recall))
+            threshold = round(quantile - options['margin'], 4)
+            
+            self.stdout.write(f"Replayed {len(scores)} flagged chunks")
+            self.stdout.write(
+                f"Top-1 relevance of flagged chunks: min={scores.min():.4f} "
+                f"p5={np.quantile(scores, 0.05):.4f} median={np.median(scores):.4f}"
+            )
+            self.stdout.write(
+                f"Flagged chunks below threshold: {int((scores < threshold).sum())}/{len(scores)}"
+            )
+            
+            # Estimate how much traffic the gate would skip on real uploads
+            sample_scores = []
+            results = (
+                ModerationResult.objects
+                .filter(status='completed', duplicate_of__isnull=True)
+                .exclude(file='')
+                .select_related('user')
+                .order_by('-created_at')[:options['sample_files']]
+            )
+            for result in results:
+                policy_store = stores.get(result.user)
+                if policy_store is None:
+                    continue
+                try:
+                    path = result.file.path
+                except (ValueError, NotImplementedError):
+                    continue
+                if not os.path.exists(path):
+                    continue
+                try:
+                    chunks = [c for c in load_pdf_to_chunks(path, result.filename) if c['page_content'].strip()]
+                except Exception as e:
+                    logger.warning(f"Skipping {result.filename}: {e}")
+                    continue
+                if chunks:
+                    sample_scores.extend(_top_scores(policy_store, chunks, options['k']))
+            
+            if sample_scores:
+                sample_scores = np.array(sample_scores)
+                skipped = float((sample_scores < threshold).mean())
+                self.stdout.write(
+                    f"Replayed {len(sample_scores)} chunks from stored files: "
+                    f"{skipped:.1%} would skip the LLM"
+                )
+        finally:
+            stores.close()
+        
+        self.stdout.write(self.style.SUCCESS(f"Suggested MODERATION_RELEVANCE_THRESHOLD={threshold}"))
@@ -0,0 +1,83 @@
+"""
+Re-ingest uploaded policy documents into their owners' policy stores
+"""
+import os
+import shutil
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from moderation.jobs import policy_document_key
+from moderation.models import PolicyDocument
+from moderation.modules.policy_store import build_or_update_policy_store, tenant_for_user
+import logging
+
+logger = logging.getLogger('moderation')
+
+class Command(BaseCommand):
+    help = (
+        "Ingest every user's policy documents into that user's own policy store and "
+        "record their vector IDs. Ingestion is incremental, so documents already in "
+        "the store are skipped. Use this after upgrading from the shared policy store "
+        "or from chunks keyed by filename."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only rebuild the store of this username')
+        parser.add_argument(
+            '--remove-shared-store', action='store_true',
+            help='Delete the pre-tenant shared store files at the top of POLICY_STORE_DIR'
+        )
+    
+    def handle(self, *args, **options):
+        users = User.objects.filter(policy_documents__isnull=False).distinct()
+        if options['user']:
+            users = users.filter(username=options['user'])
+        
+        for user in users:
+            # Latest upload of each filename wins
+            documents = {}
+            for policy_doc in PolicyDocument.objects.filter(user=user).order_by('-uploaded_at'):
+                if policy_doc.filename in documents:
+                    continue
+                if not policy_doc.file or not os.path.exists(policy_doc.file.path):
+                    self.stderr.write(f"Missing file for {policy_doc.filename} ({user.username}), skipping")
+                    continue
+                documents[policy_doc.filename] = policy_doc
+            if not documents:
+                continue
+            
+            policy_docs = list(documents.values())
+            report = build_or_update_policy_store(
+                tenant_for_user(user),
+                [policy_doc.file.path for policy_doc in policy_docs],
+                document_keys=[policy_document_key(policy_doc.pk) for policy_doc in policy_docs],
+                # Take over chunks stored under the filename before documents were keyed by upload
+                replaced_keys=[[policy_doc.filename] for policy_doc in policy_docs]
+            )
+            for policy_doc, document in zip(policy_docs, report['documents']):
+                policy_doc.vector_ids = document['chunk_ids']
+            PolicyDocument.objects.bulk_update(policy_docs, ['vector_ids'])
+            # Older uploads of the same names may list the chunks that were just taken over
+            PolicyDocument.objects.filter(user=user, filename__in=documents).exclude(
+                pk__in=[policy_doc.pk for policy_doc in policy_docs]
+            ).update(vector_ids=[])
+            
+            self.stdout.write(
+                f"{user.username}: {len(policy_docs)} documents, {report['new_chunks']} new, "
+                f"{report['unchanged_chunks']} unchanged, {report['removed_chunks']} removed chunks"
+            )
+        
+        if options['remove_shared_store']:
+            tenants = {tenant_for_user(user) for user in User.objects.all()}
+            for entry in os.listdir(settings.POLICY_STORE_DIR):
+                if entry in tenants:
+                    continue
+                path = os.path.join(settings.POLICY_STORE_DIR, entry)
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+                logger.info(f"Removed shared policy store entry {entry}")
+            self.stdout.write("Removed the shared policy store")
+        
+        self.stdout.write(self.style.SUCCESS("Policy stores rebuilt"))
@@ -0,0 +1,108 @@
+"""
+Start worker processes that drain the moderation job queue
+"""
+import multiprocessing
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import connections
+from moderation import metrics
+from moderation.jobs import run_worker, requeue_stale_jobs
+import logging
+
+logger = logging.getLogger('moderation')
+
+def _start_metrics(host: str, port):
+    if port is None:
+        return
+    metrics.start_metrics_server(port, host)
+    logger.info(f"Serving worker metrics on http://{host}:{port}/metrics")
+
+def _worker_main(poll_interval: float, once: bool, requeue_after: timedelta,
+                 metrics_host: str = '127.0.0.1', metrics_port=None):
+    # Every process needs its own database connections
+    connections.close_all()
+    _start_metrics(metrics_host, metrics_port)
+    try:
+        run_worker(poll_interval=poll_interval, once=once, requeue_after=requeue_after)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Worker processes exit without running atexit handlers
+        metrics.save_shared_metrics()
+
+class Command(BaseCommand):
+    help = 'Run moderation workers that process queued moderation jobs'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Number of worker processes to start (default: 1)'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=2.0,
+            help='Seconds to wait between queue polls when idle (default: 2)'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit once the queue is empty instead of waiting for new jobs'
+        )
+        parser.add_argument(
+            '--requeue-after', type=int, default=30,
+            help='Requeue jobs and policy uploads that made no progress for this many minutes, '
+                 'at startup and every minute (default: 30)'
+        )
+        parser.add_argument(
+            '--metrics-port', type=int, default=None,
+            help='Serve Prometheus metrics on this port; worker N uses port + N (default: off)'
+        )
+        parser.add_argument(
+            '--metrics-host', default='127.0.0.1',
+            help='Interface for --metrics-port (default: 127.0.0.1)'
+        )
+    
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        poll_interval = options['poll_interval']
+        once = options['once']
+        metrics_host = options['metrics_host']
+        metrics_port = options['metrics_port']
+        
+        requeue_after = timedelta(minutes=options['requeue_after'])
+        
+        requeue_stale_jobs(requeue_after)
+        
+        self.stdout.write(f"Starting {workers} moderation worker(s)")
+        
+        if workers == 1:
+            _start_metrics(metrics_host, metrics_port)
+            try:
+                run_worker(poll_interval=poll_interval, once=once, requeue_after=requeue_after)
+            except KeyboardInterrupt:
+                pass
+            return
+        
+        # Do not share the parent's connections with forked workers
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(
+                target=_worker_main,
+                args=(
+                    poll_interval, once, requeue_after, metrics_host,
+                    None if metrics_port is None else metrics_port + i
+                ),
+                name=f'moderation-worker-{i}'
+            )
+            for i in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            self.stdout.write("Stopping moderation workers")
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.join()
@@ -0,0 +1,269 @@
+"""
+Serve the fake moderation model behind an OpenAI-compatible chat completions API
+"""
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.core.management.base import BaseCommand, CommandError
+from moderation.modules.fake_llm import FakeModerationChatModel, truncate_answer
+from moderation.modules.llm import estimate_tokens
+import logging
+
+logger = logging.getLogger('moderation')
+
+# Plain OpenAI base URL and the path the Groq client appends to its base URL
+CHAT_COMPLETIONS_PATHS = ('/v1/chat/completions', '/openai/v1/chat/completions')
+MODELS_PATHS = ('/v1/models', '/openai/v1/models')
+
+class TokenBucket:
+    """
+    Requests-per-minute limiter that allows short bursts.
+    """
+    def __init__(self, rpm: float, burst: int):
+        self.rate = rpm / 60
+        self.capacity = max(burst, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self) -> float:
+        """
+        Take one token.
+        
+        Returns:
+            0 if the request may proceed, otherwise seconds until a token is free
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+class FakeLLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+    
+    def __init__(self, address, model: FakeModerationChatModel, model_name: str, latency: float,
+                 jitter: float, limiter, error_rate: float, error_status: int, api_key: str, seed: int):
+        super().__init__(address, FakeLLMRequestHandler)
+        self.model = model
+        self.model_name = model_name
+        self.latency = latency
+        self.jitter = jitter
+        self.limiter = limiter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.api_key = api_key
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {'completed': 0, 'rate_limited': 0, 'injected_errors': 0, 'rejected': 0}
+    
+    def draw(self) -> float:
+        with self.lock:
+            return self.random.random()
+    
+    def count(self, outcome: str):
+        with self.lock:
+            self.counts[outcome] += 1
+
+def _message_text(message: dict) -> str:
+    content = message.get('content') or ''
+    if isinstance(content, list):
+        # Content parts: [{"type": "text", "text": ...}, ...]
+        return "".join(part.get('text', '') for part in content if isinstance(part, dict))
+    return str(content)
+
+class FakeLLMRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    
+    def log_message(self, format, *args):
+        logger.debug("serve_fake_llm: " + format, *args)
+    
+    def _send_json(self, status: int, body: dict, headers: dict = None):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+    
+    def _send_error(self, status: int, message: str, error_type: str, code: str = None, headers: dict = None):
+        self._send_json(
+            status,
+            {'error': {'message': message, 'type': error_type, 'param': None, 'code': code}},
+            headers
+        )
+    
+    def _authorized(self) -> bool:
+        if not self.server.api_key:
+            return True
+        if self.headers.get('Authorization', '') == f'Bearer {self.server.api_key}':
+            return True
+        self.server.count('rejected')
+        self._send_error(401, 'Invalid API key', 'invalid_request_error', 'invalid_api_key')
+        return False
+    
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        if path not in MODELS_PATHS:
+            self._send_error(404, f'Unknown path {path}', 'invalid_request_error', 'not_found')
+            return
+        if not self._authorized():
+            return
+        self._send_json(200, {
+            'object': 'list',
+            'data': [{'id': self.server.model_name, 'object': 'model', 'created': 0, 'owned_by': 'fake'}]
+        })
+    
+    def do_POST(self):
+        path = self.path.split('?', 1)[0]
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        
+        if path not in CHAT_COMPLETIONS_PATHS:
+            self._send_error(404, f'Unknown path {path}', 'invalid_request_error', 'not_found')
+            return
+        if not self._authorized():
+            return
+        
+        try:
+            body = json.loads(raw or b'{}')
+            messages = body['messages']
+            if not isinstance(messages, list) or not messages:
+                raise ValueError
+        except (ValueError, KeyError, TypeError):
+            self.server.count('rejected')
+            self._send_error(400, "Request body must be JSON with a non-empty 'messages' list",
+                             'invalid_request_error')
+            return
+        if body.get('stream'):
+            self.server.count('rejected')
+            self._send_error(400, 'Streaming is not supported by this server', 'invalid_request_error', 'stream')
+            return
+        
+        server = self.server
+        if server.limiter is not None:
+            retry_after = server.limiter.acquire()
+            if retry_after:
+                server.count('rate_limited')
+                self._send_error(
+                    429, f'Rate limit reached, please try again in {retry_after:.2f}s',
+                    'requests', 'rate_limit_exceeded',
+                    {'Retry-After': str(max(1, round(retry_after))),
+                     'retry-after-ms': str(int(retry_after * 1000))}
+                )
+                return
+        
+        delay = server.latency + server.jitter * (2 * server.draw() - 1)
+        if delay > 0:
+            time.sleep(delay)
+        
+        if server.error_rate and server.draw() < server.error_rate:
+            server.count('injected_errors')
+            self._send_error(server.error_status, 'Injected server error', 'server_error')
+            return
+        
+        prompt = "\n".join(_message_text(message) for message in messages if isinstance(message, dict))
+        user_messages = [m for m in messages if isinstance(m, dict) and m.get('role', 'user') == 'user']
+        answer = server.model.answer(_message_text(user_messages[-1]) if user_messages else prompt)
+        content = truncate_answer(answer, body.get('max_tokens'))
+        
+        prompt_tokens = estimate_tokens(prompt)
+        completion_tokens = estimate_tokens(content)
+        server.count('completed')
+        self._send_json(200, {
+            'id': f'chatcmpl-{uuid.uuid4().hex}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model') or server.model_name,
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop' if content == answer else 'length',
+                'logprobs': None,
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens,
+            },
+        })
+
+class Command(BaseCommand):
+    help = (
+        "Serve the deterministic fake moderation model over an OpenAI-compatible "
+        "/v1/chat/completions API, with tunable latency, a requests-per-minute limit "
+        "(429 + Retry-After) and injected server errors. Point the app at it with "
+        "LLM_BACKEND=openai LLM_BASE_URL=http://<host>:<port>/v1, or with "
+        "LLM_BACKEND=groq LLM_BASE_URL=http://<host>:<port>."
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1', help='Interface to bind (default: 127.0.0.1)')
+        parser.add_argument('--port', type=int, default=8090, help='Port to listen on (default: 8090)')
+        parser.add_argument('--model', default='llama-3.3-70b-versatile', help='Model id reported by the server')
+        parser.add_argument('--latency-ms', type=float, default=200.0, help='Mean latency per completion (default: 200)')
+        parser.add_argument('--jitter-ms', type=float, default=50.0, help='Latency spread, +/- (default: 50)')
+        parser.add_argument('--rpm', type=float, default=0, help='Requests per minute before answering 429 (default: unlimited)')
+        parser.add_argument('--burst', type=int, default=10, help='Requests allowed at once under --rpm (default: 10)')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Share of completions that fail (default: 0)')
+        parser.add_argument(
+            '--error-status', type=int, choices=[500, 502, 503], default=500,
+            help='HTTP status of injected failures (default: 500)'
+        )
+        parser.add_argument('--violation-rate', type=float, default=0.05, help='Share of chunks judged VIOLATION (default: 0.05)')
+        parser.add_argument('--review-rate', type=float, default=0.10, help='Share of chunks judged REVIEW (default: 0.10)')
+        parser.add_argument('--api-key', default='', help='Require this bearer token (default: accept any)')
+        parser.add_argument('--seed', type=int, default=0, help='Seed for verdicts, jitter and errors (default: 0)')
+    
+    def handle(self, *args, **options):
+        if not 0 <= options['violation_rate'] + options['review_rate'] <= 1:
+            raise CommandError('--violation-rate plus --review-rate must be between 0 and 1')
+        if not 0 <= options['error_rate'] <= 1:
+            raise CommandError('--error-rate must be between 0 and 1')
+        if options['rpm'] < 0:
+            raise CommandError('--rpm must not be negative')
+        
+        model = FakeModerationChatModel(
+            latency=0,
+            jitter=0,
+            violation_rate=options['violation_rate'],
+            review_rate=options['review_rate'],
+            seed=options['seed']
+        )
+        limiter = TokenBucket(options['rpm'], options['burst']) if options['rpm'] else None
+        
+        try:
+            server = FakeLLMServer(
+                (options['host'], options['port']),
+                model=model,
+                model_name=options['model'],
+                latency=options['latency_ms'] / 1000,
+                jitter=options['jitter_ms'] / 1000,
+                limiter=limiter,
+                error_rate=options['error_rate'],
+                error_status=options['error_status'],
+                api_key=options['api_key'],
+                seed=options['seed']
+            )
+        except OSError as e:
+            raise CommandError(f"Cannot listen on {options['host']}:{options['port']}: {e}")
+        
+        host, port = server.server_address[:2]
+        self.stdout.write(self.style.SUCCESS(f"Fake LLM listening on http://{host}:{port}/v1"))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(
+                ", ".join(f"{outcome}={count}" for outcome, count in server.counts.items())
+            )
@@ -0,0 +1,123 @@
+"""
+Train the local triage classifier from reviewed moderation history
+"""
+import os
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import train_test_split
+from moderation.models import ModerationResult, ViolationDetail
+from moderation.modules.policy_store import get_embeddings
+from moderation.modules.moderation_engine import load_pdf_to_chunks
+from moderation.modules.triage import LABEL_OK, LABEL_FLAGGED, save_triage_model
+import logging
+
+logger = logging.getLogger('moderation')
+
+class Command(BaseCommand):
+    help = (
+        'Train the triage classifier on embeddings of reviewed chunks. Flagged chunks of '
+        'rejected files are positives; flagged chunks of approved files and chunks of '
+        'approved files re-read from storage are negatives.'
+    )
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-file-chunks', type=int, default=5000,
+            help='Maximum number of negative chunks re-read from approved files (default: 5000)'
+        )
+        parser.add_argument(
+            '--min-samples', type=int, default=20,
+            help='Minimum number of examples per class (default: 20)'
+        )
+        parser.add_argument(
+            '--holdout', type=float, default=0.2,
+            help='Fraction of examples held out for evaluation (default: 0.2)'
+        )
+    
+    def handle(self, *args, **options):
+        # Duplicate resubmissions copy their source's chunks and share its file;
+        # counting them would weight a file by how often it was uploaded
+        positives = list(
+            ViolationDetail.objects
+            .filter(moderation_result__final_verdict='rejected', verdict__in=['violation', 'review'])
+            .filter(moderation_result__duplicate_of__isnull=True)
+            .values_list('chunk_text', flat=True)
+        )
+        negatives = list(
+            ViolationDetail.objects
+            .filter(moderation_result__final_verdict='approved')
+            .filter(moderation_result__duplicate_of__isnull=True)
+            .values_list('chunk_text', flat=True)
+        )
+        
+        # Every chunk of a file a reviewer approved is an example of compliant text
+        budget = options['max_file_chunks']
+        approved = ModerationResult.objects.filter(final_verdict='approved', duplicate_of__isnull=True)
+        for result in approved.order_by('-created_at'):
+            if budget <= 0:
+                break
+            try:
+                path = result.file.path
+            except (ValueError, NotImplementedError):
+                continue
+            if not os.path.exists(path):
+                continue
+            try:
+                chunks = load_pdf_to_chunks(path, result.filename)
+            except Exception as e:
+                logger.warning(f"Skipping {result.filename}: {e}")
+                continue
+            texts = [c['page_content'].strip() for c in chunks if c['page_content'].strip()]
+            negatives.extend(texts[:budget])
+            budget -= len(texts)
+        
+        positives = [t for t in positives if t.strip()]
+        negatives = [t for t in negatives if t.strip()]
+        self.stdout.write(f"Collected {len(positives)} flagged and {len(negatives)} compliant chunks")
+        
+        min_samples = options['min_samples']
+        if len(positives) < min_samples or len(negatives) < min_samples:
+            raise CommandError(
+                f'Need at least {min_samples} examples of each class; review more moderation results first'
+            )
+        
+        texts = positives + negatives
+        labels = np.array([LABEL_FLAGGED] * len(positives) + [LABEL_OK] * len(negatives))
+        vectors = np.asarray(get_embeddings().embed_documents(texts))
+        
+        x_train, x_test, y_train, y_test = train_test_split(
+            vectors, labels,
+            test_size=options['holdout'],
+            stratify=labels,
+            random_state=0
+        )
+        model = LogisticRegression(class_weight='balanced', max_iter=1000)
+        model.fit(x_train, y_train)
+        
+        threshold = settings.MODERATION_TRIAGE_OK_THRESHOLD
+        ok_column = list(model.classes_).index(LABEL_OK)
+        ok_proba = model.predict_proba(x_test)[:, ok_column]
+        cleared = ok_proba >= threshold
+        accuracy = float(model.score(x_test, y_test))
+        cleared_rate = float(cleared.mean())
+        missed = int((cleared & (y_test == LABEL_FLAGGED)).sum())
+        flagged_total = int((y_test == LABEL_FLAGGED).sum())
+        
+        self.stdout.write(f"Holdout accuracy: {accuracy:.3f}")
+        self.stdout.write(
+            f"At threshold {threshold}: {cleared_rate:.1%} of holdout chunks skip the LLM, "
+            f"{missed}/{flagged_total} flagged chunks would be missed"
+        )
+        
+        # Refit on everything before saving
+        model.fit(vectors, labels)
+        version = save_triage_model(model, {
+            'positives': len(positives),
+            'negatives': len(negatives),
+            'holdout_accuracy': accuracy,
+            'holdout_cleared_rate': cleared_rate,
+            'holdout_missed_flagged': missed,
+        })
+        self.stdout.write(self.style.SUCCESS(f"Saved triage classifier {version}"))
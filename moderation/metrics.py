@@ -0,0 +1,362 @@
+"""
+In-process Prometheus metrics for the moderation pipeline
+
+Each process keeps its own metrics. With enable_shared_metrics(), every
+process also saves them to a shared directory, and render_metrics() adds up
+the saved metrics of all processes (web and workers).
+"""
+import atexit
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Prometheus' default latency buckets, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Whole files take minutes on large documents
+FILE_BUCKETS = (0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds between saves of this process's metrics to the shared directory
+SHARED_SAVE_INTERVAL = 5.0
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(pairs: Sequence[Tuple[str, str]]) -> str:
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+class _Metric:
+    kind = ''
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+    
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+    
+    def render(self, others: Sequence[Dict] = ()) -> List[str]:
+        """
+        Render this process's series, plus series saved by other processes.
+        """
+        series = self.snapshot()
+        for other in others:
+            for key, value in other.items():
+                series[key] = self._merge(series[key], value) if key in series else value
+        return [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.kind}',
+        ] + self._samples(sorted(series.items()))
+    
+    def snapshot(self) -> Dict[Tuple[str, ...], object]:
+        """
+        Copy of the current value of every series, keyed by label values.
+        """
+        raise NotImplementedError
+    
+    def reset(self):
+        raise NotImplementedError
+    
+    def _merge(self, value, other):
+        raise NotImplementedError
+    
+    def _samples(self, series: List[Tuple[Tuple[str, ...], object]]) -> List[str]:
+        raise NotImplementedError
+
+class Counter(_Metric):
+    """
+    Monotonically increasing count, one series per label combination.
+    """
+    kind = 'counter'
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+    
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def snapshot(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._values)
+    
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+    
+    def _merge(self, value: float, other: float) -> float:
+        return value + other
+    
+    def _samples(self, series: List[Tuple[Tuple[str, ...], float]]) -> List[str]:
+        return [
+            f'{self.name}{_format_labels(list(zip(self.labelnames, key)))} {_format_value(value)}'
+            for key, value in series
+        ]
+
+class Histogram(_Metric):
+    """
+    Distribution of observed values over fixed buckets, one series per
+    label combination. Observing is a bisect and three additions under a lock.
+    """
+    kind = 'histogram'
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts (last one is +Inf), sum, count]
+        self._series = {}
+    
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+    
+    def snapshot(self) -> Dict[Tuple[str, ...], list]:
+        with self._lock:
+            return {key: [list(counts), total, count] for key, (counts, total, count) in self._series.items()}
+    
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+    
+    def _merge(self, value: list, other: list) -> list:
+        return [[a + b for a, b in zip(value[0], other[0])], value[1] + other[1], value[2] + other[2]]
+    
+    def _samples(self, series: List[Tuple[Tuple[str, ...], list]]) -> List[str]:
+        lines = []
+        for key, (counts, total, count) in series:
+            pairs = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{_format_labels(pairs + [("le", _format_value(bound))])} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(pairs)} {_format_value(total)}')
+            lines.append(f'{self.name}_count{_format_labels(pairs)} {count}')
+        return lines
+
+REGISTRY: List[_Metric] = []
+
+STAGE_SECONDS = Histogram(
+    'moderation_stage_seconds',
+    'Time spent per unit of work in each moderation stage '
+    '(load, split, cache, embed, triage, retrieve, llm, parse, persist).',
+    ['stage']
+)
+STAGE_ITEMS = Counter(
+    'moderation_stage_items_total',
+    'Pages (load), violation rows (persist) or chunks (other stages) processed by each moderation stage.',
+    ['stage']
+)
+CHUNKS = Counter(
+    'moderation_chunks_total',
+    'Chunks that received a verdict, by verdict and by what decided it.',
+    ['verdict', 'source']
+)
+LLM_ERRORS = Counter(
+    'moderation_llm_errors_total',
+    'Failed LLM calls or unparseable answers; failed batches fall back to single-chunk calls.',
+    ['call', 'error']
+)
+CACHE_LOOKUPS = Counter(
+    'moderation_cache_lookups_total',
+    'Verdict cache lookups per chunk and policy store cache lookups per open.',
+    ['cache', 'result']
+)
+FILE_SECONDS = Histogram(
+    'moderation_file_seconds',
+    'Wall time to moderate and record one file, by entry point (sync, stream, worker).',
+    ['endpoint'],
+    buckets=FILE_BUCKETS
+)
+RESULTS = Counter(
+    'moderation_results_total',
+    'Moderation results recorded, by outcome (completed, failed, duplicate).',
+    ['outcome']
+)
+POLICY_STAGE_SECONDS = Histogram(
+    'policy_ingest_stage_seconds',
+    'Time spent in each policy ingestion stage (parse per run, embed and write per batch).',
+    ['stage'],
+    buckets=DEFAULT_BUCKETS + (30.0, 60.0)
+)
+POLICY_CHUNKS = Counter(
+    'policy_ingest_chunks_total',
+    'Policy chunks seen by ingestion, by change (new, unchanged, removed).',
+    ['change']
+)
+
+def observe_stage(stage: str, seconds: float, items: int = 1):
+    """
+    Record one unit of work of a moderation stage; matches the engine's
+    StageCallback signature.
+    """
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    STAGE_ITEMS.inc(items, stage=stage)
+
+def observe_file(endpoint: str, started: float):
+    """
+    Record the wall time of a file moderation that began at time.perf_counter() == started.
+    """
+    FILE_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint)
+
+class _SharedMetrics:
+    """
+    Saves this process's metrics to <directory>/<pid>.json every
+    SHARED_SAVE_INTERVAL seconds and at exit, and reads the files saved by
+    the other processes.
+    
+    Files of processes that exited are kept, so counters don't go back
+    when a worker is restarted; clear the directory when the whole service
+    is restarted.
+    """
+    
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._stop = threading.Event()
+        self._thread = None
+    
+    @property
+    def path(self) -> str:
+        return os.path.join(self.directory, f'{os.getpid()}.json')
+    
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='metrics-save', daemon=True)
+        self._thread.start()
+    
+    def _run(self):
+        while not self._stop.wait(SHARED_SAVE_INTERVAL):
+            self.save()
+    
+    def save(self):
+        payload = {
+            metric.name: [[list(key), value] for key, value in metric.snapshot().items()]
+            for metric in REGISTRY
+        }
+        if not any(payload.values()) and not os.path.exists(self.path):
+            # e.g. a process pool child that never records anything
+            return
+        temporary = f'{self.path}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(payload, f)
+        os.replace(temporary, self.path)
+    
+    def load_others(self) -> Dict[str, List[Dict]]:
+        """
+        Series saved by every other process, as {metric name: [series, ...]}.
+        """
+        others = {}
+        own = self.path
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            if path == own:
+                continue
+            try:
+                with open(path) as f:
+                    payload = json.load(f)
+            except (OSError, ValueError):
+                # Removed or being replaced; it is read again on the next scrape
+                continue
+            for name, series in payload.items():
+                others.setdefault(name, []).append({tuple(key): value for key, value in series})
+        return others
+    
+    def after_fork(self):
+        # The child starts counting from zero; what it inherited stays the parent's
+        for metric in REGISTRY:
+            metric.reset()
+        self.start()
+
+_shared: Optional[_SharedMetrics] = None
+
+def enable_shared_metrics(directory: str):
+    """
+    Save this process's metrics to a directory shared by every web and
+    worker process, and include the other processes' metrics in
+    render_metrics(). Forked children save their own file.
+    """
+    global _shared
+    if _shared is not None:
+        return
+    _shared = _SharedMetrics(directory)
+    _shared.start()
+    atexit.register(_shared.save)
+    os.register_at_fork(after_in_child=_shared.after_fork)
+
+def save_shared_metrics():
+    """
+    Save this process's metrics now, for processes that end without running
+    atexit handlers (multiprocessing children). No-op unless shared metrics
+    are enabled.
+    """
+    if _shared is not None:
+        _shared.save()
+
+def render_metrics() -> str:
+    """
+    Render every registered metric in the Prometheus text exposition format,
+    summed over all processes when shared metrics are enabled.
+    """
+    others = _shared.load_others() if _shared is not None else {}
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render(others.get(metric.name, ())))
+    return '\n'.join(lines) + '\n'
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        payload = render_metrics().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+    
+    def log_message(self, format, *args):
+        pass
+
+def start_metrics_server(port: int, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+    """
+    Serve /metrics from a daemon thread, for processes without the web app
+    (e.g. moderation workers).
+    
+    Returns:
+        The running server; call shutdown() to stop it
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name=f'metrics-{port}', daemon=True).start()
+    return server
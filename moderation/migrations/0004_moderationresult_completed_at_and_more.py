@@ -0,0 +1,43 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moderation', '0003_alter_moderationresult_verdict'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moderationresult',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='moderationresult',
+            name='error_message',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='moderationresult',
+            name='processed_chunks',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='moderationresult',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='moderationresult',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], db_index=True, default='completed', help_text='Processing state of the moderation job', max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='moderationresult',
+            name='verdict',
+            field=models.CharField(choices=[('pending', 'Pending'), ('clean', 'Clean'), ('needs_review', 'Needs Review'), ('violation_found', 'Violation Found'), ('error', 'Error')], default='pending', max_length=20),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moderation', '0004_moderationresult_completed_at_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VerdictCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=64, unique=True)),
+                ('policy_version', models.CharField(db_index=True, max_length=64)),
+                ('verdict', models.CharField(choices=[('violation', 'Violation'), ('review', 'Review'), ('ok', 'OK')], max_length=20)),
+                ('explanation', models.TextField(blank=True, default='')),
+                ('sources', models.JSONField(default=list)),
+                ('hits', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_used_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name': 'Verdict Cache Entry',
+                'verbose_name_plural': 'Verdict Cache Entries',
+            },
+        ),
+        migrations.AddField(
+            model_name='moderationresult',
+            name='cache_hits',
+            field=models.IntegerField(default=0, help_text='Chunks answered from the verdict cache'),
+        ),
+        migrations.AddField(
+            model_name='moderationresult',
+            name='cache_misses',
+            field=models.IntegerField(default=0, help_text='Chunks sent to the LLM'),
+        ),
+    ]
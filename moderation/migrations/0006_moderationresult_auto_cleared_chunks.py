@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moderation', '0005_verdictcacheentry_moderationresult_cache_hits_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moderationresult',
+            name='auto_cleared_chunks',
+            field=models.IntegerField(default=0, help_text='Chunks marked OK without an LLM call because no policy was relevant'),
+        ),
+    ]
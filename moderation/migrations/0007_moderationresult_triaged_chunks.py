@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moderation', '0006_moderationresult_auto_cleared_chunks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moderationresult',
+            name='triaged_chunks',
+            field=models.IntegerField(default=0, help_text='Chunks marked OK by the local triage classifier'),
+        ),
+    ]
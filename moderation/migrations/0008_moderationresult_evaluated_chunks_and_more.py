@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moderation', '0007_moderationresult_triaged_chunks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moderationresult',
+            name='evaluated_chunks',
+            field=models.IntegerField(default=0, help_text='Chunks that received a verdict'),
+        ),
+        migrations.AddField(
+            model_name='moderationresult',
+            name='mode',
+            field=models.CharField(choices=[('full', 'Full'), ('fail_fast', 'Fail Fast')], default='full', help_text="'fail_fast' stops at the first confirmed violation", max_length=20),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moderation', '0008_moderationresult_evaluated_chunks_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='policydocument',
+            name='vector_ids',
+            field=models.JSONField(blank=True, default=list, help_text="IDs of this document's chunks in the policy store"),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moderation', '0009_policydocument_vector_ids'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='verdictcacheentry',
+            name='tenant',
+            field=models.CharField(db_index=True, default='', max_length=64),
+        ),
+    ]
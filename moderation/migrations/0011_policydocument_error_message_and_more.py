@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-17 01:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moderation', '0010_verdictcacheentry_tenant'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='policydocument',
+            name='error_message',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='policydocument',
+            name='ingest_batch',
+            field=models.CharField(blank=True, db_index=True, default='', help_text='Upload the document was queued with; a worker ingests a whole batch at once', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='policydocument',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('processing', 'Processing'), ('ready', 'Ready'), ('failed', 'Failed')], db_index=True, default='ready', max_length=20),
+        ),
+    ]
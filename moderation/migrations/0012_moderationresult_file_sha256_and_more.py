@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moderation', '0011_policydocument_error_message_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moderationresult',
+            name='file_sha256',
+            field=models.CharField(blank=True, db_index=True, default='', help_text='SHA-256 of the uploaded file', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='moderationresult',
+            name='file_size',
+            field=models.IntegerField(default=0, help_text='File size in bytes'),
+        ),
+    ]
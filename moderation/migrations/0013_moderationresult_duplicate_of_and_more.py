@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moderation', '0012_moderationresult_file_sha256_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moderationresult',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, help_text='Earlier result reused for a byte-identical resubmission', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='moderation.moderationresult'),
+        ),
+        migrations.AddField(
+            model_name='moderationresult',
+            name='policy_version',
+            field=models.CharField(blank=True, default='', help_text='Policy store version the file was checked against', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='moderationresult',
+            name='prompt_version',
+            field=models.CharField(blank=True, default='', max_length=16),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moderation', '0013_moderationresult_duplicate_of_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModerationStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_results', models.IntegerField(default=0)),
+                ('pending_results', models.IntegerField(default=0)),
+                ('clean_results', models.IntegerField(default=0)),
+                ('violation_results', models.IntegerField(default=0)),
+                ('review_results', models.IntegerField(default=0)),
+                ('error_results', models.IntegerField(default=0)),
+                ('awaiting_decision_results', models.IntegerField(default=0)),
+                ('approved_results', models.IntegerField(default=0)),
+                ('rejected_results', models.IntegerField(default=0)),
+                ('total_chunks', models.IntegerField(default=0)),
+                ('allowed_chunks', models.IntegerField(default=0)),
+                ('review_chunks', models.IntegerField(default=0)),
+                ('violation_chunks', models.IntegerField(default=0)),
+                ('policy_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='moderation_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Moderation Stats',
+                'verbose_name_plural': 'Moderation Stats',
+            },
+        ),
+    ]
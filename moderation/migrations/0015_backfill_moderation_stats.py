@@ -0,0 +1,58 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:10
+
+from django.db import migrations
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+
+VERDICT_COUNTERS = {
+    'pending': 'pending_results',
+    'clean': 'clean_results',
+    'violation_found': 'violation_results',
+    'needs_review': 'review_results',
+    'error': 'error_results',
+}
+
+FINAL_VERDICT_COUNTERS = {
+    'pending': 'awaiting_decision_results',
+    'approved': 'approved_results',
+    'rejected': 'rejected_results',
+}
+
+CHUNK_COUNTERS = ('total_chunks', 'allowed_chunks', 'review_chunks', 'violation_chunks')
+
+
+def backfill_moderation_stats(apps, schema_editor):
+    ModerationResult = apps.get_model('moderation', 'ModerationResult')
+    PolicyDocument = apps.get_model('moderation', 'PolicyDocument')
+    ModerationStats = apps.get_model('moderation', 'ModerationStats')
+
+    aggregates = {'total_results': Count('id')}
+    for verdict, counter in VERDICT_COUNTERS.items():
+        aggregates[counter] = Count('id', filter=Q(verdict=verdict))
+    for final_verdict, counter in FINAL_VERDICT_COUNTERS.items():
+        aggregates[counter] = Count('id', filter=Q(final_verdict=final_verdict))
+    for field in CHUNK_COUNTERS:
+        aggregates[field] = Coalesce(Sum(field), 0)
+
+    stats = {}
+    for row in ModerationResult.objects.order_by().values('user_id').annotate(**aggregates):
+        stats[row.pop('user_id')] = row
+    policy_counts = PolicyDocument.objects.order_by().values('user_id').annotate(count=Count('id'))
+    for row in policy_counts:
+        stats.setdefault(row['user_id'], {})['policy_count'] = row['count']
+
+    ModerationStats.objects.bulk_create(
+        [ModerationStats(user_id=user_id, **values) for user_id, values in stats.items()],
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moderation', '0014_moderationstats'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_moderation_stats, migrations.RunPython.noop),
+    ]
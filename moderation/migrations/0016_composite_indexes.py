@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moderation', '0015_backfill_moderation_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='moderationresult',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='modresult_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='moderationresult',
+            index=models.Index(fields=['user', 'verdict'], name='modresult_user_verdict_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='policydocument',
+            index=models.Index(fields=['user', '-uploaded_at'], name='policydoc_user_uploaded_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='violationdetail',
+            index=models.Index(fields=['moderation_result', 'id'], name='violation_result_id_idx'),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moderation', '0016_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moderationresult',
+            name='completion_tokens',
+            field=models.IntegerField(default=0, help_text='Completion tokens returned by the LLM'),
+        ),
+        migrations.AddField(
+            model_name='moderationresult',
+            name='llm_calls',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='moderationresult',
+            name='llm_cost',
+            field=models.DecimalField(decimal_places=6, default=0, help_text='Estimated LLM cost in USD', max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='moderationresult',
+            name='llm_latency_p50',
+            field=models.FloatField(blank=True, help_text='Median LLM call latency in seconds', null=True),
+        ),
+        migrations.AddField(
+            model_name='moderationresult',
+            name='llm_latency_p95',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='moderationresult',
+            name='llm_latency_p99',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='moderationresult',
+            name='llm_seconds',
+            field=models.FloatField(default=0, help_text='Total time spent in LLM calls'),
+        ),
+        migrations.AddField(
+            model_name='moderationresult',
+            name='processing_seconds',
+            field=models.FloatField(blank=True, help_text='Wall time to moderate the file', null=True),
+        ),
+        migrations.AddField(
+            model_name='moderationresult',
+            name='prompt_tokens',
+            field=models.IntegerField(default=0, help_text='Prompt tokens sent to the LLM'),
+        ),
+        migrations.AddField(
+            model_name='moderationresult',
+            name='tokens_estimated',
+            field=models.BooleanField(default=False, help_text='Some token counts were estimated locally because the LLM reported no usage'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moderation', '0017_llm_usage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='policydocument',
+            name='started_at',
+            field=models.DateTimeField(blank=True, help_text='When a worker claimed the document for ingestion', null=True),
+        ),
+    ]
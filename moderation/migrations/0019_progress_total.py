@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moderation', '0018_policy_document_started_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moderationresult',
+            name='progress_total',
+            field=models.IntegerField(default=0, help_text='Estimated chunk count while the job runs; total_chunks is only set on completion so per-user stats count it once'),
+        ),
+    ]
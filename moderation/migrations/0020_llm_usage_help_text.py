@@ -0,0 +1,28 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moderation', '0019_progress_total'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='moderationresult',
+            name='completion_tokens',
+            field=models.IntegerField(default=0, help_text='Completion tokens returned by the LLM; a lower bound for fail_fast results'),
+        ),
+        migrations.AlterField(
+            model_name='moderationresult',
+            name='llm_cost',
+            field=models.DecimalField(decimal_places=6, default=0, help_text='Estimated LLM cost in USD. For fail_fast results this is a lower bound: calls still in flight when the violation was confirmed are abandoned and not recorded', max_digits=12),
+        ),
+        migrations.AlterField(
+            model_name='moderationresult',
+            name='prompt_tokens',
+            field=models.IntegerField(default=0, help_text='Prompt tokens sent to the LLM; a lower bound for fail_fast results'),
+        ),
+    ]
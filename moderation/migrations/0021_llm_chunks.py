@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-17 02:52
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_llm_chunks(apps, schema_editor):
+    # Until now cache_misses counted the chunks sent to the LLM
+    ModerationResult = apps.get_model('moderation', 'ModerationResult')
+    ModerationResult.objects.update(llm_chunks=F('cache_misses'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moderation', '0020_llm_usage_help_text'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moderationresult',
+            name='llm_chunks',
+            field=models.IntegerField(default=0, help_text='Chunks sent to the LLM'),
+        ),
+        migrations.AlterField(
+            model_name='moderationresult',
+            name='cache_misses',
+            field=models.IntegerField(default=0, help_text='Chunks looked up in the verdict cache and not found'),
+        ),
+        migrations.RunPython(copy_llm_chunks, migrations.RunPython.noop),
+    ]
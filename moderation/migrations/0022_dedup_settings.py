@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moderation', '0021_llm_chunks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moderationresult',
+            name='relevance_threshold',
+            field=models.FloatField(blank=True, help_text='Relevance gate threshold the file was checked with; empty if the gate was off', null=True),
+        ),
+        migrations.AddField(
+            model_name='moderationresult',
+            name='triage_model_version',
+            field=models.CharField(blank=True, default='', help_text="Triage classifier that scored the file's chunks, if any", max_length=64),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moderation', '0022_dedup_settings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moderationresult',
+            name='auto_cleared_chunk_ids',
+            field=models.JSONField(blank=True, default=list, help_text='IDs of the chunks the relevance gate marked OK, for auditing the threshold'),
+        ),
+    ]
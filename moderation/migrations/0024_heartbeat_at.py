@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moderation', '0023_auto_cleared_chunk_ids'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moderationresult',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, help_text='Last progress update from the worker running the job', null=True),
+        ),
+        migrations.AddField(
+            model_name='policydocument',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, help_text='Last sign of life from the worker ingesting the document', null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-17 03:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moderation', '0024_heartbeat_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moderationresult',
+            name='triaged_chunk_ids',
+            field=models.JSONField(blank=True, default=list, help_text='IDs of the chunks the triage classifier marked OK, for auditing the classifier'),
+        ),
+    ]
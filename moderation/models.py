@@ -5,17 +5,33 @@ class PolicyDocument(models.Model):
     """
     Stores uploaded policy documents
     """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('processing', 'Processing'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+    
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='policy_documents')
     file = models.FileField(upload_to='policies/')
     filename = models.CharField(max_length=255)
     file_size = models.IntegerField(help_text="File size in bytes")
+    vector_ids = models.JSONField(default=list, blank=True, help_text="IDs of this document's chunks in the policy store")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='ready', db_index=True)
+    ingest_batch = models.CharField(max_length=32, blank=True, default='', db_index=True, help_text="Upload the document was queued with; a worker ingests a whole batch at once")
+    error_message = models.TextField(blank=True, default='')
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True, help_text="When a worker claimed the document for ingestion")
+    heartbeat_at = models.DateTimeField(null=True, blank=True, help_text="Last sign of life from the worker ingesting the document")
     
     def __str__(self):
         return f"{self.filename} - {self.user.username}"
     
     class Meta:
         ordering = ['-uploaded_at']
+        indexes = [
+            models.Index(fields=['user', '-uploaded_at'], name='policydoc_user_uploaded_idx'),
+        ]
         verbose_name = 'Policy Document'
         verbose_name_plural = 'Policy Documents'
 
@@ -24,12 +40,25 @@ class ModerationResult(models.Model):
     Stores moderation results for files checked against policies
     """
     VERDICT_CHOICES = [
+        ('pending', 'Pending'),
         ('clean', 'Clean'),
         ('needs_review', 'Needs Review'),
         ('violation_found', 'Violation Found'),
         ('error', 'Error'),
     ]
     
+    MODE_CHOICES = [
+        ('full', 'Full'),
+        ('fail_fast', 'Fail Fast'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
     FINAL_VERDICT_CHOICES = [
         ('pending', 'Pending Review'),
         ('approved', 'Approved - Clean'),
@@ -38,8 +67,10 @@ class ModerationResult(models.Model):
     
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='moderation_results')
     file = models.FileField(upload_to='moderation_files/')
+    file_sha256 = models.CharField(max_length=64, blank=True, default='', db_index=True, help_text="SHA-256 of the uploaded file")
+    file_size = models.IntegerField(default=0, help_text="File size in bytes")
     filename = models.CharField(max_length=255)
-    verdict = models.CharField(max_length=20, choices=VERDICT_CHOICES)
+    verdict = models.CharField(max_length=20, choices=VERDICT_CHOICES, default='pending')
     final_verdict = models.CharField(
         max_length=20, 
         choices=FINAL_VERDICT_CHOICES, 
@@ -50,7 +81,96 @@ class ModerationResult(models.Model):
     allowed_chunks = models.IntegerField(default=0)
     review_chunks = models.IntegerField(default=0)
     violation_chunks = models.IntegerField(default=0)
+    mode = models.CharField(
+        max_length=20,
+        choices=MODE_CHOICES,
+        default='full',
+        help_text="'fail_fast' stops at the first confirmed violation"
+    )
+    evaluated_chunks = models.IntegerField(default=0, help_text="Chunks that received a verdict")
+    cache_hits = models.IntegerField(default=0, help_text="Chunks answered from the verdict cache")
+    cache_misses = models.IntegerField(default=0, help_text="Chunks looked up in the verdict cache and not found")
+    llm_chunks = models.IntegerField(default=0, help_text="Chunks sent to the LLM")
+    auto_cleared_chunks = models.IntegerField(
+        default=0,
+        help_text="Chunks marked OK without an LLM call because no policy was relevant"
+    )
+    auto_cleared_chunk_ids = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="IDs of the chunks the relevance gate marked OK, for auditing the threshold"
+    )
+    triaged_chunks = models.IntegerField(
+        default=0,
+        help_text="Chunks marked OK by the local triage classifier"
+    )
+    triaged_chunk_ids = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="IDs of the chunks the triage classifier marked OK, for auditing the classifier"
+    )
+    prompt_tokens = models.IntegerField(default=0, help_text="Prompt tokens sent to the LLM; a lower bound for fail_fast results")
+    completion_tokens = models.IntegerField(default=0, help_text="Completion tokens returned by the LLM; a lower bound for fail_fast results")
+    tokens_estimated = models.BooleanField(
+        default=False,
+        help_text="Some token counts were estimated locally because the LLM reported no usage"
+    )
+    llm_calls = models.IntegerField(default=0)
+    llm_seconds = models.FloatField(default=0, help_text="Total time spent in LLM calls")
+    llm_latency_p50 = models.FloatField(null=True, blank=True, help_text="Median LLM call latency in seconds")
+    llm_latency_p95 = models.FloatField(null=True, blank=True)
+    llm_latency_p99 = models.FloatField(null=True, blank=True)
+    llm_cost = models.DecimalField(
+        max_digits=12,
+        decimal_places=6,
+        default=0,
+        help_text="Estimated LLM cost in USD. For fail_fast results this is a lower bound: calls still "
+                  "in flight when the violation was confirmed are abandoned and not recorded"
+    )
+    processing_seconds = models.FloatField(null=True, blank=True, help_text="Wall time to moderate the file")
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='completed',
+        db_index=True,
+        help_text="Processing state of the moderation job"
+    )
+    processed_chunks = models.IntegerField(default=0)
+    progress_total = models.IntegerField(
+        default=0,
+        help_text="Estimated chunk count while the job runs; total_chunks is only set on completion so per-user stats count it once"
+    )
+    policy_version = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        help_text="Policy store version the file was checked against"
+    )
+    prompt_version = models.CharField(max_length=16, blank=True, default='')
+    triage_model_version = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        help_text="Triage classifier that scored the file's chunks, if any"
+    )
+    relevance_threshold = models.FloatField(
+        null=True,
+        blank=True,
+        help_text="Relevance gate threshold the file was checked with; empty if the gate was off"
+    )
+    duplicate_of = models.ForeignKey(
+        'self',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='duplicates',
+        help_text="Earlier result reused for a byte-identical resubmission"
+    )
+    error_message = models.TextField(blank=True, default='')
     created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True, help_text="Last progress update from the worker running the job")
+    completed_at = models.DateTimeField(null=True, blank=True)
     reviewed_at = models.DateTimeField(null=True, blank=True)
     
     def __str__(self):
@@ -58,6 +178,11 @@ class ModerationResult(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # History pages: filter by user, keyset on (created_at, id)
+            models.Index(fields=['user', '-created_at', '-id'], name='modresult_user_created_idx'),
+            models.Index(fields=['user', 'verdict'], name='modresult_user_verdict_idx'),
+        ]
         verbose_name = 'Moderation Result'
         verbose_name_plural = 'Moderation Results'
 
@@ -88,5 +213,68 @@ class ViolationDetail(models.Model):
     
     class Meta:
         ordering = ['id']
+        indexes = [
+            models.Index(fields=['moderation_result', 'id'], name='violation_result_id_idx'),
+        ]
         verbose_name = 'Violation Detail'
-        verbose_name_plural = 'Violation Details'
\ No newline at end of file
+        verbose_name_plural = 'Violation Details'
+
+class VerdictCacheEntry(models.Model):
+    """
+    Cached LLM verdict for a chunk of text, keyed by a hash of the tenant,
+    normalized text, policy store version, prompt version and k
+    """
+    VERDICT_CHOICES = [
+        ('violation', 'Violation'),
+        ('review', 'Review'),
+        ('ok', 'OK'),
+    ]
+    
+    key = models.CharField(max_length=64, unique=True)
+    tenant = models.CharField(max_length=64, db_index=True, default='')
+    policy_version = models.CharField(max_length=64, db_index=True)
+    verdict = models.CharField(max_length=20, choices=VERDICT_CHOICES)
+    explanation = models.TextField(blank=True, default='')
+    sources = models.JSONField(default=list)
+    hits = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    
+    def __str__(self):
+        return f"{self.key[:12]} - {self.verdict}"
+    
+    class Meta:
+        verbose_name = 'Verdict Cache Entry'
+        verbose_name_plural = 'Verdict Cache Entries'
+
+class ModerationStats(models.Model):
+    """
+    Running per-user totals behind the dashboard, kept up to date in the
+    same transaction as every change to the user's moderation results
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='moderation_stats')
+    total_results = models.IntegerField(default=0)
+    # By AI verdict
+    pending_results = models.IntegerField(default=0)
+    clean_results = models.IntegerField(default=0)
+    violation_results = models.IntegerField(default=0)
+    review_results = models.IntegerField(default=0)
+    error_results = models.IntegerField(default=0)
+    # By final verdict
+    awaiting_decision_results = models.IntegerField(default=0)
+    approved_results = models.IntegerField(default=0)
+    rejected_results = models.IntegerField(default=0)
+    # Chunk totals across all results
+    total_chunks = models.IntegerField(default=0)
+    allowed_chunks = models.IntegerField(default=0)
+    review_chunks = models.IntegerField(default=0)
+    violation_chunks = models.IntegerField(default=0)
+    policy_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.user.username} - {self.total_results} results"
+    
+    class Meta:
+        verbose_name = 'Moderation Stats'
+        verbose_name_plural = 'Moderation Stats'
@@ -0,0 +1,99 @@
+"""
+Deterministic stand-in chat model for offline benchmarks and development
+"""
+import hashlib
+import json
+import re
+import time
+from typing import Any, List, Optional, Tuple
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+# Markers of the two prompts in llm.py
+_SINGLE_TEXT_RE = re.compile(r"=== TEXT TO CHECK ===\n(.*?)\n\nPlease respond", re.DOTALL)
+_BATCH_CHUNK_RE = re.compile(
+    r"\[chunk_id: ([^\]]+)\]\n(.*?)(?=\n\n\[chunk_id: |\n\nJudge every chunk)",
+    re.DOTALL
+)
+
+# Rough tokenizer stand-in used to cut answers at max_tokens
+_CHARS_PER_TOKEN = 4
+
+def truncate_answer(text: str, max_tokens: Optional[int]) -> str:
+    """
+    Cut an answer to about max_tokens tokens, as a real backend stops
+    generating at its limit.
+    """
+    if max_tokens is None:
+        return text
+    return text[:max(0, max_tokens) * _CHARS_PER_TOKEN]
+
+def _unit(text: str, salt: str) -> float:
+    """
+    Map text to a stable number in [0, 1).
+    """
+    digest = hashlib.sha256(f"{salt}\0{text}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64
+
+class FakeModerationChatModel(BaseChatModel):
+    """
+    Chat model that answers the moderation prompts without a network call.
+    
+    The verdict for a chunk is a pure function of its text and the seed, so
+    repeated runs and any concurrency level give identical results. Each
+    call sleeps for a latency that is likewise derived from the prompt.
+    Answers longer than max_tokens are cut off, so a response budget that
+    is too small for a batch shows up as an unparseable answer.
+    """
+    latency: float = 0.2
+    jitter: float = 0.05
+    violation_rate: float = 0.05
+    review_rate: float = 0.1
+    seed: int = 0
+    max_tokens: Optional[int] = None
+    
+    @property
+    def _llm_type(self) -> str:
+        return "fake-moderation"
+    
+    def verdict_for(self, text: str) -> Tuple[str, str]:
+        """
+        Return the (verdict, explanation) this model gives a chunk.
+        """
+        draw = _unit(text.strip(), str(self.seed))
+        if draw < self.violation_rate:
+            return "VIOLATION", "Matches a prohibited practice in the policy context."
+        if draw < self.violation_rate + self.review_rate:
+            return "REVIEW", "Borderline content that needs a human decision."
+        return "OK", "No policy in the context applies to this text."
+    
+    def answer(self, prompt: str) -> str:
+        """
+        Answer a single-chunk or batch moderation prompt.
+        """
+        chunks = _BATCH_CHUNK_RE.findall(prompt)
+        if chunks:
+            return json.dumps([
+                {"chunk_id": chunk_id, "verdict": verdict, "explanation": explanation}
+                for chunk_id, text in chunks
+                for verdict, explanation in [self.verdict_for(text)]
+            ])
+        
+        match = _SINGLE_TEXT_RE.search(prompt)
+        verdict, explanation = self.verdict_for(match.group(1) if match else prompt)
+        return f"{verdict}: {explanation}"
+    
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any
+    ) -> ChatResult:
+        prompt = messages[-1].content if messages else ""
+        delay = self.latency + self.jitter * (2 * _unit(prompt, "latency") - 1)
+        if delay > 0:
+            time.sleep(delay)
+        message = AIMessage(content=truncate_answer(self.answer(prompt), self.max_tokens))
+        return ChatResult(generations=[ChatGeneration(message=message)])
@@ -5,11 +5,38 @@ from langchain_groq import ChatGroq
 from langchain.chains import RetrievalQA
 from langchain.prompts import PromptTemplate
 from django.conf import settings
+from typing import Dict, Iterable, List, Tuple
+from .fake_llm import FakeModerationChatModel
+import json
 import logging
+import threading
+import tiktoken
 
 logger = logging.getLogger('moderation')
 
 GROQ_API_KEY = settings.GROQ_API_KEY
+LLM_BACKEND = settings.LLM_BACKEND
+LLM_MODEL = settings.LLM_MODEL
+LLM_BASE_URL = settings.LLM_BASE_URL
+LLM_API_KEY = settings.LLM_API_KEY
+LLM_TIMEOUT = settings.LLM_TIMEOUT
+LLM_MAX_RETRIES = settings.LLM_MAX_RETRIES
+LLM_TEMPERATURE = 0.3
+LLM_MAX_TOKENS = 512
+LLM_BATCH_TOKENS_PER_CHUNK = settings.LLM_BATCH_TOKENS_PER_CHUNK
+LLM_PROMPT_COST_PER_MTOK = settings.LLM_PROMPT_COST_PER_MTOK
+LLM_COMPLETION_COST_PER_MTOK = settings.LLM_COMPLETION_COST_PER_MTOK
+
+# Used to estimate tokens when a backend reports no usage; close enough for
+# Llama-family tokenizers to plan capacity with
+TOKEN_ESTIMATE_ENCODING = "cl100k_base"
+
+_token_encoding = None
+_token_encoding_unavailable = False
+_token_encoding_lock = threading.Lock()
+
+# Bump whenever the prompts change so cached verdicts are not reused
+PROMPT_VERSION = "1"
 
 MODERATION_PROMPT = PromptTemplate(
     input_variables=["context", "question"],
@@ -28,29 +55,177 @@ MODERATION_PROMPT = PromptTemplate(
     )
 )
 
-def get_retrieval_qa_chain(vectorstore, k: int = 3, chain_type: str = "stuff"):
+BATCH_MODERATION_PROMPT = PromptTemplate(
+    input_variables=["context", "chunks"],
+    template=(
+        "You are an AI content moderation system. Your task is to determine "
+        "if each of the given text chunks violates any of the company's policy documents.\n\n"
+        "=== POLICY CONTEXT ===\n"
+        "{context}\n\n"
+        "=== TEXT CHUNKS TO CHECK ===\n"
+        "{chunks}\n\n"
+        "Judge every chunk on its own. Respond STRICTLY with a JSON array and nothing else, "
+        "containing exactly one object per chunk:\n"
+        '[{{"chunk_id": "<id>", "verdict": "VIOLATION" | "REVIEW" | "OK", '
+        '"explanation": "<brief reason>"}}]\n\n'
+        "Use VIOLATION when the chunk violates a policy (say which and why), REVIEW when it "
+        "needs human review and OK when it is compliant. Be concise but explicit in your reasoning. "
+        "IMPORTANT - DONT JUST CLASSIFY ALL SLIGHTLY VIOLATING CHUNKS INTO VIOLATION, PUT SOME INTO "
+        "REVIEW AS WELL, ALL WHICH ARENT AN EXTREME VIOLATION MUST GO INTO REVIEW"
+    )
+)
+
+def _groq_llm(max_tokens: int):
+    if not GROQ_API_KEY:
+        raise ValueError("GROQ_API_KEY is not set in environment variables")
+    
+    return ChatGroq(
+        groq_api_key=GROQ_API_KEY,
+        groq_api_base=LLM_BASE_URL or None,
+        model_name=LLM_MODEL,
+        temperature=LLM_TEMPERATURE,
+        max_tokens=max_tokens,
+        request_timeout=LLM_TIMEOUT,
+        max_retries=LLM_MAX_RETRIES
+    )
+
+def _openai_compatible_llm(max_tokens: int):
+    if not LLM_BASE_URL:
+        raise ValueError("LLM_BASE_URL must be set for the 'openai' LLM backend")
+    
+    # Only needed for this backend
+    from langchain_openai import ChatOpenAI
+    
+    return ChatOpenAI(
+        base_url=LLM_BASE_URL,
+        # Local servers usually ignore the key, but the client requires one
+        api_key=LLM_API_KEY or "not-needed",
+        model=LLM_MODEL,
+        temperature=LLM_TEMPERATURE,
+        max_tokens=max_tokens,
+        timeout=LLM_TIMEOUT,
+        max_retries=LLM_MAX_RETRIES
+    )
+
+def _fake_llm(max_tokens: int):
+    return FakeModerationChatModel(
+        latency=settings.FAKE_LLM_LATENCY_MS / 1000,
+        jitter=settings.FAKE_LLM_JITTER_MS / 1000,
+        violation_rate=settings.FAKE_LLM_VIOLATION_RATE,
+        review_rate=settings.FAKE_LLM_REVIEW_RATE,
+        max_tokens=max_tokens
+    )
+
+# Chat model factories by settings.LLM_BACKEND
+LLM_BACKENDS = {
+    "groq": _groq_llm,
+    "openai": _openai_compatible_llm,
+    "fake": _fake_llm,
+}
+
+def get_moderation_llm(max_tokens: int = LLM_MAX_TOKENS):
+    """
+    Return the chat model used for moderation, as selected by LLM_BACKEND.
+    
+    Args:
+        max_tokens: Maximum number of tokens in the response
+        
+    Returns:
+        LangChain chat model instance
+        
+    Raises:
+        ValueError: If the backend is unknown or not configured
+    """
+    factory = LLM_BACKENDS.get(LLM_BACKEND)
+    if factory is None:
+        raise ValueError(
+            f"Unknown LLM_BACKEND '{LLM_BACKEND}'. Use one of: {', '.join(LLM_BACKENDS)}"
+        )
+    return factory(max_tokens)
+
+def max_tokens_for_batch(batch_size: int) -> int:
+    """
+    Response budget for a request judging batch_size chunks. A batched
+    answer holds one JSON object per chunk, and one cut off at the limit
+    cannot be parsed.
+    """
+    if batch_size <= 1:
+        return LLM_MAX_TOKENS
+    return max(LLM_MAX_TOKENS, LLM_BATCH_TOKENS_PER_CHUNK * batch_size)
+
+def _get_token_encoding():
+    global _token_encoding, _token_encoding_unavailable
+    with _token_encoding_lock:
+        if _token_encoding is None and not _token_encoding_unavailable:
+            try:
+                _token_encoding = tiktoken.get_encoding(TOKEN_ESTIMATE_ENCODING)
+            except Exception as e:
+                # tiktoken downloads the encoding on first use; offline it can't
+                _token_encoding_unavailable = True
+                logger.warning(f"tiktoken encoding {TOKEN_ESTIMATE_ENCODING} unavailable, "
+                               f"estimating tokens as characters / 4: {e}")
+        return _token_encoding
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens in a text with tiktoken, or from its
+    length if the encoding cannot be loaded.
+    """
+    encoding = _get_token_encoding()
+    if encoding is None:
+        return (len(text) + 3) // 4
+    return len(encoding.encode(text, disallowed_special=()))
+
+def response_token_usage(prompt: str, response) -> Tuple[int, int, bool]:
+    """
+    Read the token usage of a chat model response.
+    
+    Uses the standard usage_metadata, then the provider's token_usage in
+    response_metadata, and otherwise estimates both counts locally.
+    
+    Args:
+        prompt: Prompt that was sent
+        response: Message returned by llm.invoke
+        
+    Returns:
+        (prompt_tokens, completion_tokens, estimated)
+    """
+    usage = getattr(response, "usage_metadata", None)
+    if usage:
+        return usage.get("input_tokens", 0), usage.get("output_tokens", 0), False
+    
+    token_usage = (getattr(response, "response_metadata", None) or {}).get("token_usage")
+    if token_usage:
+        return token_usage.get("prompt_tokens", 0), token_usage.get("completion_tokens", 0), False
+    
+    return estimate_tokens(prompt), estimate_tokens(str(response.content)), True
+
+def estimate_llm_cost(prompt_tokens: int, completion_tokens: int) -> float:
+    """
+    Price token counts at LLM_PROMPT_COST_PER_MTOK / LLM_COMPLETION_COST_PER_MTOK (USD).
     """
-    Return a RetrievalQA chain using Groq LLM and the provided vectorstore retriever.
+    return (
+        prompt_tokens * LLM_PROMPT_COST_PER_MTOK
+        + completion_tokens * LLM_COMPLETION_COST_PER_MTOK
+    ) / 1_000_000
+
+def get_retrieval_qa_chain(vectorstore, k: int = 3, chain_type: str = "stuff", llm=None):
+    """
+    Return a RetrievalQA chain using the configured LLM and the provided vectorstore retriever.
     
     Args:
         vectorstore: Chroma vectorstore instance
         k: Number of documents to retrieve
         chain_type: Type of chain to use
+        llm: Chat model to use (defaults to get_moderation_llm())
         
     Returns:
         RetrievalQA chain instance
     """
     logger.info(f"Initializing RetrievalQA chain with k={k}")
     
-    if not GROQ_API_KEY:
-        raise ValueError("GROQ_API_KEY is not set in environment variables")
-    
-    llm = ChatGroq(
-        groq_api_key=GROQ_API_KEY,
-        model_name="llama-3.3-70b-versatile",
-        temperature=0.3,
-        max_tokens=512
-    )
+    if llm is None:
+        llm = get_moderation_llm()
     
     retriever = vectorstore.as_retriever(
         search_type="similarity",
@@ -95,4 +270,84 @@ def query_chain(chain, user_input: str) -> dict:
         return response
     except Exception as e:
         logger.exception("Error in query_chain")
-        raise
\ No newline at end of file
+        raise
+
+def format_moderation_prompt(context_docs: Iterable, text: str) -> str:
+    """
+    Build the single-chunk moderation prompt from already retrieved policy
+    documents, joined the same way as the 'stuff' RetrievalQA chain.
+    
+    Args:
+        context_docs: Policy documents retrieved for the chunk
+        text: Text to moderate
+        
+    Returns:
+        Prompt text
+    """
+    context = "\n\n".join(doc.page_content for doc in context_docs)
+    return MODERATION_PROMPT.format(context=context, question=text)
+
+def format_batch_prompt(context_docs: Iterable, chunks: List[Tuple[str, str]]) -> str:
+    """
+    Build a single moderation prompt for several file chunks.
+    
+    Args:
+        context_docs: Policy documents retrieved for the chunks (already de-duplicated)
+        chunks: List of (chunk_id, text) pairs
+        
+    Returns:
+        Prompt text
+    """
+    context = "\n\n".join(doc.page_content for doc in context_docs)
+    chunk_text = "\n\n".join(
+        f"[chunk_id: {chunk_id}]\n{text}" for chunk_id, text in chunks
+    )
+    return BATCH_MODERATION_PROMPT.format(context=context, chunks=chunk_text)
+
+def parse_batch_response(text: str, chunk_ids: List[str]) -> Dict[str, str]:
+    """
+    Parse the JSON answer of a batch prompt into per-chunk answers.
+    
+    Each answer is returned in the single-chunk format ('VIOLATION: ...',
+    'REVIEW: ...' or 'OK: ...') so both paths share the same verdict parsing.
+    Chunks the model did not answer are left out of the result.
+    
+    Args:
+        text: Raw model output
+        chunk_ids: Chunk ids that were sent in the prompt
+        
+    Returns:
+        Dictionary mapping chunk_id to answer
+        
+    Raises:
+        ValueError: If the output does not contain a JSON array of verdicts
+    """
+    start = text.find("[")
+    end = text.rfind("]")
+    if start == -1 or end <= start:
+        raise ValueError("Batch response does not contain a JSON array")
+    
+    try:
+        items = json.loads(text[start:end + 1])
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Batch response is not valid JSON: {e}")
+    
+    if not isinstance(items, list):
+        raise ValueError("Batch response is not a JSON array")
+    
+    expected = set(chunk_ids)
+    answers = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        chunk_id = str(item.get("chunk_id", "")).strip()
+        if chunk_id not in expected or chunk_id in answers:
+            continue
+        verdict = str(item.get("verdict", "")).strip().upper()
+        explanation = str(item.get("explanation", "")).strip()
+        answers[chunk_id] = f"{verdict}: {explanation}"
+    
+    if not answers:
+        raise ValueError("Batch response has no verdicts for the requested chunks")
+    
+    return answers
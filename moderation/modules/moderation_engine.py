@@ -2,150 +2,743 @@
 Core moderation engine for checking files against policies
 """
 import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Dict
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+import numpy as np
+from pypdf import PdfReader
 from langchain.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.vectorstores import Chroma
 from django.conf import settings
-from .llm import get_retrieval_qa_chain
+from .llm import (
+    PROMPT_VERSION,
+    get_moderation_llm,
+    max_tokens_for_batch,
+    format_moderation_prompt,
+    format_batch_prompt,
+    parse_batch_response,
+    response_token_usage,
+    estimate_llm_cost
+)
+from .policy_store import get_policy_store_version, search_by_vectors
+from .verdict_cache import VerdictCache
+from .triage import classifier as triage_classifier
+from .. import metrics
 import logging
 
 logger = logging.getLogger('moderation')
 
 CHUNK_SIZE = settings.CHUNK_SIZE
 CHUNK_OVERLAP = settings.CHUNK_OVERLAP
+MODERATION_CONCURRENCY = settings.MODERATION_CONCURRENCY
+MODERATION_BATCH_SIZE = settings.MODERATION_BATCH_SIZE
+MODERATION_CACHE_ENABLED = settings.MODERATION_CACHE_ENABLED
+MODERATION_RELEVANCE_THRESHOLD = settings.MODERATION_RELEVANCE_THRESHOLD
+MODERATION_TRIAGE_ENABLED = settings.MODERATION_TRIAGE_ENABLED
+MODERATION_TRIAGE_OK_THRESHOLD = settings.MODERATION_TRIAGE_OK_THRESHOLD
+MODERATION_WINDOW_SIZE = settings.MODERATION_WINDOW_SIZE
 
-def load_pdf_to_chunks(file_path: str, filename: str) -> List[dict]:
+# Called as stage_callback(stage, seconds, items) after each unit of work;
+# stages are load, split, cache, embed, triage, retrieve, llm and parse
+StageCallback = Callable[[str, float, int], None]
+
+def _observe(stage_callback: Optional[StageCallback], stage: str, started: float, items: int = 1) -> float:
+    # Stage timings always go to the process metrics; the callback is extra
+    seconds = time.perf_counter() - started
+    metrics.observe_stage(stage, seconds, items)
+    if stage_callback is not None:
+        stage_callback(stage, seconds, items)
+    return seconds
+
+class LLMUsage:
     """
-    Load a PDF file, split into chunks, and return a list of dicts.
+    Token usage and latency of the LLM calls made for one file. Calls are
+    recorded from the LLM worker threads.
+    
+    A fail-fast run is summarized without waiting for the calls still in
+    flight when it stops, so its usage and cost are a lower bound.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.estimated = False
+        self.latencies = []
+    
+    def record(self, prompt: str, response, seconds: float):
+        prompt_tokens, completion_tokens, estimated = response_token_usage(prompt, response)
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.estimated = self.estimated or estimated
+            self.latencies.append(seconds)
+    
+    def summary(self) -> Dict:
+        with self._lock:
+            latencies = list(self.latencies)
+            prompt_tokens, completion_tokens = self.prompt_tokens, self.completion_tokens
+            estimated = self.estimated
+        p50, p95, p99 = (
+            np.percentile(latencies, [50, 95, 99]).tolist() if latencies else (None, None, None)
+        )
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "tokens_estimated": estimated,
+            "llm_calls": len(latencies),
+            "llm_seconds": sum(latencies),
+            "llm_latency_p50": p50,
+            "llm_latency_p95": p95,
+            "llm_latency_p99": p99,
+            "llm_cost": estimate_llm_cost(prompt_tokens, completion_tokens)
+        }
+
+def _timed_pages(pages: Iterable, stage_callback: Optional[StageCallback]) -> Iterator:
+    """
+    Report the time spent reading each page of a lazily loaded document.
+    """
+    pages = iter(pages)
+    while True:
+        started = time.perf_counter()
+        try:
+            page = next(pages)
+        except StopIteration:
+            return
+        _observe(stage_callback, "load", started)
+        yield page
+
+def iter_pdf_chunks(
+    file_path: str,
+    filename: str,
+    stage_callback: Optional[StageCallback] = None
+) -> Iterator[dict]:
+    """
+    Read a PDF one page at a time and yield chunk dicts as soon as they are
+    complete.
+    
+    The tail of each page is carried over and split again together with the
+    next page, so chunks (and their overlap) run across page boundaries.
+    Only the current page and one partial chunk are held in memory.
     
     Args:
         file_path: Path to the PDF file
         filename: Original filename
+        stage_callback: Receives 'load' timings per page and 'split'
+            timings per page with the number of pieces produced
         
-    Returns:
-        List of dictionaries containing page_content and metadata
+    Yields:
+        Dictionaries containing page_content and metadata; metadata is that
+        of the page the chunk starts on, plus chunk_id
     """
     logger.info(f"Loading PDF: {filename}")
     
-    loader = PyPDFLoader(file_path)
-    docs = loader.load()
-    
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=CHUNK_SIZE,
         chunk_overlap=CHUNK_OVERLAP
     )
-    chunks = text_splitter.split_documents(docs)
     
-    chunk_dicts = []
-    for i, chunk in enumerate(chunks):
-        metadata = chunk.metadata.copy() if hasattr(chunk, "metadata") else {}
-        metadata["chunk_id"] = f"{filename}::chunk_{i}"
-        chunk_dicts.append({
-            "page_content": chunk.page_content,
-            "metadata": metadata
-        })
+    def make_chunk(text: str, metadata: dict) -> dict:
+        nonlocal count
+        metadata = dict(metadata)
+        metadata["chunk_id"] = f"{filename}::chunk_{count}"
+        count += 1
+        return {"page_content": text, "metadata": metadata}
     
-    logger.info(f"Split {filename} into {len(chunk_dicts)} chunks")
-    return chunk_dicts
+    count = 0
+    carry = ""
+    carry_metadata = {}
+    for page in _timed_pages(PyPDFLoader(file_path).lazy_load(), stage_callback):
+        if not page.page_content.strip():
+            continue
+        if carry:
+            # A plain space, so the splitter treats the page break like any
+            # other word break and overlaps chunks across it
+            buffer = f"{carry} {page.page_content}"
+            carry_end = len(carry)
+        else:
+            buffer = page.page_content
+            carry_end = 0
+        
+        started = time.perf_counter()
+        pieces = text_splitter.split_text(buffer)
+        _observe(stage_callback, "split", started, len(pieces))
+        cursor = 0
+        for i, piece in enumerate(pieces):
+            # Pieces starting inside the carried text belong to the previous page
+            start = buffer.find(piece, cursor)
+            if start >= 0:
+                cursor = start + 1
+            metadata = carry_metadata if 0 <= start < carry_end else page.metadata
+            if i < len(pieces) - 1:
+                yield make_chunk(piece, metadata)
+            else:
+                carry, carry_metadata = piece, metadata
+    
+    if carry:
+        yield make_chunk(carry, carry_metadata)
+    
+    logger.info(f"Split {filename} into {count} chunks")
 
-def moderate_file_against_policy(policy_store: Chroma, file_path: str, filename: str, k: int = 3) -> Dict:
+def count_pdf_pages(file_path: str) -> int:
     """
-    For each chunk of the uploaded file:
-    - Retrieve top-k policy snippets from the policy store
-    - Use LLM (RetrievalQA) with custom moderation prompt to judge
-    - Parse 'VIOLATION', 'REVIEW', or 'OK' verdict
+    Count the pages of a PDF without extracting any text.
     
     Args:
-        policy_store: Chroma vectorstore with policy documents
-        file_path: Path to the file to moderate
+        file_path: Path to the PDF file
+    
+    Returns:
+        The page count, or 0 if the file cannot be parsed; reading its
+        pages then reports the actual error
+    """
+    try:
+        return len(PdfReader(file_path).pages)
+    except Exception as e:
+        logger.debug(f"Could not count the pages of {file_path}: {e}")
+        return 0
+
+def load_pdf_to_chunks(file_path: str, filename: str) -> List[dict]:
+    """
+    Load a PDF file, split into chunks, and return a list of dicts.
+    
+    Args:
+        file_path: Path to the PDF file
         filename: Original filename
+        
+    Returns:
+        List of dictionaries containing page_content and metadata
+    """
+    return list(iter_pdf_chunks(file_path, filename))
+
+def _build_outcome(idx: int, chunk: dict, answer: str, source_docs: List) -> Dict:
+    """
+    Turn an LLM answer for one chunk into a parsed verdict.
+    
+    Args:
+        idx: Position of the chunk in the file
+        chunk: Chunk dict from load_pdf_to_chunks
+        answer: Model answer in 'VIOLATION: ...' / 'REVIEW: ...' / 'OK: ...' form
+        source_docs: Policy documents the answer was based on
+        
+    Returns:
+        Dictionary with the parsed verdict ('violation', 'review' or 'ok'),
+        the violation entry to store, if any, and whether the verdict may be
+        cached (unclear answers are not)
+    """
+    query_text = chunk["page_content"].strip()
+    chunk_id = chunk["metadata"].get("chunk_id")
+    answer = answer.strip()
+    
+    # Parse response based on prompt format
+    answer_lower = answer.lower()
+    
+    if answer_lower.startswith("violation"):
+        logger.info(f"Chunk {idx}: VIOLATION detected")
+        return {
+            "verdict": "violation",
+            "cacheable": True,
+            "detail": {
+                "chunk_id": chunk_id,
+                "chunk_text": query_text[:800],  # Truncate for storage
+                "verdict": "violation",
+                "explanation": answer,
+                "sources": [d.metadata.get("source", "") for d in source_docs]
+            }
+        }
+        
+    elif answer_lower.startswith("review"):
+        logger.info(f"Chunk {idx}: REVIEW required")
+        return {
+            "verdict": "review",
+            "cacheable": True,
+            "detail": {
+                "chunk_id": chunk_id,
+                "chunk_text": query_text[:800],
+                "verdict": "review",
+                "explanation": answer,
+                "sources": [d.metadata.get("source", "") for d in source_docs]
+            }
+        }
+        
+    elif answer_lower.startswith("ok"):
+        logger.debug(f"Chunk {idx}: OK")
+        return {"verdict": "ok", "cacheable": True, "detail": None}
+        
+    else:
+        # Treat unclear responses as needing review
+        logger.warning(f"Chunk {idx}: UNCLEAR verdict, marked for REVIEW")
+        return {
+            "verdict": "review",
+            "detail": {
+                "chunk_id": chunk_id,
+                "chunk_text": query_text[:800],
+                "verdict": "review",
+                "explanation": f"REVIEW: Unclear moderation result - {answer}",
+                "sources": []
+            }
+        }
+
+def _cached_outcome(chunk: dict, entry: Dict) -> Dict:
+    """
+    Build the outcome for a chunk answered from the verdict cache.
+    """
+    if entry["verdict"] == "ok":
+        return {"verdict": "ok", "source": "cache", "detail": None}
+    return {
+        "verdict": entry["verdict"],
+        "source": "cache",
+        "detail": {
+            "chunk_id": chunk["metadata"].get("chunk_id"),
+            "chunk_text": chunk["page_content"].strip()[:800],
+            "verdict": entry["verdict"],
+            "explanation": entry["explanation"],
+            "sources": entry["sources"]
+        }
+    }
+
+def _error_outcome(idx: int, chunk: dict, error: Exception) -> Dict:
+    """
+    Build the outcome for a chunk whose evaluation raised.
+    """
+    return {
+        "verdict": "error",
+        "detail": {
+            "chunk_id": chunk["metadata"].get("chunk_id"),
+            "chunk_text": chunk["page_content"].strip()[:800],
+            "verdict": "error",
+            "explanation": str(error),
+            "sources": []
+        }
+    }
+
+def _evaluate_chunk(
+    llm,
+    idx: int,
+    chunk: dict,
+    context_docs: List,
+    total: int,
+    stage_callback: Optional[StageCallback] = None,
+    usage: Optional[LLMUsage] = None
+) -> Dict:
+    """
+    Judge a single chunk against its retrieved policy context.
+    
+    Args:
+        llm: Chat model instance
+        idx: Position of the chunk in the file
+        chunk: Chunk dict from load_pdf_to_chunks
+        context_docs: Policy documents retrieved for the chunk
+        total: Total number of chunks (for logging)
+        stage_callback: Receives 'llm' and 'parse' timings
+        usage: Records the call's tokens and latency
+        
+    Returns:
+        Parsed outcome (see _build_outcome); 'error' if the call failed
+    """
+    query_text = chunk["page_content"].strip()
+    logger.debug(f"Moderating chunk {idx}/{total}: len={len(query_text)}")
+    
+    try:
+        # Send chunk and its policy context to the LLM
+        prompt = format_moderation_prompt(context_docs, query_text)
+        started = time.perf_counter()
+        response = llm.invoke(prompt)
+        seconds = _observe(stage_callback, "llm", started)
+        if usage is not None:
+            usage.record(prompt, response, seconds)
+        started = time.perf_counter()
+        outcome = _build_outcome(idx, chunk, response.content, context_docs)
+        _observe(stage_callback, "parse", started)
+        return outcome
+    except Exception as e:
+        logger.exception(f"Error moderating chunk {idx}")
+        metrics.LLM_ERRORS.inc(call="chunk", error=type(e).__name__)
+        return _error_outcome(idx, chunk, e)
+
+def _evaluate_batch(
+    llm,
+    batch: List,
+    total: int,
+    stage_callback: Optional[StageCallback] = None,
+    usage: Optional[LLMUsage] = None
+) -> List[Dict]:
+    """
+    Moderate several chunks with a single LLM request.
+    
+    The chunks share one prompt containing the union of their retrieved
+    policy snippets. Chunks missing from the answer, or every chunk if the
+    answer cannot be parsed, are re-evaluated one by one.
+    
+    Args:
+        llm: Chat model instance
+        batch: List of (idx, chunk, context_docs) tuples
+        total: Total number of chunks (for logging)
+        stage_callback: Receives 'llm' and 'parse' timings
+        usage: Records the tokens and latency of every call made
+        
+    Returns:
+        List of parsed outcomes in batch order
+    """
+    if len(batch) == 1:
+        idx, chunk, context_docs = batch[0]
+        return [_evaluate_chunk(llm, idx, chunk, context_docs, total, stage_callback, usage)]
+    
+    logger.debug(f"Moderating batch of {len(batch)} chunks starting at {batch[0][0]}/{total}")
+    
+    answers = {}
+    try:
+        union_docs = []
+        seen = set()
+        for _, _, context_docs in batch:
+            for doc in context_docs:
+                if doc.page_content not in seen:
+                    seen.add(doc.page_content)
+                    union_docs.append(doc)
+        
+        batch_ids = [f"chunk_{idx}" for idx, _, _ in batch]
+        prompt = format_batch_prompt(
+            union_docs,
+            [(f"chunk_{idx}", chunk["page_content"].strip()) for idx, chunk, _ in batch]
+        )
+        started = time.perf_counter()
+        response = llm.invoke(prompt)
+        seconds = _observe(stage_callback, "llm", started, len(batch))
+        if usage is not None:
+            usage.record(prompt, response, seconds)
+        started = time.perf_counter()
+        answers = parse_batch_response(response.content, batch_ids)
+        _observe(stage_callback, "parse", started, len(answers))
+    except Exception as e:
+        logger.warning(f"Batch starting at chunk {batch[0][0]} failed, "
+                       f"falling back to single-chunk calls: {e}")
+        metrics.LLM_ERRORS.inc(call="batch", error=type(e).__name__)
+    
+    outcomes = []
+    for idx, chunk, context_docs in batch:
+        answer = answers.get(f"chunk_{idx}")
+        if answer is None:
+            outcomes.append(_evaluate_chunk(llm, idx, chunk, context_docs, total, stage_callback, usage))
+        else:
+            outcomes.append(_build_outcome(idx, chunk, answer, context_docs))
+    return outcomes
+
+def embed_chunks(policy_store: Chroma, chunks: List[dict]) -> List[List[float]]:
+    """
+    Embed many chunks with one batched call to the store's embedding model.
+    """
+    if not chunks:
+        return []
+    texts = [chunk["page_content"].strip() for chunk in chunks]
+    return policy_store.embeddings.embed_documents(texts)
+
+def retrieve_policy_context(policy_store: Chroma, chunks: List[dict], k: int, vectors=None) -> List[List]:
+    """
+    Retrieve the top-k policy snippets for many chunks at once.
+    
+    All chunk texts are embedded in one batched call and searched with a
+    single Chroma query instead of one embedding pass and query per chunk.
+    
+    Args:
+        policy_store: Chroma vectorstore with policy documents
+        chunks: Chunk dicts from load_pdf_to_chunks
         k: Number of policy chunks to retrieve for each file chunk
+        vectors: Precomputed embeddings of the chunks, if available
         
     Returns:
-        Dictionary with moderation results
+        For each chunk, a list of (Document, relevance) pairs, most relevant first
+    """
+    if not chunks:
+        return []
+    
+    if vectors is None:
+        vectors = embed_chunks(policy_store, chunks)
+    return search_by_vectors(policy_store, vectors, k)
+
+def default_moderation_settings() -> Dict:
+    """
+    Settings a moderation run with default arguments would use that change
+    its verdicts besides the policy store and prompt: the triage classifier
+    version (empty when triage is off or no model is trained) and the
+    relevance gate threshold.
+    """
+    return {
+        "triage_model_version": triage_classifier.get()[1] if MODERATION_TRIAGE_ENABLED else "",
+        "relevance_threshold": MODERATION_RELEVANCE_THRESHOLD
+    }
+
+def iter_moderation_events(
+    policy_store: Chroma,
+    file_path: str,
+    filename: str,
+    tenant: str,
+    k: int = 3,
+    concurrency: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    use_cache: Optional[bool] = None,
+    relevance_threshold: Optional[float] = None,
+    use_triage: Optional[bool] = None,
+    fail_fast: bool = False,
+    llm=None,
+    stage_callback: Optional[StageCallback] = None
+) -> Iterator[Dict]:
+    """
+    Moderate a file and yield events as work completes.
+    
+    Events, in order:
+    - {'type': 'start', 'filename', 'total_pages'} before any page is read
+    - {'type': 'chunk', 'index', 'chunk_id', 'verdict', 'explanation',
+      'source', 'done', 'total'} each time a chunk gets a verdict, in
+      completion order; source is 'llm', 'cache', 'triage' or 'relevance_gate'.
+      The file is read as a stream, so until its last page has been read
+      'total' is extrapolated from the pages read so far.
+    - {'type': 'summary', 'result'} with the moderate_file_against_policy result
+    
+    Closing the generator early cancels queued LLM requests.
+    See moderate_file_against_policy for the arguments.
     """
     logger.info(f"Starting moderation for: {filename}")
+    run_started = time.perf_counter()
+    
+    if concurrency is None:
+        concurrency = MODERATION_CONCURRENCY
+    concurrency = max(1, concurrency)
+    if batch_size is None:
+        batch_size = MODERATION_BATCH_SIZE
+    batch_size = max(1, batch_size)
+    if use_cache is None:
+        use_cache = MODERATION_CACHE_ENABLED
+    if relevance_threshold is None:
+        relevance_threshold = MODERATION_RELEVANCE_THRESHOLD
+    if use_triage is None:
+        use_triage = MODERATION_TRIAGE_ENABLED
+    
+    # Enough chunks per window to keep every LLM slot busy
+    window_size = max(MODERATION_WINDOW_SIZE, concurrency * batch_size)
+    logger.info(f"Streaming {filename} through moderation "
+                f"(concurrency={concurrency}, batch_size={batch_size}, window={window_size})")
     
-    # Load file into chunks
-    chunks = load_pdf_to_chunks(file_path, filename)
-    logger.info(f"Processing {len(chunks)} chunks for moderation")
+    # Initialize the LLM
+    if llm is None:
+        llm = get_moderation_llm(max_tokens=max_tokens_for_batch(batch_size))
     
-    # Initialize the RetrievalQA chain
-    chain = get_retrieval_qa_chain(policy_store, k=k, chain_type="stuff")
+    # Recorded on the result so identical resubmissions can be matched to it
+    policy_version = get_policy_store_version(tenant)
+    cache = VerdictCache(tenant, policy_version, PROMPT_VERSION, k) if use_cache else None
+    triage_version = triage_classifier.get()[1] if use_triage else ""
     
+    counts = {"violation": 0, "review": 0, "ok": 0}
+    usage = LLMUsage()
     violations = []
-    allowed_count = 0
-    review_count = 0
-    violation_count = 0
-    
-    for idx, chunk in enumerate(chunks):
-        query_text = chunk["page_content"].strip()
-        if not query_text:
-            logger.debug(f"Skipping empty chunk {idx}")
-            continue
+    auto_cleared_ids = []
+    triaged_ids = []
+    evaluated = 0
+    cache_hits = 0
+    cache_misses = 0
+    llm_chunks = 0
+    stopped_early = False
+    
+    read = 0
+    pages_read = 0
+    total_pages = 0
+    reading = True
+    done = 0
+    
+    def estimated_total() -> int:
+        if reading and pages_read and total_pages > pages_read:
+            return max(read, round(read * total_pages / pages_read))
+        return read
+    
+    def chunk_event(idx: int, chunk: dict, outcome: Dict) -> Dict:
+        nonlocal done, evaluated
+        done += 1
+        evaluated += 1
+        counts[outcome["verdict"]] = counts.get(outcome["verdict"], 0) + 1
+        metrics.CHUNKS.inc(verdict=outcome["verdict"], source=outcome.get("source", "llm"))
+        detail = outcome["detail"] or {}
+        return {
+            "type": "chunk",
+            "index": idx,
+            "chunk_id": chunk["metadata"].get("chunk_id"),
+            "verdict": outcome["verdict"],
+            "explanation": detail.get("explanation", ""),
+            "source": outcome.get("source", "llm"),
+            "done": done,
+            "total": estimated_total()
+        }
+    
+    def read_chunks():
+        # Yields every chunk, empty ones included, so skipped ones still count as done
+        nonlocal read, pages_read, total_pages, reading
+        for idx, chunk in enumerate(iter_pdf_chunks(file_path, filename, stage_callback)):
+            read += 1
+            total_pages = chunk["metadata"].get("total_pages", total_pages)
+            pages_read = max(pages_read, chunk["metadata"].get("page", 0) + 1)
+            yield idx, chunk
+        reading = False
+    
+    def moderate_window(pending: List) -> Iterator[Dict]:
+        nonlocal cache_hits, cache_misses, llm_chunks, stopped_early
+        resolved = {}
+        
+        # Answer previously seen chunks from the verdict cache
+        cache_keys = {}
+        if cache is not None:
+            started = time.perf_counter()
+            cache_keys = {idx: cache.key_for(chunk["page_content"]) for idx, chunk in pending}
+            cached = cache.get_many(cache_keys.values())
+            _observe(stage_callback, "cache", started, len(pending))
+            for idx, chunk in pending:
+                entry = cached.get(cache_keys[idx])
+                if entry is not None:
+                    resolved[idx] = _cached_outcome(chunk, entry)
+                    yield chunk_event(idx, chunk, resolved[idx])
+            cache_hits += len(resolved)
+            cache_misses += len(pending) - len(resolved)
+            metrics.CACHE_LOOKUPS.inc(len(resolved), cache="verdict", result="hit")
+            metrics.CACHE_LOOKUPS.inc(len(pending) - len(resolved), cache="verdict", result="miss")
+        
+        to_evaluate = [(idx, chunk) for idx, chunk in pending if idx not in resolved]
+        if fail_fast and any(o["verdict"] == "violation" for o in resolved.values()):
+            logger.info("Fail-fast: violation found in verdict cache, skipping LLM evaluation")
+            stopped_early = True
+            to_evaluate = []
+        
+        # Embed the window in one pass
+        started = time.perf_counter()
+        vectors = embed_chunks(policy_store, [chunk for _, chunk in to_evaluate])
+        _observe(stage_callback, "embed", started, len(to_evaluate))
         
-        logger.debug(f"Moderating chunk {idx}/{len(chunks)}: len={len(query_text)}")
+        # Chunks the triage classifier is confident about skip retrieval and the LLM
+        if use_triage and to_evaluate:
+            started = time.perf_counter()
+            ok_proba = triage_classifier.ok_probabilities(vectors)
+            _observe(stage_callback, "triage", started, len(to_evaluate))
+            if ok_proba is not None:
+                escalated = []
+                escalated_vectors = []
+                for (idx, chunk), vector, p_ok in zip(to_evaluate, vectors, ok_proba):
+                    if p_ok >= MODERATION_TRIAGE_OK_THRESHOLD:
+                        resolved[idx] = {"verdict": "ok", "source": "triage", "detail": None}
+                        triaged_ids.append(chunk["metadata"].get("chunk_id"))
+                        yield chunk_event(idx, chunk, resolved[idx])
+                    else:
+                        escalated.append((idx, chunk))
+                        escalated_vectors.append(vector)
+                logger.debug(f"Triage classifier {triage_version} cleared "
+                             f"{len(to_evaluate) - len(escalated)} chunks, escalating {len(escalated)}")
+                to_evaluate, vectors = escalated, escalated_vectors
+        
+        # Search the window with one query
+        started = time.perf_counter()
+        matches = retrieve_policy_context(
+            policy_store, [chunk for _, chunk in to_evaluate], k, vectors=vectors
+        )
+        _observe(stage_callback, "retrieve", started, len(to_evaluate))
+        
+        # Chunks far from every policy are cleared without calling the LLM
+        gated = []
+        for (idx, chunk), chunk_matches in zip(to_evaluate, matches):
+            top_score = chunk_matches[0][1] if chunk_matches else 0.0
+            if relevance_threshold is not None and top_score < relevance_threshold:
+                logger.debug(f"Chunk {idx}: auto-cleared (top relevance {top_score:.3f})")
+                resolved[idx] = {"verdict": "ok", "source": "relevance_gate", "detail": None}
+                auto_cleared_ids.append(chunk["metadata"].get("chunk_id"))
+                yield chunk_event(idx, chunk, resolved[idx])
+                continue
+            gated.append((idx, chunk, [doc for doc, _ in chunk_matches]))
+        to_evaluate = gated
+        batches = [to_evaluate[i:i + batch_size] for i in range(0, len(to_evaluate), batch_size)]
+        
+        # llm_chunks counts chunks sent to the LLM, so batches skipped by an early stop are left out
+        def send(batch):
+            nonlocal llm_chunks
+            llm_chunks += len(batch)
+            return _evaluate_batch(llm, batch, estimated_total(), stage_callback, usage)
+        
+        if executor is None or len(batches) <= 1:
+            results = ((batch, send(batch)) for batch in batches)
+        else:
+            llm_chunks += len(to_evaluate)
+            futures = {
+                executor.submit(_evaluate_batch, llm, batch, estimated_total(), stage_callback, usage): batch
+                for batch in batches
+            }
+            results = (
+                (futures[future], future.result()) for future in as_completed(futures)
+            )
         
         try:
-            # Send chunk to LLM via RetrievalQA chain
-            result = chain({"query": query_text})
-            answer = result.get("result", "").strip()
-            source_docs = result.get("source_documents", [])
-            
-            # Parse response based on prompt format
-            answer_lower = answer.lower()
-            
-            if answer_lower.startswith("violation"):
-                violation_count += 1
-                violations.append({
-                    "chunk_id": chunk["metadata"].get("chunk_id"),
-                    "chunk_text": query_text[:800],  # Truncate for storage
-                    "verdict": "violation",
-                    "explanation": answer,
-                    "sources": [d.metadata.get("source", "") for d in source_docs]
-                })
-                logger.info(f"Chunk {idx}: VIOLATION detected")
-                
-            elif answer_lower.startswith("review"):
-                review_count += 1
-                violations.append({
-                    "chunk_id": chunk["metadata"].get("chunk_id"),
-                    "chunk_text": query_text[:800],
-                    "verdict": "review",
-                    "explanation": answer,
-                    "sources": [d.metadata.get("source", "") for d in source_docs]
-                })
-                logger.info(f"Chunk {idx}: REVIEW required")
-                
-            elif answer_lower.startswith("ok"):
-                allowed_count += 1
-                logger.debug(f"Chunk {idx}: OK")
-                
-            else:
-                # Treat unclear responses as needing review
-                review_count += 1
-                violations.append({
-                    "chunk_id": chunk["metadata"].get("chunk_id"),
-                    "chunk_text": query_text[:800],
-                    "verdict": "review",
-                    "explanation": f"REVIEW: Unclear moderation result - {answer}",
-                    "sources": []
-                })
-                logger.warning(f"Chunk {idx}: UNCLEAR verdict, marked for REVIEW")
-                
-        except Exception as e:
-            logger.exception(f"Error moderating chunk {idx}")
-            violations.append({
-                "chunk_id": chunk["metadata"].get("chunk_id"),
-                "chunk_text": query_text[:800],
-                "verdict": "error",
-                "explanation": str(e),
-                "sources": []
-            })
+            for batch, batch_result in results:
+                for (idx, chunk, _), outcome in zip(batch, batch_result):
+                    resolved[idx] = outcome
+                    yield chunk_event(idx, chunk, outcome)
+                if fail_fast and any(o["verdict"] == "violation" for o in batch_result):
+                    stopped_early = True
+                    break
+        finally:
+            if executor is not None and len(batches) > 1:
+                # Drop this window's queued batches if we stopped early
+                for future, batch in futures.items():
+                    if future.cancel():
+                        llm_chunks -= len(batch)
+        
+        if cache is not None:
+            new_entries = {}
+            for idx, _, _ in to_evaluate:
+                outcome = resolved.get(idx)
+                if outcome is None or not outcome.get("cacheable"):
+                    continue
+                detail = outcome["detail"] or {}
+                new_entries[cache_keys[idx]] = {
+                    "verdict": outcome["verdict"],
+                    "explanation": detail.get("explanation", ""),
+                    "sources": detail.get("sources", [])
+                }
+            cache.set_many(new_entries)
+        
+        # Report violations in chunk order regardless of completion order
+        for idx in sorted(resolved):
+            if resolved[idx]["detail"] is not None:
+                violations.append(resolved[idx]["detail"])
+    
+    # Announce the page count before reading: with chunks carried across
+    # pages, the first chunk may only be complete after several pages
+    total_pages = count_pdf_pages(file_path)
+    yield {"type": "start", "filename": filename, "total_pages": total_pages}
     
-    total_chunks = len(chunks)
+    executor = ThreadPoolExecutor(max_workers=concurrency) if concurrency > 1 else None
+    completed = False
+    try:
+        window = []
+        for idx, chunk in read_chunks():
+            if not chunk["page_content"].strip():
+                logger.debug(f"Skipping empty chunk {idx}")
+                done += 1
+                continue
+            window.append((idx, chunk))
+            if len(window) >= window_size:
+                yield from moderate_window(window)
+                window = []
+                if stopped_early:
+                    break
+        if window and not stopped_early:
+            yield from moderate_window(window)
+        completed = True
+    finally:
+        if executor is not None:
+            # On an early stop (or a closed stream), don't wait for in-flight requests
+            executor.shutdown(wait=completed and not stopped_early, cancel_futures=True)
+    
+    if stopped_early:
+        logger.info(f"Fail-fast: violation confirmed, stopped after {evaluated} chunks")
+    
+    violation_count = counts["violation"]
+    review_count = counts["review"]
+    allowed_count = counts["ok"]
+    total_chunks = estimated_total()
     
     # Determine verdict based on violation and review counts
     if violation_count > 0:
@@ -164,6 +757,21 @@ def moderate_file_against_policy(policy_store: Chroma, file_path: str, filename:
         "allowed_chunks": allowed_count,
         "review_chunks": review_count,
         "violation_chunks": violation_count,
+        "evaluated_chunks": evaluated,
+        "stopped_early": stopped_early,
+        "cache_hits": cache_hits,
+        "cache_misses": cache_misses,
+        "llm_chunks": llm_chunks,
+        "auto_cleared_chunks": len(auto_cleared_ids),
+        "auto_cleared_chunk_ids": auto_cleared_ids,
+        "triaged_chunks": len(triaged_ids),
+        "triaged_chunk_ids": triaged_ids,
+        "triage_model_version": triage_version,
+        "relevance_threshold": relevance_threshold,
+        "policy_version": policy_version,
+        "prompt_version": PROMPT_VERSION,
+        **usage.summary(),
+        "processing_seconds": time.perf_counter() - run_started,
         "violations": violations
     }
     
@@ -171,4 +779,105 @@ def moderate_file_against_policy(policy_store: Chroma, file_path: str, filename:
                 f"violations={violation_count}, reviews={review_count}, "
                 f"allowed={allowed_count}/{total_chunks}")
     
-    return result
\ No newline at end of file
+    yield {"type": "summary", "result": result}
+
+def moderate_file_against_policy(
+    policy_store: Chroma,
+    file_path: str,
+    filename: str,
+    tenant: str,
+    k: int = 3,
+    concurrency: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    use_cache: Optional[bool] = None,
+    relevance_threshold: Optional[float] = None,
+    use_triage: Optional[bool] = None,
+    fail_fast: bool = False,
+    progress_callback: Optional[Callable[[int, int], None]] = None,
+    llm=None,
+    stage_callback: Optional[StageCallback] = None
+) -> Dict:
+    """
+    For each chunk of the uploaded file:
+    - Retrieve top-k policy snippets from the policy store
+    - Use LLM with custom moderation prompt to judge
+    - Parse 'VIOLATION', 'REVIEW', or 'OK' verdict
+    
+    The file is read as a stream (see iter_pdf_chunks) and processed in
+    windows of MODERATION_WINDOW_SIZE chunks: each window is embedded with
+    one batched call and searched with one Chroma query, so memory use does
+    not grow with the length of the file.
+    
+    Chunks are evaluated on a bounded thread pool; violations are reported
+    in chunk order regardless of completion order. With batch_size > 1, each
+    LLM request judges up to batch_size chunks at once. Chunks whose text
+    was already judged against the same policy store version are answered
+    from the verdict cache without calling the LLM. Chunks whose closest
+    policy snippet scores below relevance_threshold are auto-cleared as OK
+    without calling the LLM. With use_triage, chunks the local triage
+    classifier confidently considers compliant are also cleared; only
+    uncertain or likely-violating chunks are escalated to the LLM.
+    
+    With fail_fast, no further work is scheduled once a chunk is judged a
+    VIOLATION, queued LLM requests are cancelled and in-flight ones are
+    abandoned; evaluated_chunks reports how many chunks got a verdict and
+    total_chunks is extrapolated from the pages read.
+    
+    The result also accounts for the LLM work: prompt and completion tokens
+    (estimated with tiktoken when the backend reports none, flagged by
+    tokens_estimated), the number of calls, their total time and
+    p50/p95/p99 latency, the estimated cost, and processing_seconds for
+    the whole file.
+    
+    Args:
+        policy_store: Chroma vectorstore with policy documents
+        file_path: Path to the file to moderate
+        filename: Original filename
+        tenant: Policy store partition the store was loaded for
+        k: Number of policy chunks to retrieve for each file chunk
+        concurrency: Maximum number of LLM requests in flight
+            (defaults to settings.MODERATION_CONCURRENCY)
+        batch_size: Number of chunks per LLM request
+            (defaults to settings.MODERATION_BATCH_SIZE)
+        use_cache: Whether to use the verdict cache
+            (defaults to settings.MODERATION_CACHE_ENABLED)
+        relevance_threshold: Minimum top-1 retrieval relevance for a chunk to
+            be sent to the LLM (defaults to settings.MODERATION_RELEVANCE_THRESHOLD;
+            None disables the gate)
+        use_triage: Whether to apply the triage classifier first
+            (defaults to settings.MODERATION_TRIAGE_ENABLED)
+        fail_fast: Stop at the first confirmed violation
+        progress_callback: Called as progress_callback(done, total) from the
+            calling thread each time a chunk finishes
+        llm: Chat model to use (defaults to get_moderation_llm())
+        stage_callback: Called as stage_callback(stage, seconds, items) after
+            each unit of work; 'llm' and 'parse' are reported from the LLM
+            worker threads, so it must be thread-safe. The same timings are
+            always recorded in moderation.metrics
+        
+    Returns:
+        Dictionary with moderation results
+    """
+    events = iter_moderation_events(
+        policy_store,
+        file_path,
+        filename,
+        tenant,
+        k=k,
+        concurrency=concurrency,
+        batch_size=batch_size,
+        use_cache=use_cache,
+        relevance_threshold=relevance_threshold,
+        use_triage=use_triage,
+        fail_fast=fail_fast,
+        llm=llm,
+        stage_callback=stage_callback
+    )
+    
+    result = None
+    for event in events:
+        if event["type"] == "summary":
+            result = event["result"]
+        elif event["type"] == "chunk" and progress_callback:
+            progress_callback(event["done"], event["total"])
+    return result
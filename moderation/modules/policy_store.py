@@ -1,132 +1,766 @@
 """
 Policy store management using Chroma vector database
 """
+import hashlib
+import multiprocessing
 import os
 import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
 from langchain.vectorstores import Chroma
 from langchain.embeddings import HuggingFaceEmbeddings
 from langchain.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
 from django.conf import settings
+from .. import metrics
 import logging
 
 logger = logging.getLogger('moderation')
 
 POLICY_STORE_DIR = str(settings.POLICY_STORE_DIR)
+POLICY_STORE_VERSION_DIR = str(settings.POLICY_STORE_VERSION_DIR)
 EMBEDDING_MODEL = settings.EMBEDDING_MODEL
 CHUNK_SIZE = settings.CHUNK_SIZE
 CHUNK_OVERLAP = settings.CHUNK_OVERLAP
+POLICY_INGEST_WORKERS = settings.POLICY_INGEST_WORKERS
+EMBED_BATCH_SIZE = settings.POLICY_EMBED_BATCH_SIZE
+POLICY_STORE_CACHE_SIZE = settings.POLICY_STORE_CACHE_SIZE
 
-def get_embeddings():
+# Fallback for Chroma's per-call limit on ids
+WRITE_BATCH_SIZE = 5000
+
+
+def tenant_for_user(user) -> str:
+    """
+    Name of the policy store partition owned by a user.
+    """
+    return f"user_{user.pk}"
+
+
+def tenant_store_dir(tenant: str) -> str:
     """
-    Get embedding function
+    Directory holding a tenant's Chroma store.
     """
-    return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+    return os.path.join(POLICY_STORE_DIR, tenant)
+
 
-def build_or_update_policy_store(file_paths: List[str]) -> Chroma:
+def get_policy_store_version(tenant: str) -> str:
     """
-    Load policy PDFs, split into chunks, embed, and persist to policy_store.
-    Appends to existing store if present.
+    Read the current version token of a tenant's policy store.
+    
+    The token lives in a small file outside the store so that every worker
+    process can tell when another process has rebuilt or cleared the store.
     
-    Args:
-        file_paths: List of file paths to policy PDFs
-        
     Returns:
-        Chroma vectorstore instance
+        Version token, or an empty string if the store was never written
     """
-    logger.info(f"Building/updating policy store with {len(file_paths)} files")
+    try:
+        with open(os.path.join(POLICY_STORE_VERSION_DIR, tenant)) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return ""
+
+
+def bump_policy_store_version(tenant: str) -> str:
+    """
+    Write a new version token for a tenant's policy store, invalidating every
+    cached copy of it.
     
-    # Load all documents
-    docs = []
-    for file_path in file_paths:
-        try:
-            loader = PyPDFLoader(file_path)
-            docs.extend(loader.load())
-            logger.debug(f"Loaded {file_path}")
-        except Exception as e:
-            logger.error(f"Error loading {file_path}: {e}")
-            raise
+    Returns:
+        The new version token
+    """
+    os.makedirs(POLICY_STORE_VERSION_DIR, exist_ok=True)
+    version = uuid.uuid4().hex
+    path = os.path.join(POLICY_STORE_VERSION_DIR, tenant)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(version)
+    os.replace(tmp_path, path)
+    logger.info(f"Policy store version for {tenant} bumped to {version}")
+    return version
+
+
+def _release_chroma_client(persist_directory: str):
+    """
+    Make Chroma forget its process-wide client for a persist directory, so
+    the next store opened there reads the directory again instead of
+    reusing in-memory state. Stores already open keep their client.
+    """
+    from chromadb.api.shared_system_client import SharedSystemClient
+    SharedSystemClient._identifier_to_system.pop(persist_directory, None)
+
+
+class _ChromaCollection:
+    """
+    Direct access to the Chroma collection behind a LangChain store.
+    
+    LangChain's wrapper has no bulk write with precomputed embeddings, no
+    count and no batched query by vector, so these go to the underlying
+    collection. This is the only place that touches the wrapper's private
+    attributes.
+    """
+    
+    def __init__(self, store: Chroma):
+        self._store = store
+        self._collection = store._collection
+    
+    def get(self, **kwargs) -> Dict:
+        return self._collection.get(**kwargs)
+    
+    def upsert(self, **kwargs):
+        self._collection.upsert(**kwargs)
+    
+    def update(self, **kwargs):
+        self._collection.update(**kwargs)
+    
+    def delete(self, ids: List[str]):
+        self._collection.delete(ids=ids)
+    
+    def count(self) -> int:
+        return self._collection.count()
+    
+    def query(self, **kwargs) -> Dict:
+        return self._collection.query(**kwargs)
+    
+    def max_batch_size(self) -> int:
+        client = getattr(self._store, "_client", None)
+        if hasattr(client, "get_max_batch_size"):
+            return client.get_max_batch_size()
+        return WRITE_BATCH_SIZE
+    
+    def relevance_score_fn(self) -> Callable[[float], float]:
+        select = getattr(self._store, "_select_relevance_score_fn", None)
+        if select is not None:
+            return select()
+        # LangChain's default for Chroma's default l2 space
+        return Chroma._euclidean_relevance_score_fn
+
+
+class _CachedStore:
+    __slots__ = ("store", "version", "leases")
+    
+    def __init__(self, store: Chroma, version: str):
+        self.store = store
+        self.version = version
+        self.leases = 0
+
+class PolicyStoreRegistry:
+    """
+    Process-wide cache for the embedding model and the tenants' Chroma stores.
+    
+    The embedding model is loaded once per process and kept for its lifetime.
+    Each tenant's store is reused for as long as its on-disk version token is
+    unchanged; a version change (made by this or any other worker) drops that
+    tenant's cached client so the next caller reopens the store from disk.
+    Other tenants' stores are not affected.
+    
+    Callers hold a store between acquire() and release() (see
+    open_policy_store). At most max_stores stores are kept open; the least
+    recently used one that nobody holds is closed to make room, so a store
+    is never closed under a running moderation and a tenant never has two
+    clients on its directory because of eviction.
+    """
+    
+    def __init__(self, max_stores: int = POLICY_STORE_CACHE_SIZE):
+        self._lock = threading.RLock()
+        self._embeddings = None
+        self._max_stores = max(1, max_stores)
+        # tenant -> _CachedStore, least recently used first
+        self._stores = OrderedDict()
+    
+    def get_embeddings(self):
+        with self._lock:
+            if self._embeddings is None:
+                logger.info(f"Loading embedding model: {EMBEDDING_MODEL}")
+                self._embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+            return self._embeddings
+    
+    def acquire(self, tenant: str) -> Optional[Chroma]:
+        """
+        Return a tenant's cached store, reopening it if its version changed,
+        and hold it until release() is called.
+        
+        Returns:
+            Chroma vectorstore instance, or None if the store is empty
+        """
+        version = get_policy_store_version(tenant)
+        with self._lock:
+            cached = self._stores.get(tenant)
+            if cached is not None and cached.version == version:
+                metrics.CACHE_LOOKUPS.inc(cache="policy_store", result="hit")
+                self._stores.move_to_end(tenant)
+                cached.leases += 1
+                return cached.store
+            
+            metrics.CACHE_LOOKUPS.inc(cache="policy_store", result="miss")
+            self._reset_store(tenant)
+            if not policy_store_exists(tenant):
+                return None
+            
+            logger.info(f"Opening policy store for {tenant} (version={version or 'unversioned'})")
+            store = Chroma(
+                persist_directory=tenant_store_dir(tenant),
+                embedding_function=self.get_embeddings()
+            )
+            self._remember(tenant, store, version, leases=1)
+            return store
+    
+    def release(self, tenant: str, store: Chroma):
+        """
+        Stop holding a store returned by acquire().
+        """
+        with self._lock:
+            cached = self._stores.get(tenant)
+            # A store replaced by a newer version is no longer tracked
+            if cached is not None and cached.store is store and cached.leases > 0:
+                cached.leases -= 1
+            self._evict()
+    
+    def set_store(self, tenant: str, store: Chroma, version: str):
+        """
+        Install a freshly written store as the tenant's current one for this process.
+        """
+        with self._lock:
+            cached = self._stores.get(tenant)
+            if cached is not None and cached.store is store:
+                cached.version = version
+                self._stores.move_to_end(tenant)
+            else:
+                self._remember(tenant, store, version)
+    
+    def invalidate(self, tenant: str):
+        """
+        Drop a tenant's cached store. The embedding model is kept.
+        """
+        with self._lock:
+            self._reset_store(tenant)
+    
+    def _remember(self, tenant: str, store: Chroma, version: str, leases: int = 0):
+        self._reset_store(tenant)
+        cached = self._stores[tenant] = _CachedStore(store, version)
+        cached.leases = leases
+        self._evict()
+    
+    def _evict(self):
+        idle = [tenant for tenant, cached in self._stores.items() if not cached.leases]
+        # Stores in use stay open even if that takes the cache over its size
+        for tenant in idle[:max(0, len(self._stores) - self._max_stores)]:
+            logger.debug(f"Closing least recently used policy store of {tenant}")
+            del self._stores[tenant]
+            _release_chroma_client(tenant_store_dir(tenant))
+    
+    def _reset_store(self, tenant: str):
+        if self._stores.pop(tenant, None) is None:
+            return
+        # Chroma keeps one client per persist directory; drop this tenant's so
+        # a store that was removed or rebuilt on disk is not served from memory.
+        # Callers still holding the old store keep using its client.
+        _release_chroma_client(tenant_store_dir(tenant))
+
+
+registry = PolicyStoreRegistry()
+
+
+def get_embeddings():
+    """
+    Get embedding function (shared per process)
+    """
+    return registry.get_embeddings()
+
+def document_fingerprint(file_path: str) -> str:
+    """
+    SHA-256 of a policy file's bytes.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def chunk_id_for(document_key: str, text: str) -> str:
+    """
+    Stable vector ID for a policy chunk: the same text in the same document
+    always maps to the same ID, so re-ingesting it is an upsert.
+    """
+    digest = hashlib.sha256()
+    digest.update(document_key.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
+
+def load_and_split_policy(file_path: str) -> List[Document]:
+    """
+    Load a policy PDF and split it into chunks.
+    """
+    try:
+        loader = PyPDFLoader(file_path)
+        docs = loader.load()
+        logger.debug(f"Loaded {file_path}")
+    except Exception as e:
+        logger.error(f"Error loading {file_path}: {e}")
+        raise
     
-    # Split into chunks
     text_splitter = RecursiveCharacterTextSplitter(
         chunk_size=CHUNK_SIZE,
         chunk_overlap=CHUNK_OVERLAP
     )
-    texts = text_splitter.split_documents(docs)
-    logger.info(f"Split into {len(texts)} chunks")
+    return text_splitter.split_documents(docs)
+
+def _parse_policy_file(file_path: str, document_key: str, fingerprint: str) -> Dict[str, Tuple[str, Dict]]:
+    """
+    Parse stage of the ingestion pipeline; runs in a worker process.
     
-    # Get embeddings
-    embeddings = get_embeddings()
+    Returns:
+        Dictionary mapping chunk ID to (text, metadata). Identical chunks
+        within a document collapse to one ID.
+    """
+    chunks = {}
+    for chunk in load_and_split_policy(file_path):
+        chunk.metadata["document"] = document_key
+        chunk.metadata["document_fingerprint"] = fingerprint
+        chunks.setdefault(chunk_id_for(document_key, chunk.page_content), (chunk.page_content, chunk.metadata))
+    return chunks
+
+def _in_batches(items: Sequence, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def build_or_update_policy_store(
+    tenant: str,
+    file_paths: List[str],
+    document_keys: Optional[List[str]] = None,
+    replaced_keys: Optional[List[Sequence[str]]] = None,
+    workers: Optional[int] = None,
+    progress_callback: Optional[Callable[[str, int, int], None]] = None
+) -> Dict:
+    """
+    Load policy PDFs, split into chunks, embed, and persist to the tenant's
+    policy store.
     
-    # Create or update store
-    if os.path.exists(POLICY_STORE_DIR) and os.listdir(POLICY_STORE_DIR):
-        logger.info("Updating existing policy store")
-        store = Chroma(
-            persist_directory=POLICY_STORE_DIR,
-            embedding_function=embeddings
-        )
-        store.add_documents(texts)
-        store.persist()
-    else:
-        logger.info("Creating new policy store")
-        store = Chroma.from_documents(
-            texts,
-            embeddings,
-            persist_directory=POLICY_STORE_DIR
-        )
-        store.persist()
-    
-    logger.info("Policy store updated successfully")
-    return store
+    Ingestion is incremental. Every chunk is stored under a content-hash ID
+    (see chunk_id_for) and tagged with its document key and the fingerprint
+    of the file it came from. For each file:
+    - if the store already holds the document, or a document it replaces,
+      with the same fingerprint, the file is not even parsed; a replaced
+      document's chunks are taken over by retagging them
+    - otherwise only chunks with new text are embedded, chunks that are no
+      longer in the file are deleted, and unchanged chunks are kept as-is
+      or, if they belonged to a replaced document, rewritten under the new
+      key with their existing embeddings
+    
+    If a write fails, the chunks written so far are deleted again, so a
+    failed ingestion leaves the store as it was.
+    
+    The work runs as a pipeline: changed files are parsed and split on a
+    process pool, new chunks are embedded POLICY_EMBED_BATCH_SIZE at a time,
+    and vectors are written to Chroma in bulk. The function does not depend
+    on the request, so it can run inline or from a background worker.
+    
+    The store version is only bumped when vectors were added or removed,
+    so re-uploading an unchanged policy keeps the verdict cache warm.
+    
+    Args:
+        tenant: Policy store partition, see tenant_for_user
+        file_paths: List of file paths to policy PDFs
+        document_keys: Name identifying each document in the store
+            (defaults to the file's basename); ingesting a file under an
+            existing key updates that document
+        replaced_keys: For each file, keys of earlier documents it replaces;
+            their chunks are removed once the file is written
+        workers: Number of parse processes
+            (defaults to settings.POLICY_INGEST_WORKERS)
+        progress_callback: Called as progress_callback(stage, done, total)
+            with stage 'parse', 'embed' or 'write'
+    
+    Returns:
+        Dictionary with totals (new_chunks, unchanged_chunks, removed_chunks,
+        unchanged_documents) and a 'documents' list with the same counts and
+        the chunk_ids of each file
+    """
+    logger.info(f"Building/updating policy store for {tenant} with {len(file_paths)} files")
+    if document_keys is None:
+        document_keys = [os.path.basename(path) for path in file_paths]
+    if workers is None:
+        workers = POLICY_INGEST_WORKERS
+    
+    def report_progress(stage: str, done: int, total: int):
+        if progress_callback:
+            progress_callback(stage, done, total)
+    
+    embeddings = get_embeddings()
+    held = store = registry.acquire(tenant)
+    try:
+        # Skip documents whose file is already in the store
+        documents = []
+        to_parse = []
+        kept_ids, kept_metadatas = [], []
+        for position, (file_path, document_key) in enumerate(zip(file_paths, document_keys)):
+            fingerprint = document_fingerprint(file_path)
+            existing = {}
+            replaced = {}
+            if store is not None:
+                collection = _ChromaCollection(store)
+                found = collection.get(where={"document": document_key}, include=["metadatas"])
+                existing = dict(zip(found["ids"], found["metadatas"]))
+                previous = [key for key in (replaced_keys[position] if replaced_keys else []) if key != document_key]
+                if previous:
+                    found = collection.get(where={"document": {"$in": previous}}, include=["metadatas"])
+                    replaced = dict(zip(found["ids"], found["metadatas"]))
+            
+            unchanged = bool(existing) and all(
+                (m or {}).get("document_fingerprint") == fingerprint for m in existing.values()
+            )
+            if not existing and replaced and all(
+                (m or {}).get("document_fingerprint") == fingerprint for m in replaced.values()
+            ):
+                # The same file uploaded again: retag the replaced document's chunks
+                kept_ids.extend(replaced)
+                kept_metadatas.extend(
+                    {**(m or {}), "document": document_key, "source": file_path} for m in replaced.values()
+                )
+                existing, replaced, unchanged = replaced, {}, True
+            documents.append({
+                "document": document_key,
+                "new_chunks": 0,
+                "unchanged_chunks": len(existing) if unchanged else 0,
+                "removed_chunks": 0,
+                "chunk_ids": list(existing) if unchanged else [],
+                "existing": existing,
+                "replaced": replaced,
+                "unchanged": unchanged
+            })
+            if unchanged:
+                logger.info(f"{document_key} is unchanged, skipping")
+            else:
+                to_parse.append((position, file_path, document_key, fingerprint))
+        
+        # Embeddings of replaced chunks, by text, to reuse for unchanged text
+        for position, _, _, _ in to_parse:
+            document = documents[position]
+            document["reusable"] = {}
+            document["replaced_texts"] = []
+            for ids in _in_batches(list(document["replaced"]), WRITE_BATCH_SIZE):
+                found = _ChromaCollection(store).get(ids=ids, include=["embeddings", "documents"])
+                document["reusable"].update(zip(found["documents"], found["embeddings"]))
+                document["replaced_texts"].extend(found["documents"])
+        
+        # Parse stage
+        new_ids, new_texts, new_metadatas = [], [], []
+        carried_ids, carried_texts, carried_metadatas, carried_vectors = [], [], [], []
+        removed_ids = []
+        
+        def diff(position: int, chunks: Dict[str, Tuple[str, Dict]]):
+            document = documents[position]
+            existing = document["existing"]
+            reusable = document["reusable"]
+            for chunk_id, (text, metadata) in chunks.items():
+                if chunk_id in existing:
+                    # Refresh page numbers and the fingerprint without re-embedding
+                    kept_ids.append(chunk_id)
+                    kept_metadatas.append(metadata)
+                    document["unchanged_chunks"] += 1
+                elif text in reusable:
+                    carried_ids.append(chunk_id)
+                    carried_texts.append(text)
+                    carried_metadatas.append(metadata)
+                    carried_vectors.append(reusable[text])
+                    document["unchanged_chunks"] += 1
+                else:
+                    new_ids.append(chunk_id)
+                    new_texts.append(text)
+                    new_metadatas.append(metadata)
+                    document["new_chunks"] += 1
+            gone = [chunk_id for chunk_id in existing if chunk_id not in chunks]
+            removed_ids.extend(gone)
+            removed_ids.extend(document["replaced"])
+            texts = {text for text, _ in chunks.values()}
+            document["removed_chunks"] = len(gone) + sum(1 for text in document["replaced_texts"] if text not in texts)
+            document["chunk_ids"] = list(chunks)
+            logger.info(f"{document['document']}: {document['new_chunks']} new, "
+                        f"{document['unchanged_chunks']} unchanged, {document['removed_chunks']} removed chunks")
+        
+        report_progress("parse", 0, len(to_parse))
+        parse_started = time.perf_counter()
+        if workers <= 1 or len(to_parse) <= 1:
+            for done, (position, file_path, document_key, fingerprint) in enumerate(to_parse, start=1):
+                diff(position, _parse_policy_file(file_path, document_key, fingerprint))
+                report_progress("parse", done, len(to_parse))
+        else:
+            # spawn: the parent may be a threaded server holding locks a fork would copy
+            context = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=min(workers, len(to_parse)), mp_context=context) as executor:
+                futures = {
+                    executor.submit(_parse_policy_file, file_path, document_key, fingerprint): position
+                    for position, file_path, document_key, fingerprint in to_parse
+                }
+                for done, future in enumerate(as_completed(futures), start=1):
+                    diff(futures[future], future.result())
+                    report_progress("parse", done, len(to_parse))
+        if to_parse:
+            metrics.POLICY_STAGE_SECONDS.observe(time.perf_counter() - parse_started, stage="parse")
+        
+        if store is None and new_ids:
+            logger.info("Creating new policy store")
+            store = Chroma(
+                persist_directory=tenant_store_dir(tenant),
+                embedding_function=embeddings
+            )
+        
+        collection = _ChromaCollection(store) if store is not None else None
+        write_batch_size = collection.max_batch_size() if collection is not None else WRITE_BATCH_SIZE
+        written_ids = []
+        try:
+            # Unchanged text moved over from a replaced document keeps its embedding
+            for start in range(0, len(carried_ids), write_batch_size):
+                collection.upsert(
+                    ids=carried_ids[start:start + write_batch_size],
+                    embeddings=carried_vectors[start:start + write_batch_size],
+                    documents=carried_texts[start:start + write_batch_size],
+                    metadatas=carried_metadatas[start:start + write_batch_size]
+                )
+                written_ids.extend(carried_ids[start:start + write_batch_size])
+            
+            # Embed in fixed-size batches; write to Chroma in bulk, as much as the client accepts per call
+            pending_vectors = []
+            written = 0
+            report_progress("embed", 0, len(new_ids))
+            for start in range(0, len(new_ids), EMBED_BATCH_SIZE):
+                started = time.perf_counter()
+                pending_vectors.extend(embeddings.embed_documents(new_texts[start:start + EMBED_BATCH_SIZE]))
+                metrics.POLICY_STAGE_SECONDS.observe(time.perf_counter() - started, stage="embed")
+                embedded = written + len(pending_vectors)
+                report_progress("embed", embedded, len(new_ids))
+                
+                while len(pending_vectors) >= write_batch_size or (pending_vectors and embedded == len(new_ids)):
+                    count = min(len(pending_vectors), write_batch_size)
+                    started = time.perf_counter()
+                    collection.upsert(
+                        ids=new_ids[written:written + count],
+                        embeddings=pending_vectors[:count],
+                        documents=new_texts[written:written + count],
+                        metadatas=new_metadatas[written:written + count]
+                    )
+                    metrics.POLICY_STAGE_SECONDS.observe(time.perf_counter() - started, stage="write")
+                    written_ids.extend(new_ids[written:written + count])
+                    written += count
+                    pending_vectors = pending_vectors[count:]
+                    report_progress("write", written, len(new_ids))
+        except Exception:
+            if written_ids:
+                logger.warning(f"Ingestion for {tenant} failed, deleting {len(written_ids)} chunks written so far")
+                for batch in _in_batches(written_ids, write_batch_size):
+                    collection.delete(ids=batch)
+                store.persist()
+            raise
+        
+        for batch in _in_batches(removed_ids, write_batch_size):
+            collection.delete(ids=batch)
+        for ids, metadatas in zip(_in_batches(kept_ids, write_batch_size),
+                                  _in_batches(kept_metadatas, write_batch_size)):
+            collection.update(ids=ids, metadatas=metadatas)
+        
+        report = {
+            "new_chunks": len(new_ids),
+            "unchanged_chunks": sum(d["unchanged_chunks"] for d in documents),
+            "removed_chunks": sum(d["removed_chunks"] for d in documents),
+            "unchanged_documents": sum(1 for d in documents if d["unchanged"]),
+            "documents": [
+                {key: d[key] for key in ("document", "new_chunks", "unchanged_chunks", "removed_chunks", "chunk_ids")}
+                for d in documents
+            ]
+        }
+        
+        for change in ("new", "unchanged", "removed"):
+            metrics.POLICY_CHUNKS.inc(report[f"{change}_chunks"], change=change)
+        
+        if new_ids or carried_ids or removed_ids:
+            store.persist()
+            # Other workers still hold the previous contents in memory
+            registry.set_store(tenant, store, bump_policy_store_version(tenant))
+        
+        logger.info(f"Policy store for {tenant} updated: {report['new_chunks']} new, "
+                    f"{report['unchanged_chunks']} unchanged, {report['removed_chunks']} removed chunks")
+        return report
+    finally:
+        if held is not None:
+            registry.release(tenant, held)
 
-def load_policy_store() -> Chroma:
+def acquire_policy_store(tenant: str) -> Chroma:
     """
-    Load existing policy store.
+    Open a tenant's existing policy store and hold it until
+    release_policy_store is called. The store is opened once per process
+    and reused until its version changes.
+    
+    Args:
+        tenant: Policy store partition, see tenant_for_user
     
     Returns:
         Chroma vectorstore instance
-        
+    
     Raises:
-        FileNotFoundError: If policy store is empty
+        FileNotFoundError: If the tenant's policy store is empty
     """
-    embeddings = get_embeddings()
+    store = registry.acquire(tenant)
     
-    if os.path.exists(POLICY_STORE_DIR) and os.listdir(POLICY_STORE_DIR):
-        logger.info("Loading existing policy store")
-        return Chroma(
-            persist_directory=POLICY_STORE_DIR,
-            embedding_function=embeddings
-        )
-    else:
-        logger.error("Policy store is empty")
+    if store is None:
+        logger.error(f"Policy store for {tenant} is empty")
         raise FileNotFoundError("Policy store is empty. Upload policy PDFs first.")
+    
+    return store
 
-def clear_policy_store() -> bool:
+def release_policy_store(tenant: str, store: Chroma):
     """
-    Remove the persisted policy store (full reset).
+    Let the registry close a store returned by acquire_policy_store when it
+    needs the room.
+    """
+    registry.release(tenant, store)
+
+@contextmanager
+def open_policy_store(tenant: str) -> Iterator[Chroma]:
+    """
+    Hold a tenant's policy store for the duration of a with block.
+    
+    Raises:
+        FileNotFoundError: If the tenant's policy store is empty
+    """
+    store = acquire_policy_store(tenant)
+    try:
+        yield store
+    finally:
+        release_policy_store(tenant, store)
+
+def clear_policy_store(tenant: str) -> bool:
+    """
+    Remove a tenant's persisted policy store (full reset of that tenant only).
     
     Returns:
         True if successful
     """
-    logger.info("Clearing policy store")
+    logger.info(f"Clearing policy store for {tenant}")
     
-    if os.path.exists(POLICY_STORE_DIR):
-        shutil.rmtree(POLICY_STORE_DIR)
+    registry.invalidate(tenant)
+    
+    store_dir = tenant_store_dir(tenant)
+    if os.path.exists(store_dir):
+        shutil.rmtree(store_dir)
         logger.info("Policy store directory removed")
     
-    # Recreate empty directory
-    os.makedirs(POLICY_STORE_DIR, exist_ok=True)
+    bump_policy_store_version(tenant)
     logger.info("Policy store cleared successfully")
     
     return True
 
-def policy_store_exists() -> bool:
+def delete_policy_vectors(tenant: str, vector_ids: Sequence[str]) -> int:
     """
-    Check if policy store exists and has data.
+    Remove one document's chunks from a tenant's policy store.
+    
+    Only the given IDs are touched, so the cost depends on the size of the
+    document rather than of the store. If the store ends up empty it is
+    cleared entirely.
+    
+    Args:
+        tenant: Policy store partition, see tenant_for_user
+        vector_ids: Chunk IDs recorded for the document at ingestion
     
     Returns:
-        True if policy store exists and is not empty
+        Number of vectors deleted
     """
-    return os.path.exists(POLICY_STORE_DIR) and bool(os.listdir(POLICY_STORE_DIR))
\ No newline at end of file
+    if not vector_ids:
+        return 0
+    store = registry.acquire(tenant)
+    if store is None:
+        return 0
+    
+    try:
+        collection = _ChromaCollection(store)
+        present = collection.get(ids=list(vector_ids), include=[])["ids"]
+        if not present:
+            return 0
+        
+        store.delete(ids=present)
+        logger.info(f"Deleted {len(present)} vectors from policy store for {tenant}")
+        
+        if collection.count() == 0:
+            clear_policy_store(tenant)
+        else:
+            store.persist()
+            # Other workers still hold the deleted chunks in memory
+            registry.set_store(tenant, store, bump_policy_store_version(tenant))
+        return len(present)
+    finally:
+        registry.release(tenant, store)
+
+def delete_policy_documents(tenant: str, document_keys: Sequence[str]) -> int:
+    """
+    Remove every chunk tagged with one of the given document keys from a
+    tenant's policy store, including chunks whose IDs were never recorded
+    (e.g. of an ingestion that was cut short).
+    
+    Args:
+        tenant: Policy store partition, see tenant_for_user
+        document_keys: Keys the documents were ingested under
+    
+    Returns:
+        Number of vectors deleted
+    """
+    if not document_keys:
+        return 0
+    store = registry.acquire(tenant)
+    if store is None:
+        return 0
+    try:
+        found = _ChromaCollection(store).get(where={"document": {"$in": list(document_keys)}}, include=[])
+    finally:
+        registry.release(tenant, store)
+    return delete_policy_vectors(tenant, found["ids"])
+
+def policy_store_exists(tenant: str) -> bool:
+    """
+    Check if a tenant's policy store exists and has data.
+    
+    Returns:
+        True if the policy store exists and is not empty
+    """
+    store_dir = tenant_store_dir(tenant)
+    return os.path.exists(store_dir) and bool(os.listdir(store_dir))
+
+def search_by_vectors(store: Chroma, vectors: Sequence[Sequence[float]], k: int) -> List[List[Tuple[Document, float]]]:
+    """
+    Run a top-k similarity search for many query vectors in one Chroma call.
+    
+    Args:
+        store: Chroma vectorstore instance
+        vectors: Query embeddings, one per file chunk
+        k: Number of policy chunks to return per query
+    
+    Returns:
+        For each query, a list of (Document, relevance) pairs, most relevant
+        first. Relevance is the store's normalized score (higher is closer).
+    """
+    if not len(vectors):
+        return []
+    
+    collection = _ChromaCollection(store)
+    results = collection.query(
+        query_embeddings=[list(v) for v in vectors],
+        n_results=k,
+        include=["documents", "metadatas", "distances"]
+    )
+    
+    relevance = collection.relevance_score_fn()
+    matches = []
+    for documents, metadatas, distances in zip(
+        results["documents"], results["metadatas"], results["distances"]
+    ):
+        matches.append([
+            (Document(page_content=text, metadata=metadata or {}), relevance(distance))
+            for text, metadata, distance in zip(documents, metadatas, distances)
+        ])
+    return matches
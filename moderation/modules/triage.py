@@ -0,0 +1,126 @@
+"""
+Local triage classifier that clears obviously compliant chunks before the LLM
+"""
+import os
+import threading
+from typing import Dict, Optional, Sequence
+import joblib
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+import logging
+
+logger = logging.getLogger('moderation')
+
+TRIAGE_MODEL_DIR = str(settings.TRIAGE_MODEL_DIR)
+CURRENT_POINTER = os.path.join(TRIAGE_MODEL_DIR, 'CURRENT')
+EMBEDDING_MODEL = settings.EMBEDDING_MODEL
+
+# Label of chunks that can skip the LLM
+LABEL_OK = 0
+LABEL_FLAGGED = 1
+
+def current_triage_version() -> str:
+    """
+    Return the version of the active classifier, or '' if none was trained.
+    """
+    try:
+        with open(CURRENT_POINTER) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return ""
+
+def save_triage_model(model, metadata: Dict) -> str:
+    """
+    Persist a trained classifier as a new version and make it the active one.
+    
+    Args:
+        model: Fitted scikit-learn classifier with predict_proba
+        metadata: Training details stored next to the model
+    
+    Returns:
+        The new version string
+    """
+    os.makedirs(TRIAGE_MODEL_DIR, exist_ok=True)
+    version = timezone.now().strftime("v%Y%m%d%H%M%S")
+    path = os.path.join(TRIAGE_MODEL_DIR, f"triage-{version}.joblib")
+    joblib.dump({
+        "model": model,
+        "version": version,
+        "embedding_model": EMBEDDING_MODEL,
+        "metadata": metadata,
+    }, path)
+    
+    # Switch the pointer atomically so running workers pick up the new model
+    tmp_path = f"{CURRENT_POINTER}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        f.write(version)
+    os.replace(tmp_path, CURRENT_POINTER)
+    
+    logger.info(f"Saved triage classifier {version} to {path}")
+    return version
+
+class TriageClassifier:
+    """
+    Process-wide handle on the active triage classifier.
+    
+    The CURRENT pointer is checked on every use, so training a new version
+    (from any process) is picked up without restarting workers.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._model = None
+        self._version = None
+    
+    def get(self):
+        """
+        Return (model, version) for the active classifier, or (None, '') if
+        none is available, it failed to load or it was trained with another
+        embedding model.
+        """
+        version = current_triage_version()
+        with self._lock:
+            if version == self._version:
+                # A version that failed to load stays cached as (None, ''), not retried
+                return self._model, version if self._model is not None else ""
+            
+            self._model = None
+            self._version = version
+            if not version:
+                return None, ""
+            
+            path = os.path.join(TRIAGE_MODEL_DIR, f"triage-{version}.joblib")
+            try:
+                bundle = joblib.load(path)
+            except Exception:
+                logger.exception(f"Could not load triage classifier {version}")
+                return None, ""
+            
+            if bundle.get("embedding_model") != EMBEDDING_MODEL:
+                logger.warning(f"Triage classifier {version} was trained on "
+                               f"{bundle.get('embedding_model')}, ignoring it")
+                return None, ""
+            
+            logger.info(f"Loaded triage classifier {version}")
+            self._model = bundle["model"]
+            return self._model, version
+    
+    def ok_probabilities(self, vectors: Sequence[Sequence[float]]) -> Optional[np.ndarray]:
+        """
+        Probability that each chunk is compliant.
+        
+        Args:
+            vectors: Chunk embeddings
+        
+        Returns:
+            Array of probabilities, or None if no classifier is available
+        """
+        model, _ = self.get()
+        if model is None or not len(vectors):
+            return None
+        proba = model.predict_proba(np.asarray(vectors))
+        ok_column = list(model.classes_).index(LABEL_OK)
+        return proba[:, ok_column]
+
+classifier = TriageClassifier()
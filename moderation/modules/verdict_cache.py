@@ -0,0 +1,182 @@
+"""
+Persistent cache of LLM verdicts for previously seen chunk text
+"""
+import hashlib
+import re
+import threading
+import time
+from datetime import timedelta
+from typing import Dict, Iterable
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from ..models import VerdictCacheEntry
+import logging
+
+logger = logging.getLogger('moderation')
+
+CACHE_MAX_ENTRIES = settings.MODERATION_CACHE_MAX_ENTRIES
+CACHE_TTL = timedelta(seconds=settings.MODERATION_CACHE_TTL)
+CACHE_EVICT_INTERVAL = settings.MODERATION_CACHE_EVICT_INTERVAL
+CACHE_EVICT_BATCH_SIZE = settings.MODERATION_CACHE_EVICT_BATCH_SIZE
+
+# Keep IN (...) lists below SQLite's variable limit
+QUERY_BATCH_SIZE = 500
+
+_WHITESPACE = re.compile(r"\s+")
+
+# tenant -> time.monotonic() of this process's last eviction pass
+_last_eviction = {}
+_last_eviction_lock = threading.Lock()
+
+def _eviction_due(tenant: str) -> bool:
+    """
+    Claim this process's eviction pass for a tenant if the last one is at
+    least CACHE_EVICT_INTERVAL seconds old.
+    """
+    now = time.monotonic()
+    with _last_eviction_lock:
+        last = _last_eviction.get(tenant)
+        if last is not None and now - last < CACHE_EVICT_INTERVAL:
+            return False
+        _last_eviction[tenant] = now
+        return True
+
+def _eviction_unfinished(tenant: str):
+    """
+    Let the tenant's next write run another eviction pass straight away.
+    """
+    with _last_eviction_lock:
+        _last_eviction.pop(tenant, None)
+
+def normalize_chunk_text(text: str) -> str:
+    """
+    Normalize chunk text so that formatting-only differences share a cache key.
+    """
+    return _WHITESPACE.sub(" ", text).strip().lower()
+
+class VerdictCache:
+    """
+    Verdict lookups and writes for one moderation run.
+    
+    Keys include the tenant and its policy store version, so entries written
+    against an older store are never returned once the store changes; they
+    are purged on the tenant's next eviction pass together with expired and
+    least recently used entries. Writes trigger that pass at most once per
+    CACHE_EVICT_INTERVAL per tenant and process, so the cache can overshoot
+    MODERATION_CACHE_MAX_ENTRIES in between.
+    """
+    
+    def __init__(self, tenant: str, policy_version: str, prompt_version: str, k: int):
+        self.tenant = tenant
+        self.policy_version = policy_version
+        self.prompt_version = prompt_version
+        self.k = k
+    
+    def key_for(self, text: str) -> str:
+        digest = hashlib.sha256()
+        for part in (self.tenant, self.policy_version, self.prompt_version, str(self.k), normalize_chunk_text(text)):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+    
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Dict]:
+        """
+        Look up cached verdicts and mark them as recently used.
+        
+        Args:
+            keys: Cache keys from key_for()
+        
+        Returns:
+            Dictionary mapping key to {'verdict', 'explanation', 'sources'}
+        """
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        expired_before = timezone.now() - CACHE_TTL
+        for i in range(0, len(keys), QUERY_BATCH_SIZE):
+            entries = VerdictCacheEntry.objects.filter(
+                key__in=keys[i:i + QUERY_BATCH_SIZE],
+                policy_version=self.policy_version,
+                last_used_at__gte=expired_before
+            ).values('key', 'verdict', 'explanation', 'sources')
+            for entry in entries:
+                found[entry['key']] = entry
+        
+        hit_keys = list(found)
+        for i in range(0, len(hit_keys), QUERY_BATCH_SIZE):
+            VerdictCacheEntry.objects.filter(key__in=hit_keys[i:i + QUERY_BATCH_SIZE]).update(
+                hits=F('hits') + 1,
+                last_used_at=timezone.now()
+            )
+        return found
+    
+    def set_many(self, entries: Dict[str, Dict]):
+        """
+        Store verdicts, replacing any existing entry with the same key.
+        
+        Args:
+            entries: Dictionary mapping key to {'verdict', 'explanation', 'sources'}
+        """
+        if not entries:
+            return
+        VerdictCacheEntry.objects.bulk_create(
+            [
+                VerdictCacheEntry(
+                    key=key,
+                    tenant=self.tenant,
+                    policy_version=self.policy_version,
+                    verdict=value['verdict'],
+                    explanation=value.get('explanation', ''),
+                    sources=value.get('sources', [])
+                )
+                for key, value in entries.items()
+            ],
+            batch_size=QUERY_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['key'],
+            update_fields=['policy_version', 'verdict', 'explanation', 'sources', 'last_used_at']
+        )
+        # set_many runs once per window; the scans and deletes don't need to
+        if _eviction_due(self.tenant):
+            self.evict()
+    
+    def evict(self) -> int:
+        """
+        Drop this tenant's entries for other store versions, expired entries
+        and the least recently used entries beyond MODERATION_CACHE_MAX_ENTRIES.
+        
+        A pass deletes at most CACHE_EVICT_BATCH_SIZE entries, oldest first,
+        so it stays short however far the cache has overshot; if it stops at
+        that limit, the tenant's next write runs another pass.
+        
+        Returns:
+            Number of entries deleted
+        """
+        budget = CACHE_EVICT_BATCH_SIZE
+        deleted = 0
+        for stale in (
+            VerdictCacheEntry.objects.filter(tenant=self.tenant).exclude(policy_version=self.policy_version),
+            VerdictCacheEntry.objects.filter(last_used_at__lt=timezone.now() - CACHE_TTL),
+        ):
+            deleted += self._delete_oldest(stale, budget - deleted)
+        
+        excess = VerdictCacheEntry.objects.count() - CACHE_MAX_ENTRIES
+        if excess > 0:
+            deleted += self._delete_oldest(VerdictCacheEntry.objects.all(), min(excess, budget - deleted))
+        
+        if deleted >= budget:
+            _eviction_unfinished(self.tenant)
+        if deleted:
+            logger.debug(f"Evicted {deleted} verdict cache entries")
+        return deleted
+    
+    @staticmethod
+    def _delete_oldest(queryset, limit: int) -> int:
+        if limit <= 0:
+            return 0
+        pks = list(queryset.order_by('last_used_at').values_list('pk', flat=True)[:limit])
+        deleted = 0
+        for i in range(0, len(pks), QUERY_BATCH_SIZE):
+            count, _ = VerdictCacheEntry.objects.filter(pk__in=pks[i:i + QUERY_BATCH_SIZE]).delete()
+            deleted += count
+        return deleted
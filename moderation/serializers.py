@@ -1,13 +1,13 @@
 from rest_framework import serializers
-from .models import PolicyDocument, ModerationResult, ViolationDetail
+from .models import PolicyDocument, ModerationResult, ViolationDetail, ModerationStats
 
 class PolicyDocumentSerializer(serializers.ModelSerializer):
     user_username = serializers.CharField(source='user.username', read_only=True)
     
     class Meta:
         model = PolicyDocument
-        fields = ['id', 'user', 'user_username', 'file', 'filename', 'file_size', 'uploaded_at']
-        read_only_fields = ['id', 'user', 'uploaded_at']
+        fields = ['id', 'user', 'user_username', 'file', 'filename', 'file_size', 'status', 'error_message', 'uploaded_at']
+        read_only_fields = ['id', 'user', 'status', 'error_message', 'uploaded_at']
 
 class ViolationDetailSerializer(serializers.ModelSerializer):
     class Meta:
@@ -22,9 +22,13 @@ class ModerationResultSerializer(serializers.ModelSerializer):
     class Meta:
         model = ModerationResult
         fields = [
-            'id', 'user', 'user_username', 'file', 'file_url', 'filename', 'verdict', 'final_verdict',
-            'total_chunks', 'allowed_chunks', 'review_chunks', 'violation_chunks',
-            'created_at', 'reviewed_at', 'violations'
+            'id', 'user', 'user_username', 'file', 'file_url', 'filename', 'file_sha256', 'file_size', 'policy_version', 'triage_model_version', 'relevance_threshold', 'duplicate_of', 'verdict', 'final_verdict',
+            'status', 'mode', 'total_chunks', 'processed_chunks', 'evaluated_chunks',
+            'allowed_chunks', 'review_chunks', 'violation_chunks', 'cache_hits', 'cache_misses', 'llm_chunks', 'auto_cleared_chunks', 'auto_cleared_chunk_ids', 'triaged_chunks', 'triaged_chunk_ids',
+            'prompt_tokens', 'completion_tokens', 'tokens_estimated', 'llm_calls', 'llm_seconds',
+            'llm_latency_p50', 'llm_latency_p95', 'llm_latency_p99', 'llm_cost', 'processing_seconds',
+            'error_message', 'created_at', 'started_at', 'completed_at',
+            'reviewed_at', 'violations'
         ]
         read_only_fields = ['id', 'user', 'created_at']
     
@@ -41,16 +45,51 @@ class ModerationResultListSerializer(serializers.ModelSerializer):
     Simplified serializer for listing moderation results (without violations)
     """
     user_username = serializers.CharField(source='user.username', read_only=True)
-    violation_count = serializers.IntegerField(source='violations.count', read_only=True)
+    # Annotated on the queryset by moderation_history_view
+    violation_count = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = ModerationResult
         fields = [
-            'id', 'user_username', 'filename', 'verdict', 'final_verdict',
+            'id', 'user_username', 'filename', 'verdict', 'final_verdict', 'status',
             'total_chunks', 'allowed_chunks', 'review_chunks', 'violation_chunks',
             'violation_count', 'created_at', 'reviewed_at'
         ]
 
+class ModerationStatusSerializer(serializers.ModelSerializer):
+    """
+    Serializer for polling the progress of a moderation job
+    """
+    total_chunks = serializers.SerializerMethodField()
+    progress = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ModerationResult
+        fields = [
+            'id', 'status', 'verdict', 'processed_chunks', 'total_chunks', 'progress',
+            'error_message', 'created_at', 'started_at', 'completed_at'
+        ]
+    
+    def get_total_chunks(self, obj):
+        # Running jobs only have the worker's running estimate
+        return obj.total_chunks or obj.progress_total
+    
+    def get_progress(self, obj):
+        if obj.status == 'completed':
+            return 1.0
+        total = self.get_total_chunks(obj)
+        if not total:
+            return 0.0
+        return round(obj.processed_chunks / total, 4)
+
+class ModerationStatsSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the dashboard totals of a user
+    """
+    class Meta:
+        model = ModerationStats
+        exclude = ['id', 'user']
+
 class FinalVerdictSerializer(serializers.Serializer):
     """
     Serializer for updating final verdict
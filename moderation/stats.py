@@ -0,0 +1,131 @@
+"""
+Incrementally maintained per-user moderation statistics
+"""
+from typing import Dict, Optional
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import ModerationResult, ModerationStats, PolicyDocument
+
+# ModerationStats counter for each ModerationResult.verdict
+VERDICT_COUNTERS = {
+    'pending': 'pending_results',
+    'clean': 'clean_results',
+    'violation_found': 'violation_results',
+    'needs_review': 'review_results',
+    'error': 'error_results',
+}
+
+# ModerationStats counter for each ModerationResult.final_verdict
+FINAL_VERDICT_COUNTERS = {
+    'pending': 'awaiting_decision_results',
+    'approved': 'approved_results',
+    'rejected': 'rejected_results',
+}
+
+# ModerationResult chunk counts summed into ModerationStats fields of the same name
+CHUNK_COUNTERS = ('total_chunks', 'allowed_chunks', 'review_chunks', 'violation_chunks')
+
+SNAPSHOT_FIELDS = ('verdict', 'final_verdict') + CHUNK_COUNTERS
+
+def result_stats_snapshot(moderation_result: ModerationResult) -> Optional[Dict]:
+    """
+    Read the counted fields of a result as currently stored, before changing it.
+    
+    Call inside the transaction that saves the change and pass the snapshot
+    to update_result_stats afterwards.
+    
+    Returns:
+        Stored field values, or None if the result is not saved yet
+    """
+    if moderation_result.pk is None:
+        return None
+    return ModerationResult.objects.filter(pk=moderation_result.pk).values(*SNAPSHOT_FIELDS).first()
+
+def _contribution(snapshot: Optional[Dict]) -> Dict[str, int]:
+    """
+    What one result with these field values adds to its owner's counters.
+    """
+    if snapshot is None:
+        return {}
+    
+    contribution = {'total_results': 1}
+    verdict_counter = VERDICT_COUNTERS.get(snapshot['verdict'])
+    if verdict_counter:
+        contribution[verdict_counter] = 1
+    final_counter = FINAL_VERDICT_COUNTERS.get(snapshot['final_verdict'])
+    if final_counter:
+        contribution[final_counter] = 1
+    for field in CHUNK_COUNTERS:
+        contribution[field] = snapshot[field] or 0
+    return contribution
+
+def update_result_stats(moderation_result: ModerationResult, before: Optional[Dict] = None):
+    """
+    Apply the change from `before` to the result's current values to its
+    owner's counters. Call in the same transaction as the save.
+    
+    Args:
+        moderation_result: Result that was created or changed
+        before: Snapshot from result_stats_snapshot, None for a new result
+    """
+    after = {field: getattr(moderation_result, field) for field in SNAPSHOT_FIELDS}
+    old = _contribution(before)
+    new = _contribution(after)
+    deltas = {
+        field: new.get(field, 0) - old.get(field, 0)
+        for field in set(old) | set(new)
+    }
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    
+    updated = ModerationStats.objects.filter(user_id=moderation_result.user_id).update(
+        updated_at=timezone.now(),
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+    if not updated:
+        # No row yet: count from scratch, which already includes this change
+        recompute_stats(moderation_result.user_id)
+
+def refresh_policy_count(user_id: int):
+    """
+    Recount a user's policy documents after adding or deleting some.
+    """
+    policy_count = PolicyDocument.objects.filter(user_id=user_id).count()
+    updated = ModerationStats.objects.filter(user_id=user_id).update(
+        policy_count=policy_count,
+        updated_at=timezone.now()
+    )
+    if not updated:
+        recompute_stats(user_id)
+
+def recompute_stats(user_id: int) -> ModerationStats:
+    """
+    Rebuild a user's counters from their results and policies.
+    
+    This scans the user's whole history; it is only needed for users
+    without a stats row or to repair counters after rows were changed
+    outside the application (e.g. deleted in the admin).
+    """
+    aggregates = {'total_results': Count('id')}
+    for verdict, counter in VERDICT_COUNTERS.items():
+        aggregates[counter] = Count('id', filter=Q(verdict=verdict))
+    for final_verdict, counter in FINAL_VERDICT_COUNTERS.items():
+        aggregates[counter] = Count('id', filter=Q(final_verdict=final_verdict))
+    for field in CHUNK_COUNTERS:
+        aggregates[field] = Coalesce(Sum(field), 0)
+    
+    values = ModerationResult.objects.filter(user_id=user_id).aggregate(**aggregates)
+    values['policy_count'] = PolicyDocument.objects.filter(user_id=user_id).count()
+    stats, _ = ModerationStats.objects.update_or_create(user_id=user_id, defaults=values)
+    return stats
+
+def get_stats(user) -> ModerationStats:
+    """
+    Get a user's counters, building them on first use.
+    """
+    try:
+        return ModerationStats.objects.get(user=user)
+    except ModerationStats.DoesNotExist:
+        return recompute_stats(user.pk)
@@ -0,0 +1,100 @@
+"""
+Generated PDF documents for tests and the offline benchmark
+"""
+import random
+
+_WORDS = (
+    "the team will review each customer request and share the report with finance before "
+    "the quarterly deadline while product data stays in approved systems only account "
+    "access logs are kept for audit purposes and vendors receive the minimum information "
+    "needed for support tickets marketing campaigns use opt in lists and employees follow "
+    "the travel expense process for every booking"
+).split()
+
+_POLICY_RULES = [
+    "Customer personal data must not be shared with third parties without written consent.",
+    "Employees must not accept gifts worth more than fifty dollars from vendors.",
+    "Passwords and access tokens must never be sent by email or chat.",
+    "Marketing messages may only be sent to customers who opted in.",
+    "Financial results must not be disclosed before the official announcement.",
+    "Harassment, threats and discriminatory language are prohibited in all communication.",
+    "Production data may only be copied to approved and encrypted systems.",
+    "Expense claims must include receipts and match the approved travel policy.",
+]
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def write_fixture_pdf(path: str, pages, line_length: int = 90):
+    """
+    Write a minimal text-only PDF with one page per entry of `pages`.
+    
+    Lines are wrapped at line_length characters; only the built-in
+    Helvetica font is used, so no PDF library is needed.
+    """
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in below
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for text in pages:
+        lines, line = [], ""
+        for word in text.split():
+            if line and len(line) + len(word) + 1 > line_length:
+                lines.append(line)
+                line = word
+            else:
+                line = f"{line} {word}" if line else word
+        if line:
+            lines.append(line)
+        content = "BT /F1 10 Tf 12 TL 40 760 Td " + " ".join(
+            f"({_pdf_escape(line)}) Tj T*" for line in lines
+        ) + " ET"
+        stream = content.encode("latin-1", errors="replace")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_ref = len(objects)
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_ref} 0 R >>".encode()
+        )
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode()
+    
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + obj + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    
+    with open(path, "wb") as f:
+        f.write(out)
+
+def document_pages(pages: int, words_per_page: int, seed: int):
+    """
+    Generate page texts of ordinary business prose with policy wording mixed in.
+    """
+    rng = random.Random(seed)
+    result = []
+    for _ in range(pages):
+        words = [rng.choice(_WORDS) for _ in range(words_per_page)]
+        # Mix in policy wording so retrieval has something to find
+        for _ in range(max(1, words_per_page // 120)):
+            position = rng.randrange(len(words))
+            words[position:position] = rng.choice(_POLICY_RULES).split()
+        result.append(" ".join(words))
+    return result
+
+def policy_pages(pages: int, seed: int):
+    """
+    Generate policy page texts made of the fixture rules in a seeded order.
+    """
+    rng = random.Random(seed + 1)
+    return [
+        " ".join(rng.sample(_POLICY_RULES, len(_POLICY_RULES)) * 3)
+        for _ in range(pages)
+    ]
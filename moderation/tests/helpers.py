@@ -0,0 +1,78 @@
+"""
+Shared setup for the moderation tests
+"""
+import os
+import shutil
+import tempfile
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from ..modules import moderation_engine
+from ..modules import policy_store
+from ..modules.fake_llm import FakeModerationChatModel
+from .fixtures import document_pages, policy_pages, write_fixture_pdf
+
+class ModerationTestCase(TestCase):
+    """
+    Runs against a policy store, media root and embedding model that live in
+    a temporary directory; the LLM is a FakeModerationChatModel, so no test
+    touches the network.
+    """
+    
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp(prefix='moderation-tests-')
+        self.addCleanup(shutil.rmtree, self.workdir, ignore_errors=True)
+        
+        settings_override = override_settings(MEDIA_ROOT=os.path.join(self.workdir, 'media'))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        
+        for name, value in (
+            ('POLICY_STORE_DIR', os.path.join(self.workdir, 'store')),
+            ('POLICY_STORE_VERSION_DIR', os.path.join(self.workdir, 'versions')),
+        ):
+            self.patch(policy_store, name, value)
+        
+        registry = policy_store.PolicyStoreRegistry()
+        registry._embeddings = DeterministicFakeEmbedding(size=64)
+        self.patch(policy_store, 'registry', registry)
+        
+        self.llm = FakeModerationChatModel(latency=0, jitter=0, violation_rate=0.2, review_rate=0.2, seed=1)
+        self.patch(moderation_engine, 'get_moderation_llm', lambda *args, **kwargs: self.llm)
+        
+        self.user = User.objects.create_user(username='alice', password='secret')
+        self.tenant = policy_store.tenant_for_user(self.user)
+    
+    def patch(self, target, name: str, value):
+        patcher = mock.patch.object(target, name, value)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def write_pdf(self, name: str, pages) -> str:
+        path = os.path.join(self.workdir, name)
+        write_fixture_pdf(path, pages)
+        return path
+    
+    def upload(self, name: str = 'document.pdf', pages: int = 3, seed: int = 0) -> SimpleUploadedFile:
+        path = self.write_pdf(name, document_pages(pages, 200, seed))
+        with open(path, 'rb') as f:
+            return SimpleUploadedFile(name, f.read(), content_type='application/pdf')
+    
+    def build_policy_store(self, tenant: str = None, pages: int = 2, seed: int = 0,
+                           document_key: str = 'policy.pdf', **kwargs):
+        path = self.write_pdf(f'policy-{seed}-{pages}.pdf', policy_pages(pages, seed))
+        kwargs.setdefault('workers', 1)
+        return policy_store.build_or_update_policy_store(
+            tenant or self.tenant, [path], document_keys=[document_key], **kwargs
+        )
+    
+    def moderate(self, path: str, tenant: str = None, **kwargs):
+        tenant = tenant or self.tenant
+        options = {'concurrency': 1, 'batch_size': 1, 'use_cache': False, 'use_triage': False, 'llm': self.llm}
+        options.update(kwargs)
+        with policy_store.open_policy_store(tenant) as store:
+            return moderation_engine.moderate_file_against_policy(
+                store, path, os.path.basename(path), tenant, **options
+            )
@@ -0,0 +1,69 @@
+from ..modules import moderation_engine
+from ..modules.fake_llm import _BATCH_CHUNK_RE, FakeModerationChatModel
+from ..modules.llm import LLM_MAX_TOKENS
+from .fixtures import document_pages
+from .helpers import ModerationTestCase
+
+class GarbledBatchChatModel(FakeModerationChatModel):
+    """
+    Answers batch prompts with prose instead of JSON; single-chunk prompts
+    get the usual verdicts.
+    """
+    
+    def answer(self, prompt: str) -> str:
+        if _BATCH_CHUNK_RE.search(prompt):
+            return "Here is my assessment of the chunks you sent."
+        return super().answer(prompt)
+
+class BatchedModerationTests(ModerationTestCase):
+    
+    def setUp(self):
+        super().setUp()
+        self.build_policy_store()
+        self.document = self.write_pdf('document.pdf', document_pages(16, 300, 3))
+        self.expected = self.moderate(self.document)
+    
+    def assertSameVerdicts(self, result):
+        for field in ('verdict', 'violation_chunks', 'review_chunks', 'allowed_chunks', 'evaluated_chunks'):
+            self.assertEqual(result[field], self.expected[field], field)
+    
+    def moderate_with_backend(self, batch_size: int):
+        """
+        Moderate with the LLM the engine asks get_moderation_llm for, which
+        cuts its answers at the requested max_tokens.
+        """
+        budgets = []
+        
+        def get_moderation_llm(max_tokens: int = LLM_MAX_TOKENS):
+            budgets.append(max_tokens)
+            return self.llm.model_copy(update={'max_tokens': max_tokens})
+        
+        self.patch(moderation_engine, 'get_moderation_llm', get_moderation_llm)
+        result = self.moderate(self.document, batch_size=batch_size, llm=None)
+        return result, budgets
+    
+    def test_full_size_batches_fit_the_response_budget(self):
+        batch_size = 32
+        chunks = self.expected['evaluated_chunks']
+        self.assertGreaterEqual(chunks, batch_size)
+        
+        result, budgets = self.moderate_with_backend(batch_size)
+        self.assertSameVerdicts(result)
+        # Every batch parsed: no single-chunk fallback calls
+        self.assertEqual(result['llm_calls'], -(-chunks // batch_size))
+        self.assertGreater(budgets, [LLM_MAX_TOKENS])
+    
+    def test_single_chunk_requests_keep_the_default_budget(self):
+        result, budgets = self.moderate_with_backend(1)
+        self.assertSameVerdicts(result)
+        self.assertEqual(budgets, [LLM_MAX_TOKENS])
+    
+    def test_unparseable_batch_answer_falls_back_to_single_chunks(self):
+        garbled = GarbledBatchChatModel(latency=0, jitter=0, violation_rate=0.2, review_rate=0.2, seed=1)
+        result = self.moderate(self.document, batch_size=4, llm=garbled)
+        self.assertSameVerdicts(result)
+        # One failed batch call per four chunks, then one call per chunk; a
+        # lone leftover chunk goes out as a single-chunk prompt right away
+        chunks = self.expected['evaluated_chunks']
+        full, rest = divmod(chunks, 4)
+        self.assertEqual(result['llm_calls'], full + (rest > 1) + chunks)
@@ -0,0 +1,51 @@
+import threading
+from ..modules.fake_llm import FakeModerationChatModel
+from .fixtures import document_pages
+from .helpers import ModerationTestCase
+
+class ConcurrentEvaluationTests(ModerationTestCase):
+    
+    def setUp(self):
+        super().setUp()
+        self.build_policy_store()
+        self.document = self.write_pdf('document.pdf', document_pages(6, 300, 8))
+        self.llm = FakeModerationChatModel(latency=0.02, jitter=0.01, violation_rate=0.2, review_rate=0.2, seed=1)
+        
+        self.in_flight = 0
+        self.most_in_flight = 0
+        lock = threading.Lock()
+        generate = FakeModerationChatModel._generate
+        
+        def tracked_generate(model, *args, **kwargs):
+            with lock:
+                self.in_flight += 1
+                self.most_in_flight = max(self.most_in_flight, self.in_flight)
+            try:
+                return generate(model, *args, **kwargs)
+            finally:
+                with lock:
+                    self.in_flight -= 1
+        
+        self.patch(FakeModerationChatModel, '_generate', tracked_generate)
+    
+    def outcome(self, result):
+        return (
+            result['verdict'],
+            result['violation_chunks'], result['review_chunks'], result['allowed_chunks'],
+            [(v['chunk_id'], v['verdict']) for v in result['violations']]
+        )
+    
+    def test_results_do_not_depend_on_concurrency(self):
+        sequential = self.moderate(self.document, concurrency=1)
+        self.assertEqual(self.most_in_flight, 1)
+        self.assertGreater(sequential['total_chunks'], 4)
+        
+        for options in ({'concurrency': 4}, {'concurrency': 4, 'batch_size': 3}):
+            with self.subTest(**options):
+                self.assertEqual(self.outcome(self.moderate(self.document, **options)), self.outcome(sequential))
+    
+    def test_llm_calls_overlap_up_to_the_limit(self):
+        result = self.moderate(self.document, concurrency=4)
+        self.assertEqual(result['llm_calls'], result['total_chunks'])
+        self.assertGreater(self.most_in_flight, 1)
+        self.assertLessEqual(self.most_in_flight, 4)
@@ -0,0 +1,68 @@
+from io import StringIO
+import numpy as np
+from django.core.management import call_command
+from rest_framework.test import APIClient
+from ..models import ModerationResult, ViolationDetail
+from ..modules import moderation_engine
+from ..modules.triage import classifier as triage_classifier
+from .helpers import ModerationTestCase
+
+class DuplicateResubmissionTests(ModerationTestCase):
+    
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.build_policy_store()
+    
+    def submit(self):
+        response = self.client.post('/api/moderation/moderate/', {'file': self.upload(seed=1)}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        return ModerationResult.objects.get(pk=response.data['id'])
+    
+    def use_triage_model(self, version: str):
+        self.patch(moderation_engine, 'MODERATION_TRIAGE_ENABLED', True)
+        self.patch(triage_classifier, 'get', lambda: (object(), version))
+        # Scores every chunk as uncertain, so all of them still reach the LLM
+        self.patch(triage_classifier, 'ok_probabilities', lambda vectors: np.zeros(len(vectors)))
+    
+    def test_identical_resubmission_reuses_the_result(self):
+        first = self.submit()
+        second = self.submit()
+        self.assertEqual(second.duplicate_of, first)
+        self.assertEqual(second.verdict, first.verdict)
+        self.assertEqual(second.llm_calls, 0)
+    
+    def test_relevance_threshold_is_part_of_the_key(self):
+        self.patch(moderation_engine, 'MODERATION_RELEVANCE_THRESHOLD', 0.0)
+        first = self.submit()
+        self.assertEqual(first.relevance_threshold, 0.0)
+        self.assertEqual(self.submit().duplicate_of, first)
+        
+        self.patch(moderation_engine, 'MODERATION_RELEVANCE_THRESHOLD', None)
+        second = self.submit()
+        self.assertIsNone(second.duplicate_of)
+        self.assertIsNone(second.relevance_threshold)
+    
+    def test_triage_model_version_is_part_of_the_key(self):
+        self.use_triage_model('v1')
+        first = self.submit()
+        self.assertEqual(first.triage_model_version, 'v1')
+        self.assertEqual(self.submit().duplicate_of, first)
+        
+        self.use_triage_model('v2')
+        second = self.submit()
+        self.assertIsNone(second.duplicate_of)
+        self.assertEqual(second.triage_model_version, 'v2')
+    
+    def test_calibration_ignores_the_chunks_of_duplicates(self):
+        self.llm = self.llm.model_copy(update={'violation_rate': 0.5})
+        first = self.submit()
+        flagged = first.violations.exclude(chunk_text='').count()
+        self.assertGreater(flagged, 0)
+        self.submit()
+        self.assertEqual(ViolationDetail.objects.count(), 2 * first.violations.count())
+        
+        out = StringIO()
+        call_command('calibrate_relevance_threshold', stdout=out)
+        self.assertIn(f"Replayed {flagged} flagged chunks", out.getvalue())
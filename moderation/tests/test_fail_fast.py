@@ -0,0 +1,49 @@
+from ..modules.fake_llm import FakeModerationChatModel
+from .fixtures import document_pages
+from .helpers import ModerationTestCase
+
+class FailFastTests(ModerationTestCase):
+    
+    def setUp(self):
+        super().setUp()
+        self.build_policy_store()
+        self.document = self.write_pdf('document.pdf', document_pages(6, 300, 3))
+        self.llm = FakeModerationChatModel(latency=0, jitter=0, violation_rate=1.0, review_rate=0)
+    
+    def test_fail_fast_stops_at_the_first_violation(self):
+        result = self.moderate(self.document, fail_fast=True)
+        self.assertTrue(result['stopped_early'])
+        self.assertEqual(result['verdict'], 'violation_found')
+        self.assertEqual(result['evaluated_chunks'], 1)
+        self.assertEqual(result['llm_chunks'], 1)
+        self.assertEqual(result['llm_calls'], 1)
+        self.assertGreater(result['total_chunks'], 1)
+        
+        full = self.moderate(self.document)
+        self.assertFalse(full['stopped_early'])
+        self.assertEqual(full['evaluated_chunks'], full['total_chunks'])
+        self.assertEqual(full['llm_chunks'], full['total_chunks'])
+    
+    def test_cache_misses_count_lookups_not_llm_requests(self):
+        result = self.moderate(self.document, fail_fast=True, use_cache=True)
+        self.assertTrue(result['stopped_early'])
+        # The whole first window was looked up, only one chunk reached the LLM
+        self.assertEqual(result['cache_hits'], 0)
+        self.assertEqual(result['cache_misses'], result['total_chunks'])
+        self.assertEqual(result['llm_chunks'], 1)
+        
+        # The violation is now cached and stops the next run without the LLM
+        again = self.moderate(self.document, fail_fast=True, use_cache=True)
+        self.assertTrue(again['stopped_early'])
+        self.assertEqual(again['cache_hits'], 1)
+        self.assertEqual(again['cache_misses'], again['total_chunks'] - 1)
+        self.assertEqual(again['llm_chunks'], 0)
+    
+    def test_concurrent_requests_count_only_batches_sent(self):
+        result = self.moderate(self.document, fail_fast=True, concurrency=4)
+        self.assertTrue(result['stopped_early'])
+        # Requests already in flight when the violation came back still count;
+        # their usage may only be recorded after the summary
+        self.assertGreaterEqual(result['llm_chunks'], 1)
+        self.assertLessEqual(result['llm_chunks'], result['total_chunks'])
+        self.assertGreaterEqual(result['llm_chunks'], result['llm_calls'])
@@ -0,0 +1,66 @@
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from ..models import ModerationResult
+
+class HistoryPaginationTests(TestCase):
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='secret')
+        other = User.objects.create_user(username='bob', password='secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        
+        # Three results share each timestamp, so the cursor must break ties on id
+        now = timezone.now()
+        for i in range(9):
+            result = ModerationResult.objects.create(
+                user=self.user,
+                filename=f'file-{i}.pdf',
+                verdict='clean' if i % 3 else 'violation_found'
+            )
+            ModerationResult.objects.filter(pk=result.pk).update(created_at=now - timedelta(minutes=i // 3))
+        ModerationResult.objects.create(user=other, filename='other.pdf', verdict='clean')
+    
+    def fetch_all(self, url: str):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+        return ids
+    
+    def test_pages_cover_every_row_once_across_ties(self):
+        expected = list(
+            ModerationResult.objects.filter(user=self.user)
+            .order_by('-created_at', '-id')
+            .values_list('id', flat=True)
+        )
+        self.assertEqual(self.fetch_all('/api/moderation/history/?page_size=2'), expected)
+    
+    def test_filters_apply_to_every_page(self):
+        ids = self.fetch_all('/api/moderation/history/?page_size=2&verdict=violation_found')
+        self.assertEqual(len(ids), 3)
+        self.assertEqual(
+            set(ModerationResult.objects.filter(pk__in=ids).values_list('verdict', flat=True)),
+            {'violation_found'}
+        )
+    
+    def test_malformed_parameters_are_rejected(self):
+        for query in ('cursor=not-a-cursor', 'cursor=WyJ4IiwgMV0', 'page_size=0', 'verdict=maybe'):
+            response = self.client.get(f'/api/moderation/history/?{query}')
+            self.assertEqual(response.status_code, 400, query)
+            self.assertIn('error', response.data)
+    
+    
+    def test_query_count_does_not_grow_with_the_page(self):
+        with CaptureQueriesContext(connection) as small:
+            self.client.get('/api/moderation/history/?page_size=2')
+        with CaptureQueriesContext(connection) as large:
+            self.client.get('/api/moderation/history/?page_size=9')
+        self.assertEqual(len(large), len(small))
@@ -0,0 +1,90 @@
+from datetime import timedelta
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
+from .. import jobs
+from ..models import ModerationResult, PolicyDocument
+from .fixtures import policy_pages
+from .helpers import ModerationTestCase
+
+class StaleJobTests(ModerationTestCase):
+    
+    def setUp(self):
+        super().setUp()
+        self.build_policy_store()
+        self.long_ago = timezone.now() - timedelta(hours=2)
+    
+    def claim(self) -> ModerationResult:
+        jobs.enqueue_moderation_job(self.user, self.upload(seed=5))
+        job = jobs.claim_next_job()
+        self.assertIsNotNone(job.heartbeat_at)
+        return job
+    
+    def test_long_running_job_with_a_fresh_heartbeat_is_kept(self):
+        job = self.claim()
+        ModerationResult.objects.filter(pk=job.pk).update(started_at=self.long_ago)
+        self.assertEqual(jobs.requeue_stale_jobs(timedelta(minutes=30)), 0)
+        self.assertEqual(ModerationResult.objects.get(pk=job.pk).status, 'running')
+    
+    def test_job_without_a_recent_heartbeat_is_requeued(self):
+        job = self.claim()
+        ModerationResult.objects.filter(pk=job.pk).update(heartbeat_at=self.long_ago)
+        self.assertEqual(jobs.requeue_stale_jobs(timedelta(minutes=30)), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'queued')
+        self.assertIsNone(job.heartbeat_at)
+        self.assertEqual(jobs.claim_next_job().pk, job.pk)
+    
+    def test_job_claimed_before_heartbeats_falls_back_to_its_start(self):
+        job = self.claim()
+        ModerationResult.objects.filter(pk=job.pk).update(heartbeat_at=None, started_at=self.long_ago)
+        self.assertEqual(jobs.requeue_stale_jobs(timedelta(minutes=30)), 1)
+    
+    def test_running_job_refreshes_its_heartbeat(self):
+        job = self.claim()
+        ModerationResult.objects.filter(pk=job.pk).update(started_at=self.long_ago, heartbeat_at=self.long_ago)
+        requeued = []
+        moderate = jobs.moderate_file_against_policy
+        
+        def moderate_and_check(*args, progress_callback, **kwargs):
+            def report(done, total):
+                progress_callback(done, total)
+                requeued.append(jobs.requeue_stale_jobs(timedelta(minutes=30)))
+            return moderate(*args, progress_callback=report, **kwargs)
+        
+        self.patch(jobs, 'moderate_file_against_policy', moderate_and_check)
+        jobs.run_moderation_job(job)
+        self.assertTrue(requeued)
+        self.assertEqual(set(requeued), {0})
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+        self.assertGreater(job.heartbeat_at, self.long_ago)
+    
+    def test_policy_ingestion_refreshes_its_heartbeat(self):
+        with open(self.write_pdf('queued-policy.pdf', policy_pages(2, 6)), 'rb') as f:
+            upload = SimpleUploadedFile('queued-policy.pdf', f.read(), content_type='application/pdf')
+        policy_doc = PolicyDocument.objects.create(
+            user=self.user, file=upload, filename=upload.name, file_size=upload.size,
+            status='queued', ingest_batch='batch'
+        )
+        claimed = jobs.claim_policy_batch()
+        self.assertEqual([doc.pk for doc in claimed], [policy_doc.pk])
+        PolicyDocument.objects.filter(pk=policy_doc.pk).update(started_at=self.long_ago, heartbeat_at=self.long_ago)
+        requeued = []
+        ingest = jobs.ingest_policy_documents
+        
+        def ingest_and_check(user, policy_docs, progress_callback):
+            def report(stage, done, total):
+                progress_callback(stage, done, total)
+                requeued.append(jobs.requeue_stale_jobs(timedelta(minutes=30)))
+            return ingest(user, policy_docs, progress_callback=report)
+        
+        self.patch(jobs, 'ingest_policy_documents', ingest_and_check)
+        jobs.run_policy_ingestion(claimed)
+        self.assertTrue(requeued)
+        self.assertEqual(set(requeued), {0})
+        self.assertEqual(PolicyDocument.objects.get(pk=policy_doc.pk).status, 'ready')
+        
+        # A worker that dies mid-ingestion stops refreshing it
+        PolicyDocument.objects.filter(pk=policy_doc.pk).update(status='processing', heartbeat_at=self.long_ago)
+        self.assertEqual(jobs.requeue_stale_jobs(timedelta(minutes=30)), 1)
+        self.assertEqual(PolicyDocument.objects.get(pk=policy_doc.pk).status, 'queued')
@@ -0,0 +1,153 @@
+import importlib.util
+import json
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from unittest import mock
+from django.test import SimpleTestCase
+from ..management.commands.serve_fake_llm import FakeLLMServer, TokenBucket
+from ..modules import llm
+from ..modules.fake_llm import FakeModerationChatModel
+from .fixtures import document_pages
+
+class BackendSelectionTests(SimpleTestCase):
+    
+    def setUp(self):
+        for name in ('LLM_BACKEND', 'LLM_BASE_URL', 'GROQ_API_KEY'):
+            patcher = mock.patch.object(llm, name, getattr(llm, name))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+    
+    def test_fake_backend_gets_the_response_budget(self):
+        llm.LLM_BACKEND = 'fake'
+        model = llm.get_moderation_llm(max_tokens=64)
+        self.assertIsInstance(model, FakeModerationChatModel)
+        self.assertEqual(model.max_tokens, 64)
+    
+    def test_unknown_backend_is_rejected(self):
+        llm.LLM_BACKEND = 'missing'
+        with self.assertRaisesMessage(ValueError, "Unknown LLM_BACKEND 'missing'"):
+            llm.get_moderation_llm()
+    
+    def test_backends_require_their_settings(self):
+        llm.LLM_BACKEND = 'groq'
+        llm.GROQ_API_KEY = ''
+        with self.assertRaisesMessage(ValueError, 'GROQ_API_KEY'):
+            llm.get_moderation_llm()
+        
+        llm.LLM_BACKEND = 'openai'
+        llm.LLM_BASE_URL = ''
+        with self.assertRaisesMessage(ValueError, 'LLM_BASE_URL'):
+            llm.get_moderation_llm()
+    
+    @unittest.skipUnless(importlib.util.find_spec('langchain_openai'), 'langchain-openai is not installed')
+    def test_openai_backend_uses_the_base_url(self):
+        llm.LLM_BACKEND = 'openai'
+        llm.LLM_BASE_URL = 'http://127.0.0.1:8090/v1'
+        model = llm.get_moderation_llm(max_tokens=64)
+        self.assertEqual(model.openai_api_base, 'http://127.0.0.1:8090/v1')
+        self.assertEqual(model.max_tokens, 64)
+
+class FakeServerTests(SimpleTestCase):
+    
+    def start_server(self, limiter=None, error_rate=0.0, api_key=''):
+        model = FakeModerationChatModel(latency=0, jitter=0, violation_rate=0.2, review_rate=0.2, seed=1)
+        server = FakeLLMServer(
+            ('127.0.0.1', 0), model=model, model_name='fake-model', latency=0, jitter=0,
+            limiter=limiter, error_rate=error_rate, error_status=503, api_key=api_key, seed=0
+        )
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+    
+    def post(self, server, body: dict, headers: dict = None):
+        host, port = server.server_address[:2]
+        request = urllib.request.Request(
+            f'http://{host}:{port}/v1/chat/completions',
+            data=json.dumps(body).encode('utf-8'),
+            headers={'Content-Type': 'application/json', **(headers or {})},
+            method='POST'
+        )
+        opener = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+        try:
+            with opener.open(request, timeout=10) as response:
+                return response.status, dict(response.headers), json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, dict(e.headers), json.loads(e.read())
+    
+    def moderation_request(self, text: str, **kwargs) -> dict:
+        prompt = llm.format_moderation_prompt([], text)
+        return {'model': 'fake-model', 'messages': [{'role': 'user', 'content': prompt}], **kwargs}
+    
+    def test_completion_matches_the_in_process_model(self):
+        server = self.start_server()
+        text = document_pages(1, 40, 3)[0]
+        status, _, body = self.post(server, self.moderation_request(text))
+        
+        self.assertEqual(status, 200)
+        verdict, explanation = server.model.verdict_for(text)
+        choice = body['choices'][0]
+        self.assertEqual(choice['message']['content'], f'{verdict}: {explanation}')
+        self.assertEqual(choice['finish_reason'], 'stop')
+        self.assertGreater(body['usage']['prompt_tokens'], 0)
+        self.assertEqual(
+            body['usage']['total_tokens'],
+            body['usage']['prompt_tokens'] + body['usage']['completion_tokens']
+        )
+    
+    def test_answer_is_cut_at_max_tokens(self):
+        server = self.start_server()
+        status, _, body = self.post(server, self.moderation_request('some text', max_tokens=2))
+        
+        self.assertEqual(status, 200)
+        choice = body['choices'][0]
+        self.assertEqual(len(choice['message']['content']), 8)
+        self.assertEqual(choice['finish_reason'], 'length')
+    
+    def test_rate_limit_answers_429_with_retry_after(self):
+        server = self.start_server(limiter=TokenBucket(rpm=1, burst=1))
+        self.assertEqual(self.post(server, self.moderation_request('first'))[0], 200)
+        status, headers, body = self.post(server, self.moderation_request('second'))
+        
+        self.assertEqual(status, 429)
+        self.assertGreaterEqual(int(headers['Retry-After']), 1)
+        self.assertEqual(body['error']['code'], 'rate_limit_exceeded')
+        self.assertEqual(server.counts['rate_limited'], 1)
+    
+    def test_injected_errors_and_api_key(self):
+        server = self.start_server(error_rate=1.0, api_key='secret')
+        self.assertEqual(self.post(server, self.moderation_request('text'))[0], 401)
+        status, _, body = self.post(
+            server, self.moderation_request('text'), {'Authorization': 'Bearer secret'}
+        )
+        
+        self.assertEqual(status, 503)
+        self.assertEqual(body['error']['type'], 'server_error')
+        self.assertEqual(server.counts, {'completed': 0, 'rate_limited': 0, 'injected_errors': 1, 'rejected': 1})
+    
+    def test_groq_backend_talks_to_the_server(self):
+        server = self.start_server()
+        host, port = server.server_address[:2]
+        for name, value in (
+            ('LLM_BACKEND', 'groq'),
+            ('LLM_BASE_URL', f'http://{host}:{port}'),
+            ('GROQ_API_KEY', 'not-needed'),
+            ('LLM_MAX_RETRIES', 0),
+        ):
+            patcher = mock.patch.object(llm, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        
+        text = document_pages(1, 40, 5)[0]
+        prompt = llm.format_moderation_prompt([], text)
+        response = llm.get_moderation_llm().invoke(prompt)
+        
+        verdict, _ = server.model.verdict_for(text)
+        self.assertTrue(response.content.startswith(f'{verdict}:'))
+        prompt_tokens, completion_tokens, estimated = llm.response_token_usage(prompt, response)
+        self.assertFalse(estimated)
+        self.assertGreater(prompt_tokens, 0)
+        self.assertGreater(completion_tokens, 0)
@@ -0,0 +1,94 @@
+import json
+import os
+import shutil
+import tempfile
+from django.test import SimpleTestCase, override_settings
+from .. import metrics
+from .fixtures import document_pages
+from .helpers import ModerationTestCase
+
+def sample(text: str, series: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(series + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    return 0.0
+
+class MetricsOutputTests(ModerationTestCase):
+    
+    def test_moderation_run_is_counted(self):
+        self.build_policy_store()
+        before = metrics.render_metrics()
+        result = self.moderate(self.write_pdf('document.pdf', document_pages(2, 200, 7)))
+        after = metrics.render_metrics()
+        
+        def delta(series):
+            return sample(after, series) - sample(before, series)
+        
+        self.assertIn('# TYPE moderation_stage_seconds histogram', after)
+        self.assertIn('# TYPE moderation_chunks_total counter', after)
+        self.assertEqual(delta('moderation_stage_seconds_count{stage="llm"}'), result['llm_calls'])
+        self.assertEqual(
+            sum(delta(f'moderation_chunks_total{{verdict="{verdict}",source="llm"}}')
+                for verdict in ('ok', 'review', 'violation')),
+            result['evaluated_chunks']
+        )
+
+class SharedMetricsTests(SimpleTestCase):
+    
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(prefix='moderation-metrics-')
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.counter = metrics.Counter('test_shared_total', 'Test counter.', ['kind'])
+        self.histogram = metrics.Histogram('test_shared_seconds', 'Test histogram.', buckets=(1.0,))
+        self.addCleanup(metrics.REGISTRY.remove, self.counter)
+        self.addCleanup(metrics.REGISTRY.remove, self.histogram)
+        
+        shared = metrics._SharedMetrics(self.directory)
+        previous, metrics._shared = metrics._shared, shared
+        self.addCleanup(setattr, metrics, '_shared', previous)
+    
+    def test_other_processes_are_added_up(self):
+        self.counter.inc(2, kind='a')
+        self.histogram.observe(0.5)
+        with open(os.path.join(self.directory, '999999.json'), 'w') as f:
+            json.dump({
+                'test_shared_total': [[['a'], 3], [['b'], 1]],
+                'test_shared_seconds': [[[], [[0, 1], 4.0, 1]]],
+            }, f)
+        
+        text = metrics.render_metrics()
+        self.assertEqual(sample(text, 'test_shared_total{kind="a"}'), 5)
+        self.assertEqual(sample(text, 'test_shared_total{kind="b"}'), 1)
+        self.assertEqual(sample(text, 'test_shared_seconds_bucket{le="1"}'), 1)
+        self.assertEqual(sample(text, 'test_shared_seconds_bucket{le="+Inf"}'), 2)
+        self.assertEqual(sample(text, 'test_shared_seconds_sum'), 4.5)
+        self.assertEqual(sample(text, 'test_shared_seconds_count'), 2)
+    
+    def test_own_saved_metrics_are_not_counted_twice(self):
+        self.counter.inc(kind='a')
+        metrics.save_shared_metrics()
+        with open(metrics._shared.path) as f:
+            self.assertIn([['a'], 1], json.load(f)['test_shared_total'])
+        self.assertEqual(sample(metrics.render_metrics(), 'test_shared_total{kind="a"}'), 1)
+
+@override_settings(METRICS_AUTH_TOKEN='')
+class MetricsAccessTests(SimpleTestCase):
+    
+    def test_internal_clients_need_no_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.1.2.3').status_code, 200)
+    
+    def test_public_and_proxied_clients_are_refused_without_a_token(self):
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='203.0.113.5').status_code, 403)
+        self.assertEqual(
+            self.client.get('/metrics', HTTP_X_FORWARDED_FOR='203.0.113.5').status_code, 403
+        )
+    
+    @override_settings(METRICS_AUTH_TOKEN='scrape-me')
+    def test_token_is_required_once_set(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        response = self.client.get(
+            '/metrics', REMOTE_ADDR='203.0.113.5', HTTP_AUTHORIZATION='Bearer scrape-me'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], metrics.CONTENT_TYPE)
@@ -0,0 +1,37 @@
+import os
+from ..modules import policy_store
+from .fixtures import policy_pages
+from .helpers import ModerationTestCase
+
+class ParallelIngestionTests(ModerationTestCase):
+    
+    def ingest(self, tenant: str, workers: int):
+        paths = [self.write_pdf(f'policy-{seed}.pdf', policy_pages(3, seed)) for seed in (1, 2, 3)]
+        progress = []
+        report = policy_store.build_or_update_policy_store(
+            tenant, paths, document_keys=[f'doc-{seed}' for seed in (1, 2, 3)], workers=workers,
+            progress_callback=lambda stage, done, total: progress.append((stage, done, total))
+        )
+        return report, progress
+    
+    def test_process_pool_matches_inline_parsing(self):
+        inline, _ = self.ingest('inline', workers=1)
+        pooled, progress = self.ingest('pooled', workers=3)
+        
+        self.assertEqual(pooled, inline)
+        self.assertGreater(pooled['new_chunks'], 0)
+        self.assertEqual([entry for entry in progress if entry[0] == 'parse'][-1], ('parse', 3, 3))
+        with policy_store.open_policy_store('pooled') as store:
+            ids = policy_store._ChromaCollection(store).get(include=[])['ids']
+        self.assertEqual(sorted(ids), sorted(i for d in inline['documents'] for i in d['chunk_ids']))
+    
+    def test_failure_in_a_worker_process_is_raised(self):
+        broken = os.path.join(self.workdir, 'broken.pdf')
+        with open(broken, 'wb') as f:
+            f.write(b'not a pdf')
+        path = self.write_pdf('policy.pdf', policy_pages(2, 1))
+        with self.assertRaises(Exception):
+            policy_store.build_or_update_policy_store(
+                self.tenant, [path, broken], document_keys=['a', 'b'], workers=2
+            )
+        self.assertFalse(policy_store.policy_store_exists(self.tenant))
@@ -0,0 +1,48 @@
+from ..modules import moderation_engine
+from .fixtures import document_pages
+from .helpers import ModerationTestCase
+
+class PageStreamingChunkTests(ModerationTestCase):
+    
+    def test_text_is_carried_across_page_boundaries(self):
+        pages = [f"start{i} " + " ".join(['words'] * 25) + f" end{i}" for i in range(6)]
+        pages[3] = ''
+        path = self.write_pdf('short-pages.pdf', pages)
+        chunks = moderation_engine.load_pdf_to_chunks(path, 'short-pages.pdf')
+        
+        self.assertLess(len(chunks), 5)
+        text = ' '.join(chunk['page_content'] for chunk in chunks)
+        for i in (0, 1, 2, 4, 5):
+            self.assertIn(f'start{i}', text)
+        # The end of one page and the start of the next share a chunk
+        self.assertTrue(any('end0' in c['page_content'] and 'start1' in c['page_content'] for c in chunks))
+        # ... also across the empty page
+        self.assertTrue(any('end2' in c['page_content'] and 'start4' in c['page_content'] for c in chunks))
+        self.assertEqual(chunks[0]['metadata']['page'], 0)
+    
+    def test_chunks_keep_the_page_they_start_on(self):
+        pages = [f"marker{i} " + text for i, text in enumerate(document_pages(5, 400, 3))]
+        path = self.write_pdf('long-pages.pdf', pages)
+        chunks = moderation_engine.load_pdf_to_chunks(path, 'long-pages.pdf')
+        
+        self.assertEqual(
+            [chunk['metadata']['chunk_id'] for chunk in chunks],
+            [f'long-pages.pdf::chunk_{i}' for i in range(len(chunks))]
+        )
+        for chunk in chunks:
+            self.assertLessEqual(len(chunk['page_content']), moderation_engine.CHUNK_SIZE)
+            first_word = chunk['page_content'].split()[0]
+            if first_word.startswith('marker'):
+                self.assertEqual(chunk['metadata']['page'], int(first_word[len('marker'):]))
+    
+    def test_pages_are_read_as_chunks_are_consumed(self):
+        path = self.write_pdf('many-pages.pdf', document_pages(10, 400, 5))
+        loaded = []
+        chunks = moderation_engine.iter_pdf_chunks(
+            path, 'many-pages.pdf',
+            stage_callback=lambda stage, seconds, items: loaded.append(stage) if stage == 'load' else None
+        )
+        next(chunks)
+        self.assertEqual(loaded.count('load'), 1)
+        self.assertGreater(sum(1 for _ in chunks), 10)
+        self.assertEqual(loaded.count('load'), 10)
@@ -0,0 +1,53 @@
+from unittest import mock
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from .. import jobs
+from ..models import ModerationResult, ModerationStats, ViolationDetail
+from ..stats import recompute_stats
+from .fixtures import document_pages
+from .helpers import ModerationTestCase
+
+class ResultPersistenceTests(ModerationTestCase):
+    
+    def setUp(self):
+        super().setUp()
+        self.build_policy_store()
+        self.llm = self.llm.model_copy(update={'violation_rate': 0.4, 'review_rate': 0.3})
+        self.data = self.moderate(self.write_pdf('document.pdf', document_pages(4, 300, 10)))
+        self.assertGreater(len(self.data['violations']), 2)
+        self.result = jobs.create_moderation_result(self.user, self.upload(seed=10))
+    
+    def assertStatsMatchRecompute(self):
+        stats = ModerationStats.objects.get(user=self.user)
+        recomputed = recompute_stats(self.user.pk)
+        for field in ModerationStats._meta.concrete_fields:
+            if field.get_internal_type() == 'IntegerField':
+                self.assertEqual(getattr(stats, field.name), getattr(recomputed, field.name), field.name)
+    
+    def test_violations_are_inserted_in_batches(self):
+        self.patch(jobs, 'VIOLATION_BATCH_SIZE', 2)
+        with CaptureQueriesContext(connection) as queries:
+            jobs.record_moderation_result(self.result, self.data)
+        
+        inserts = [q for q in queries.captured_queries
+                   if q['sql'].startswith(f'INSERT INTO "{ViolationDetail._meta.db_table}"')]
+        self.assertEqual(len(inserts), -(-len(self.data['violations']) // 2))
+        self.assertEqual(self.result.violations.count(), len(self.data['violations']))
+        self.assertEqual(ModerationResult.objects.get(pk=self.result.pk).status, 'completed')
+        self.assertStatsMatchRecompute()
+    
+    def test_failed_insert_leaves_nothing_behind(self):
+        with mock.patch.object(ViolationDetail.objects, 'bulk_create', side_effect=RuntimeError('disk full')):
+            with self.assertRaises(RuntimeError):
+                jobs.record_moderation_result(self.result, self.data)
+        
+        stored = ModerationResult.objects.get(pk=self.result.pk)
+        self.assertEqual(stored.status, 'running')
+        self.assertEqual(stored.verdict, 'pending')
+        self.assertEqual(stored.total_chunks, 0)
+        self.assertFalse(ViolationDetail.objects.exists())
+        self.assertStatsMatchRecompute()
+        
+        jobs.record_moderation_failure(self.result, RuntimeError('disk full'))
+        self.assertEqual(ModerationResult.objects.get(pk=self.result.pk).status, 'failed')
+        self.assertStatsMatchRecompute()
@@ -0,0 +1,52 @@
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from rest_framework.test import APIClient
+from ..models import PolicyDocument
+from ..modules import policy_store
+from .fixtures import policy_pages
+from .helpers import ModerationTestCase
+
+class PolicyDeletionTests(ModerationTestCase):
+    
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for name, seed in (('kept.pdf', 1), ('deleted.pdf', 2)):
+            path = self.write_pdf(f'upload-{seed}.pdf', policy_pages(2, seed))
+            with open(path, 'rb') as f:
+                upload = SimpleUploadedFile(name, f.read(), content_type='application/pdf')
+            response = self.client.post(reverse('upload_policy'), {'files': [upload]}, format='multipart')
+            self.assertEqual(response.status_code, 201)
+        self.kept = PolicyDocument.objects.get(filename='kept.pdf')
+        self.deleted = PolicyDocument.objects.get(filename='deleted.pdf')
+    
+    def store_ids(self):
+        with policy_store.open_policy_store(self.tenant) as store:
+            return set(policy_store._ChromaCollection(store).get(include=[])['ids'])
+    
+    def test_deleting_a_policy_removes_only_its_vectors(self):
+        self.assertEqual(self.store_ids(), set(self.kept.vector_ids) | set(self.deleted.vector_ids))
+        version = policy_store.get_policy_store_version(self.tenant)
+        
+        response = self.client.delete(reverse('delete_policy', args=[self.deleted.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['removed_chunks'], len(self.deleted.vector_ids))
+        self.assertEqual(self.store_ids(), set(self.kept.vector_ids))
+        self.assertFalse(PolicyDocument.objects.filter(pk=self.deleted.pk).exists())
+        # Cached verdicts and duplicate results of the old store no longer apply
+        self.assertNotEqual(policy_store.get_policy_store_version(self.tenant), version)
+    
+    def test_other_users_cannot_delete_a_policy(self):
+        other = User.objects.create_user(username='mallory', password='secret')
+        self.client.force_authenticate(other)
+        response = self.client.delete(reverse('delete_policy', args=[self.deleted.pk]))
+        self.assertEqual(response.status_code, 404)
+        self.assertIn(self.deleted.vector_ids[0], self.store_ids())
+    
+    def test_clearing_policies_empties_the_store(self):
+        response = self.client.post(reverse('clear_policies'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(PolicyDocument.objects.filter(user=self.user).exists())
+        self.assertFalse(policy_store.policy_store_exists(self.tenant))
@@ -0,0 +1,150 @@
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from rest_framework.test import APIClient
+from .. import jobs
+from ..models import PolicyDocument
+from ..modules import policy_store
+from .fixtures import policy_pages
+from .helpers import ModerationTestCase
+
+class PolicyIngestionTests(ModerationTestCase):
+    
+    def test_reingesting_unchanged_policy_keeps_the_version(self):
+        first = self.build_policy_store()
+        self.assertGreater(first['new_chunks'], 0)
+        version = policy_store.get_policy_store_version(self.tenant)
+        self.assertTrue(version)
+        
+        again = self.build_policy_store()
+        self.assertEqual(again['new_chunks'], 0)
+        self.assertEqual(again['removed_chunks'], 0)
+        self.assertEqual(again['unchanged_chunks'], first['new_chunks'])
+        self.assertEqual(again['unchanged_documents'], 1)
+        self.assertEqual(policy_store.get_policy_store_version(self.tenant), version)
+    
+    def test_changed_policy_only_embeds_the_difference(self):
+        first = self.build_policy_store(pages=2)
+        version = policy_store.get_policy_store_version(self.tenant)
+        
+        # Same document key, one page added and the text reshuffled
+        changed = self.build_policy_store(pages=3, seed=7)
+        self.assertGreater(changed['new_chunks'], 0)
+        self.assertGreater(changed['removed_chunks'], 0)
+        self.assertEqual(
+            changed['new_chunks'] + changed['unchanged_chunks'],
+            len(changed['documents'][0]['chunk_ids'])
+        )
+        self.assertEqual(changed['unchanged_chunks'] + changed['removed_chunks'], first['new_chunks'])
+        self.assertNotEqual(policy_store.get_policy_store_version(self.tenant), version)
+
+class PolicyUploadTests(ModerationTestCase):
+    
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    
+    def policy_file(self, name: str = 'policy.pdf', pages: int = 2, seed: int = 0) -> SimpleUploadedFile:
+        path = self.write_pdf(f'upload-{seed}-{pages}.pdf', policy_pages(pages, seed))
+        with open(path, 'rb') as f:
+            return SimpleUploadedFile(name, f.read(), content_type='application/pdf')
+    
+    def upload_policies(self, *files, asynchronous: bool = False):
+        data = {'files': list(files)}
+        if asynchronous:
+            data['async'] = 'true'
+        return self.client.post(reverse('upload_policy'), data, format='multipart')
+    
+    def patch_embed(self, wrapper):
+        embeddings = policy_store.registry._embeddings
+        embed = type(embeddings).embed_documents
+        self.patch(type(embeddings), 'embed_documents',
+                   lambda model, texts: wrapper(lambda batch: embed(model, batch), texts))
+    
+    def store_ids(self):
+        if not policy_store.policy_store_exists(self.tenant):
+            return set()
+        with policy_store.open_policy_store(self.tenant) as store:
+            return set(policy_store._ChromaCollection(store).get(include=[])['ids'])
+    
+    def test_reuploading_a_file_replaces_the_earlier_row(self):
+        self.assertEqual(self.upload_policies(self.policy_file()).status_code, 201)
+        version = policy_store.get_policy_store_version(self.tenant)
+        
+        response = self.upload_policies(self.policy_file())
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['ingestion']['new_chunks'], 0)
+        self.assertEqual(response.data['ingestion']['unchanged_documents'], 1)
+        # The chunks were taken over, so cached verdicts stay valid
+        self.assertEqual(policy_store.get_policy_store_version(self.tenant), version)
+        
+        policy = PolicyDocument.objects.get(user=self.user)
+        self.assertEqual(set(policy.vector_ids), self.store_ids())
+        
+        response = self.client.delete(reverse('delete_policy', args=[policy.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.store_ids(), set())
+    
+    def test_changed_file_reuses_embeddings_of_unchanged_text(self):
+        self.upload_policies(self.policy_file(pages=2))
+        embedded = []
+        self.patch_embed(lambda embed, texts: embedded.extend(texts) or embed(texts))
+        
+        response = self.upload_policies(self.policy_file(pages=3))
+        self.assertEqual(response.status_code, 201)
+        ingestion = response.data['ingestion']
+        self.assertGreater(ingestion['unchanged_chunks'], 0)
+        self.assertEqual(len(embedded), ingestion['new_chunks'])
+        
+        policy = PolicyDocument.objects.get(user=self.user)
+        self.assertEqual(set(policy.vector_ids), self.store_ids())
+    
+    def test_same_name_twice_in_one_upload_keeps_the_last(self):
+        response = self.upload_policies(self.policy_file(seed=1), self.policy_file(seed=2))
+        self.assertEqual(response.status_code, 201)
+        
+        policy = PolicyDocument.objects.get(user=self.user)
+        self.assertEqual(policy.pk, response.data['policy_documents'][1]['id'])
+        self.assertEqual(set(policy.vector_ids), self.store_ids())
+    
+    def test_queued_upload_is_superseded_by_a_later_one(self):
+        self.assertEqual(self.upload_policies(self.policy_file(seed=1), asynchronous=True).status_code, 202)
+        self.assertEqual(self.upload_policies(self.policy_file(seed=2)).status_code, 201)
+        
+        policy = PolicyDocument.objects.get(user=self.user)
+        self.assertEqual(policy.status, 'ready')
+        self.assertEqual(jobs.run_worker(once=True), 0)
+        self.assertEqual(set(policy.vector_ids), self.store_ids())
+    
+    def test_failed_ingestion_leaves_the_store_as_it_was(self):
+        self.upload_policies(self.policy_file(name='first.pdf'))
+        before = self.store_ids()
+        
+        self.patch(policy_store, 'EMBED_BATCH_SIZE', 2)
+        self.patch(policy_store, 'WRITE_BATCH_SIZE', 2)
+        calls = []
+        
+        def flaky_embed(embed, texts):
+            calls.append(texts)
+            if len(calls) > 2:
+                raise RuntimeError('embedding backend down')
+            return embed(texts)
+        
+        self.patch_embed(flaky_embed)
+        self.patch(policy_store._ChromaCollection, 'max_batch_size', lambda collection: 2)
+        response = self.upload_policies(self.policy_file(name='second.pdf', pages=4, seed=3))
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(self.store_ids(), before)
+        self.assertEqual(list(PolicyDocument.objects.values_list('filename', flat=True)), ['first.pdf'])
+    
+    def test_document_deleted_during_ingestion_leaves_no_chunks(self):
+        self.upload_policies(self.policy_file(name='first.pdf'))
+        before = self.store_ids()
+        self.upload_policies(self.policy_file(name='second.pdf', seed=4), asynchronous=True)
+        
+        def delete_row(stage, done, total):
+            PolicyDocument.objects.filter(filename='second.pdf').delete()
+        
+        policy_docs = jobs.claim_policy_batch()
+        jobs.ingest_policy_documents(self.user, policy_docs, progress_callback=delete_row)
+        self.assertEqual(self.store_ids(), before)
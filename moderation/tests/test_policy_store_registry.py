@@ -0,0 +1,47 @@
+from ..modules import policy_store
+from .helpers import ModerationTestCase
+
+class PolicyStoreRegistryTests(ModerationTestCase):
+    
+    def setUp(self):
+        super().setUp()
+        self.registry = policy_store.registry
+        self.registry._max_stores = 1
+        self.tenants = ['user_101', 'user_102']
+        for seed, tenant in enumerate(self.tenants):
+            self.build_policy_store(tenant, seed=seed)
+            self.registry.invalidate(tenant)
+    
+    def test_held_store_is_not_evicted(self):
+        first, second = self.tenants
+        with policy_store.open_policy_store(first) as held:
+            with policy_store.open_policy_store(second):
+                # Over the size limit, but both stores are in use
+                self.assertEqual(list(self.registry._stores), [first, second])
+            # second is idle now and goes; first is still held
+            self.assertEqual(list(self.registry._stores), [first])
+            with policy_store.open_policy_store(first) as again:
+                self.assertIs(again, held)
+        
+        with policy_store.open_policy_store(second):
+            pass
+        self.assertEqual(list(self.registry._stores), [second])
+    
+    def test_version_change_reopens_held_store(self):
+        tenant = self.tenants[0]
+        with policy_store.open_policy_store(tenant) as held:
+            count = policy_store._ChromaCollection(held).count()
+            # As if another worker had rewritten the store
+            policy_store.bump_policy_store_version(tenant)
+            with policy_store.open_policy_store(tenant) as current:
+                self.assertIsNot(current, held)
+                self.assertEqual(policy_store._ChromaCollection(current).count(), count)
+            # The old holder keeps a working store
+            self.assertEqual(policy_store._ChromaCollection(held).count(), count)
+        self.assertEqual(self.registry._stores[tenant].leases, 0)
+    
+    def test_empty_store_raises(self):
+        with self.assertRaises(FileNotFoundError):
+            with policy_store.open_policy_store('user_999'):
+                pass
+        self.assertNotIn('user_999', self.registry._stores)
@@ -0,0 +1,66 @@
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from rest_framework.test import APIClient
+from ..models import ModerationResult
+from ..modules import moderation_engine
+from .fixtures import document_pages
+from .helpers import ModerationTestCase
+
+class RelevanceGateTests(ModerationTestCase):
+    
+    def setUp(self):
+        super().setUp()
+        self.build_policy_store()
+        self.document = self.write_pdf('document.pdf', document_pages(4, 200, 2))
+    
+    def test_gate_clears_chunks_below_the_threshold(self):
+        result = self.moderate(self.document, relevance_threshold=float('inf'))
+        self.assertEqual(result['auto_cleared_chunks'], result['total_chunks'])
+        self.assertEqual(len(result['auto_cleared_chunk_ids']), result['total_chunks'])
+        self.assertEqual(result['llm_chunks'], 0)
+        self.assertEqual(result['verdict'], 'clean')
+        
+        result = self.moderate(self.document, relevance_threshold=float('-inf'))
+        self.assertEqual(result['auto_cleared_chunks'], 0)
+        self.assertEqual(result['llm_chunks'], result['total_chunks'])
+    
+    def test_cleared_chunk_ids_are_stored_on_the_result(self):
+        # Above any score, but still a valid JSON number in the response
+        self.patch(moderation_engine, 'MODERATION_RELEVANCE_THRESHOLD', 1e9)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post('/api/moderation/moderate/', {'file': self.upload(seed=2)}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        
+        result = ModerationResult.objects.get(pk=response.data['id'])
+        self.assertEqual(len(result.auto_cleared_chunk_ids), result.auto_cleared_chunks)
+        self.assertEqual(len(set(result.auto_cleared_chunk_ids)), result.total_chunks)
+        self.assertEqual(response.data['auto_cleared_chunk_ids'], result.auto_cleared_chunk_ids)
+
+class CalibrateRelevanceThresholdTests(ModerationTestCase):
+    
+    def setUp(self):
+        super().setUp()
+        self.build_policy_store()
+    
+    def test_suggested_threshold_keeps_flagged_chunks(self):
+        self.llm = self.llm.model_copy(update={'violation_rate': 0.5})
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post('/api/moderation/moderate/', {'file': self.upload(seed=2)}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        flagged = ModerationResult.objects.get(pk=response.data['id']).violations.exclude(chunk_text='').count()
+        self.assertGreater(flagged, 0)
+        
+        out = StringIO()
+        call_command('calibrate_relevance_threshold', target_recall=1.0, margin=0, stdout=out)
+        output = out.getvalue()
+        self.assertIn(f"Replayed {flagged} flagged chunks", output)
+        self.assertIn(f"Flagged chunks below threshold: 0/{flagged}", output)
+        self.assertIn("chunks from stored files", output)
+        self.assertIn("Suggested MODERATION_RELEVANCE_THRESHOLD=", output)
+    
+    def test_empty_history_is_an_error(self):
+        with self.assertRaises(CommandError):
+            call_command('calibrate_relevance_threshold', stdout=StringIO())
@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections, transaction
+from django.test import SimpleTestCase, TestCase
+from ..models import ModerationResult
+
+class SQLiteConcurrencyTests(SimpleTestCase):
+    """
+    Runs against a database file of its own: the test database lives in
+    memory, where WAL does not apply.
+    """
+    alias = 'sqlite_tuning'
+    # Resolved in setUpClass, after the alias below is defined
+    databases = '__all__'
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp(prefix='moderation-sqlite-')
+        connections.settings[cls.alias] = {
+            **connections.settings['default'],
+            'NAME': os.path.join(cls.directory, 'db.sqlite3'),
+            'TEST': {},
+        }
+        super().setUpClass()
+    
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections.settings.pop(cls.alias)
+        shutil.rmtree(cls.directory, ignore_errors=True)
+    
+    def setUp(self):
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute('CREATE TABLE tally (id INTEGER PRIMARY KEY, value INTEGER)')
+        self.addCleanup(self.drop)
+    
+    def drop(self):
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute('DROP TABLE tally')
+        connections[self.alias].close()
+    
+    def test_connections_use_wal_and_the_busy_timeout(self):
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_BUSY_TIMEOUT_MS)
+    
+    def test_concurrent_read_then_write_transactions_all_commit(self):
+        # A read followed by a write is what deadlocks deferred transactions:
+        # neither reader can upgrade to the write lock while the other holds
+        # a snapshot. IMMEDIATE takes the write lock up front instead.
+        errors = []
+        
+        def writer():
+            try:
+                for _ in range(20):
+                    with transaction.atomic(using=self.alias):
+                        with connections[self.alias].cursor() as cursor:
+                            cursor.execute('SELECT COUNT(*) FROM tally')
+                            count = cursor.fetchone()[0]
+                            # Give the other writers time to read too
+                            time.sleep(0.002)
+                            cursor.execute('INSERT INTO tally (value) VALUES (%s)', [count])
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections[self.alias].close()
+        
+        threads = [threading.Thread(target=writer) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(errors, [])
+        with connections[self.alias].cursor() as cursor:
+            cursor.execute('SELECT COUNT(*), COUNT(DISTINCT value) FROM tally')
+            # Serialized transactions each saw every earlier insert
+            self.assertEqual(cursor.fetchone(), (80, 80))
+
+class CompositeIndexTests(TestCase):
+    
+    def test_history_page_uses_the_user_created_index(self):
+        user = User.objects.create_user(username='alice')
+        plan = ModerationResult.objects.filter(user=user).order_by('-created_at', '-id')[:20].explain()
+        self.assertIn('modresult_user_created_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
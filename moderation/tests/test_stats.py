@@ -0,0 +1,74 @@
+from unittest import mock
+from rest_framework.test import APIClient
+from .. import jobs
+from ..models import ModerationStats
+from ..stats import recompute_stats
+from .helpers import ModerationTestCase
+
+STATS_FIELDS = (
+    'total_results', 'pending_results', 'clean_results', 'violation_results', 'review_results',
+    'error_results', 'total_chunks', 'allowed_chunks', 'review_chunks', 'violation_chunks',
+)
+
+class ModerationStatsTests(ModerationTestCase):
+    
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.build_policy_store()
+    
+    def assertStatsMatchRecompute(self, user):
+        stats = ModerationStats.objects.get(user=user)
+        counted = {field: getattr(stats, field) for field in STATS_FIELDS}
+        recomputed = recompute_stats(user.pk)
+        self.assertEqual(counted, {field: getattr(recomputed, field) for field in STATS_FIELDS})
+    
+    def test_queued_job_counts_its_chunks_once(self):
+        job = jobs.enqueue_moderation_job(self.user, self.upload(pages=4))
+        
+        # Write every progress update so the running estimate is exercised
+        with mock.patch.object(jobs, 'PROGRESS_UPDATE_INTERVAL', 0):
+            self.assertEqual(jobs.run_worker(once=True), 1)
+        
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+        self.assertGreater(job.total_chunks, 0)
+        self.assertEqual(job.progress_total, job.total_chunks)
+        self.assertEqual(ModerationStats.objects.get(user=self.user).total_chunks, job.total_chunks)
+        self.assertStatsMatchRecompute(self.user)
+    
+    def test_counters_follow_results_reviews_and_duplicates(self):
+        response = self.client.post('/api/moderation/moderate/', {'file': self.upload(seed=1)}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertStatsMatchRecompute(self.user)
+        
+        response = self.client.post(
+            f"/api/moderation/history/{response.data['id']}/verdict/", {'final_verdict': 'approved'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertStatsMatchRecompute(self.user)
+        
+        # A byte-identical upload is answered from the first result but still counted
+        response = self.client.post('/api/moderation/moderate/', {'file': self.upload(seed=1)}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(ModerationStats.objects.get(user=self.user).total_results, 2)
+        self.assertStatsMatchRecompute(self.user)
+    
+    def test_failed_job_is_counted_as_error(self):
+        job = jobs.enqueue_moderation_job(self.user, self.upload())
+        with mock.patch.object(jobs, 'moderate_file_against_policy', side_effect=RuntimeError('LLM down')):
+            jobs.run_worker(once=True)
+        
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(ModerationStats.objects.get(user=self.user).error_results, 1)
+        self.assertStatsMatchRecompute(self.user)
+    
+    def test_stats_endpoint_serves_the_counters(self):
+        self.client.post('/api/moderation/moderate/', {'file': self.upload(seed=2)}, format='multipart')
+        response = self.client.get('/api/moderation/stats/')
+        self.assertEqual(response.status_code, 200)
+        stats = ModerationStats.objects.get(user=self.user)
+        self.assertEqual(response.data['total_results'], stats.total_results)
+        self.assertEqual(response.data['total_chunks'], stats.total_chunks)
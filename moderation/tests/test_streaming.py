@@ -0,0 +1,92 @@
+import json
+from rest_framework.test import APIClient
+from ..models import ModerationResult
+from ..modules import moderation_engine
+from ..modules.policy_store import open_policy_store
+from .fixtures import document_pages
+from .helpers import ModerationTestCase
+
+def parse_events(response):
+    events = []
+    for message in b''.join(response.streaming_content).decode().split('\n\n'):
+        if message:
+            name, data = message.split('\n', 1)
+            events.append((name[len('event: '):], json.loads(data[len('data: '):])))
+    return events
+
+class StreamingModerationTests(ModerationTestCase):
+    
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    
+    def stream(self, **data):
+        data.setdefault('file', self.upload(pages=3, seed=4))
+        return self.client.post('/api/moderation/moderate/stream/', data, format='multipart')
+    
+    def test_start_is_sent_before_the_file_is_read(self):
+        self.build_policy_store()
+        path = self.write_pdf('document.pdf', document_pages(3, 200, 4))
+        pages_read = []
+        read_pages = moderation_engine.iter_pdf_chunks
+        
+        def iter_pdf_chunks(*args, **kwargs):
+            for chunk in read_pages(*args, **kwargs):
+                pages_read.append(chunk['metadata'].get('page'))
+                yield chunk
+        
+        self.patch(moderation_engine, 'iter_pdf_chunks', iter_pdf_chunks)
+        with open_policy_store(self.tenant) as store:
+            events = moderation_engine.iter_moderation_events(store, path, 'document.pdf', self.tenant, concurrency=1)
+            try:
+                start = next(events)
+            finally:
+                events.close()
+        self.assertEqual(start, {'type': 'start', 'filename': 'document.pdf', 'total_pages': 3})
+        self.assertEqual(pages_read, [])
+    
+    def test_events_arrive_in_order_and_the_result_is_saved(self):
+        self.build_policy_store()
+        response = self.stream()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        
+        events = parse_events(response)
+        names = [name for name, _ in events]
+        self.assertEqual(names[0], 'start')
+        self.assertEqual(names[-1], 'summary')
+        self.assertEqual(set(names[1:-1]), {'chunk'})
+        self.assertEqual(events[0][1]['total_pages'], 3)
+        
+        summary = events[-1][1]
+        result = ModerationResult.objects.get(pk=summary['id'])
+        self.assertEqual(result.status, 'completed')
+        self.assertEqual(len(names) - 2, result.evaluated_chunks)
+        self.assertEqual(events[-2][1]['done'], events[-2][1]['total'])
+    
+    def test_duplicate_is_answered_with_the_summary_alone(self):
+        self.build_policy_store()
+        first = parse_events(self.stream())[-1][1]
+        events = parse_events(self.stream())
+        self.assertEqual([name for name, _ in events], ['summary'])
+        self.assertEqual(events[0][1]['duplicate_of'], first['id'])
+        
+        forced = parse_events(self.stream(force='true'))
+        self.assertEqual(forced[0][0], 'start')
+        self.assertIsNone(forced[-1][1]['duplicate_of'])
+    
+    def test_empty_policy_store_is_rejected(self):
+        response = self.stream()
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(ModerationResult.objects.exists())
+    
+    def test_disconnect_marks_the_result_failed(self):
+        self.build_policy_store()
+        response = self.stream()
+        self.assertEqual(next(iter(response.streaming_content)).decode().split('\n')[0], 'event: start')
+        response.close()
+        
+        result = ModerationResult.objects.get()
+        self.assertEqual(result.status, 'failed')
+        self.assertIn('disconnected', result.error_message)
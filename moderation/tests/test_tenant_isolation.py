@@ -0,0 +1,51 @@
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from ..modules import policy_store
+from .fixtures import document_pages
+from .helpers import ModerationTestCase
+
+class TenantIsolationTests(ModerationTestCase):
+    
+    def setUp(self):
+        super().setUp()
+        self.other = User.objects.create_user(username='bob', password='secret')
+        self.other_tenant = policy_store.tenant_for_user(self.other)
+        self.build_policy_store(document_key='alice.pdf')
+        self.build_policy_store(tenant=self.other_tenant, seed=5, document_key='bob.pdf')
+    
+    def test_searches_only_see_the_tenants_own_policies(self):
+        embeddings = policy_store.get_embeddings()
+        vectors = embeddings.embed_documents(['customer personal data'])
+        for tenant, document in ((self.tenant, 'alice.pdf'), (self.other_tenant, 'bob.pdf')):
+            with policy_store.open_policy_store(tenant) as store:
+                matches = policy_store.search_by_vectors(store, vectors, 5)[0]
+            self.assertTrue(matches)
+            self.assertEqual({doc.metadata['document'] for doc, _ in matches}, {document})
+    
+    def test_clearing_one_tenant_leaves_the_other_untouched(self):
+        other_version = policy_store.get_policy_store_version(self.other_tenant)
+        policy_store.clear_policy_store(self.tenant)
+        
+        self.assertFalse(policy_store.policy_store_exists(self.tenant))
+        with self.assertRaises(FileNotFoundError):
+            policy_store.acquire_policy_store(self.tenant)
+        self.assertEqual(policy_store.get_policy_store_version(self.other_tenant), other_version)
+        self.assertTrue(policy_store.policy_store_exists(self.other_tenant))
+    
+    def test_verdict_cache_is_not_shared_between_tenants(self):
+        document = self.write_pdf('document.pdf', document_pages(3, 300, 4))
+        self.moderate(document, use_cache=True)
+        self.assertEqual(self.moderate(document, use_cache=True)['cache_misses'], 0)
+        result = self.moderate(document, tenant=self.other_tenant, use_cache=True)
+        self.assertEqual(result['cache_hits'], 0)
+    
+    def test_user_without_policies_cannot_use_another_tenants_store(self):
+        carol = User.objects.create_user(username='carol', password='secret')
+        client = APIClient()
+        client.force_authenticate(carol)
+        response = client.post('/api/moderation/moderate/', {'file': self.upload(seed=4)}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertNotEqual(
+            policy_store.tenant_store_dir(policy_store.tenant_for_user(carol)),
+            policy_store.tenant_store_dir(self.tenant)
+        )
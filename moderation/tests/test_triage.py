@@ -0,0 +1,93 @@
+import os
+from io import StringIO
+import joblib
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from rest_framework.test import APIClient
+from ..models import ModerationResult, ViolationDetail
+from ..modules import moderation_engine, triage
+from .fixtures import document_pages
+from .helpers import ModerationTestCase
+
+class TriageClassifierTests(ModerationTestCase):
+    
+    def setUp(self):
+        super().setUp()
+        model_dir = os.path.join(self.workdir, 'triage')
+        self.patch(triage, 'TRIAGE_MODEL_DIR', model_dir)
+        self.patch(triage, 'CURRENT_POINTER', os.path.join(model_dir, 'CURRENT'))
+        self.classifier = triage.TriageClassifier()
+        self.patch(moderation_engine, 'triage_classifier', self.classifier)
+    
+    def reviewed_result(self, final_verdict: str, texts, verdict: str = 'violation'):
+        result = ModerationResult.objects.create(
+            user=self.user, filename=f'{final_verdict}.pdf', status='completed', final_verdict=final_verdict
+        )
+        ViolationDetail.objects.bulk_create([
+            ViolationDetail(moderation_result=result, chunk_id=f'chunk_{i}', chunk_text=text,
+                            verdict=verdict, explanation='')
+            for i, text in enumerate(texts)
+        ])
+        return result
+    
+    def train(self, **options) -> str:
+        self.reviewed_result('rejected', [f'Wire the refund to account {i} today.' for i in range(12)])
+        self.reviewed_result('approved', [f'Quarterly meeting notes, item {i}.' for i in range(12)], verdict='review')
+        out = StringIO()
+        call_command('train_triage_classifier', min_samples=10, stdout=out, **options)
+        self.assertIn('Collected 12 flagged and 12 compliant chunks', out.getvalue())
+        return triage.current_triage_version()
+    
+    def test_training_saves_and_activates_a_version(self):
+        version = self.train()
+        self.assertTrue(version)
+        model, loaded = self.classifier.get()
+        self.assertIsNotNone(model)
+        self.assertEqual(loaded, version)
+        self.assertEqual(len(self.classifier.ok_probabilities([[0.0] * 64, [1.0] * 64])), 2)
+    
+    def test_too_few_reviewed_chunks_is_an_error(self):
+        self.reviewed_result('rejected', ['Only one flagged chunk.'])
+        with self.assertRaises(CommandError):
+            call_command('train_triage_classifier', stdout=StringIO())
+        self.assertEqual(triage.current_triage_version(), '')
+    
+    def test_model_for_another_embedding_model_is_ignored(self):
+        version = self.train()
+        path = os.path.join(triage.TRIAGE_MODEL_DIR, f'triage-{version}.joblib')
+        bundle = joblib.load(path)
+        bundle['embedding_model'] = 'another-model'
+        joblib.dump(bundle, path)
+        self.assertEqual(triage.TriageClassifier().get(), (None, ''))
+    
+    def test_confident_chunks_skip_the_llm(self):
+        self.build_policy_store()
+        version = self.train()
+        document = self.write_pdf('document.pdf', document_pages(3, 200, 9))
+        
+        self.patch(moderation_engine, 'MODERATION_TRIAGE_OK_THRESHOLD', 0.0)
+        cleared = self.moderate(document, use_triage=True)
+        self.assertEqual(cleared['triaged_chunks'], cleared['total_chunks'])
+        self.assertEqual(cleared['llm_chunks'], 0)
+        self.assertEqual(cleared['triage_model_version'], version)
+        
+        # A probability never exceeds 1, so nothing is cleared
+        self.patch(moderation_engine, 'MODERATION_TRIAGE_OK_THRESHOLD', 1.1)
+        escalated = self.moderate(document, use_triage=True)
+        self.assertEqual(escalated['triaged_chunks'], 0)
+        self.assertEqual(escalated['llm_chunks'], escalated['total_chunks'])
+    
+    def test_triaged_chunk_ids_are_stored_on_the_result(self):
+        self.build_policy_store()
+        self.train()
+        self.patch(moderation_engine, 'MODERATION_TRIAGE_ENABLED', True)
+        self.patch(moderation_engine, 'MODERATION_TRIAGE_OK_THRESHOLD', 0.0)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post('/api/moderation/moderate/', {'file': self.upload(seed=9)}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        
+        result = ModerationResult.objects.get(pk=response.data['id'])
+        self.assertGreater(result.triaged_chunks, 0)
+        self.assertEqual(len(set(result.triaged_chunk_ids)), result.triaged_chunks)
+        self.assertEqual(response.data['triaged_chunk_ids'], result.triaged_chunk_ids)
@@ -0,0 +1,68 @@
+import hashlib
+import os
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import StopFutureHandlers
+from django.test import override_settings
+from rest_framework.test import APIClient
+from ..models import ModerationResult
+from ..uploads import HashingMemoryFileUploadHandler, HashingTemporaryFileUploadHandler, uploaded_file_sha256
+from .helpers import ModerationTestCase
+
+class HashingUploadHandlerTests(ModerationTestCase):
+    
+    def receive(self, handler, data: bytes, chunk_size: int = 7):
+        try:
+            handler.new_file('file', 'document.pdf', 'application/pdf', len(data))
+        except StopFutureHandlers:
+            # The memory handler claims the file for itself
+            pass
+        for start in range(0, len(data), chunk_size):
+            self.assertIsNone(handler.receive_data_chunk(data[start:start + chunk_size], start))
+        return handler.file_complete(len(data))
+    
+    def test_handlers_hash_the_chunks_they_store(self):
+        data = b'%PDF-1.4 example payload ' * 10
+        memory = HashingMemoryFileUploadHandler()
+        memory.activated = True
+        for handler in (memory, HashingTemporaryFileUploadHandler()):
+            with self.subTest(handler=type(handler).__name__):
+                uploaded = self.receive(handler, data)
+                self.assertEqual(uploaded.sha256, hashlib.sha256(data).hexdigest())
+                uploaded.seek(0)
+                self.assertEqual(uploaded.read(), data)
+    
+    def test_files_without_a_digest_are_hashed_and_rewound(self):
+        upload = SimpleUploadedFile('document.pdf', b'payload')
+        self.assertEqual(uploaded_file_sha256(upload), hashlib.sha256(b'payload').hexdigest())
+        self.assertEqual(upload.read(), b'payload')
+
+class SingleWriteUploadTests(ModerationTestCase):
+    
+    def setUp(self):
+        super().setUp()
+        self.build_policy_store()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+    
+    def moderate_upload(self):
+        upload = self.upload(seed=6)
+        data = upload.read()
+        upload.seek(0)
+        response = self.client.post('/api/moderation/moderate/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        return data, ModerationResult.objects.get(pk=response.data['id'])
+    
+    def assert_stored_once(self, data: bytes, result: ModerationResult):
+        self.assertEqual(result.file_sha256, hashlib.sha256(data).hexdigest())
+        self.assertEqual(result.file_size, len(data))
+        stored = os.listdir(os.path.dirname(result.file.path))
+        self.assertEqual(stored, [os.path.basename(result.file.name)])
+        with open(result.file.path, 'rb') as f:
+            self.assertEqual(f.read(), data)
+    
+    def test_small_upload_is_stored_once_with_its_digest(self):
+        self.assert_stored_once(*self.moderate_upload())
+    
+    @override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=1024)
+    def test_upload_spooled_to_disk_is_stored_once_with_its_digest(self):
+        self.assert_stored_once(*self.moderate_upload())
@@ -0,0 +1,110 @@
+from decimal import Decimal
+from unittest import mock
+from django.test import SimpleTestCase
+from langchain_core.messages import AIMessage
+from .. import jobs
+from ..modules import llm
+from ..modules.moderation_engine import LLMUsage
+from .fixtures import document_pages
+from .helpers import ModerationTestCase
+
+class ResponseTokenUsageTests(SimpleTestCase):
+    
+    def test_usage_metadata_is_preferred(self):
+        response = AIMessage(
+            content='OK: fine',
+            usage_metadata={'input_tokens': 120, 'output_tokens': 8, 'total_tokens': 128},
+            response_metadata={'token_usage': {'prompt_tokens': 1, 'completion_tokens': 1}}
+        )
+        self.assertEqual(llm.response_token_usage('prompt', response), (120, 8, False))
+    
+    def test_provider_token_usage_is_read(self):
+        response = AIMessage(
+            content='OK: fine',
+            response_metadata={'token_usage': {'prompt_tokens': 90, 'completion_tokens': 6}}
+        )
+        self.assertEqual(llm.response_token_usage('prompt', response), (90, 6, False))
+    
+    def test_missing_usage_is_estimated(self):
+        prompt = 'word ' * 50
+        response = AIMessage(content='OK: fine')
+        self.assertEqual(
+            llm.response_token_usage(prompt, response),
+            (llm.estimate_tokens(prompt), llm.estimate_tokens('OK: fine'), True)
+        )
+    
+    def test_cost_uses_the_configured_prices(self):
+        with mock.patch.object(llm, 'LLM_PROMPT_COST_PER_MTOK', 0.5), \
+                mock.patch.object(llm, 'LLM_COMPLETION_COST_PER_MTOK', 2.0):
+            self.assertAlmostEqual(llm.estimate_llm_cost(1_000_000, 250_000), 1.0)
+            self.assertEqual(llm.estimate_llm_cost(0, 0), 0)
+
+class LLMUsageTests(SimpleTestCase):
+    
+    def test_summary_adds_up_calls(self):
+        usage = LLMUsage()
+        reported = AIMessage(content='OK', usage_metadata={'input_tokens': 100, 'output_tokens': 10, 'total_tokens': 110})
+        for seconds in (0.1, 0.2, 0.3, 0.4):
+            usage.record('prompt', reported, seconds)
+        summary = usage.summary()
+        
+        self.assertEqual(summary['prompt_tokens'], 400)
+        self.assertEqual(summary['completion_tokens'], 40)
+        self.assertFalse(summary['tokens_estimated'])
+        self.assertEqual(summary['llm_calls'], 4)
+        self.assertAlmostEqual(summary['llm_seconds'], 1.0)
+        self.assertAlmostEqual(summary['llm_latency_p50'], 0.25)
+        self.assertAlmostEqual(summary['llm_latency_p95'], 0.385)
+        self.assertAlmostEqual(summary['llm_latency_p99'], 0.397)
+        self.assertAlmostEqual(summary['llm_cost'], llm.estimate_llm_cost(400, 40))
+        
+        usage.record('prompt', AIMessage(content='OK'), 0.5)
+        self.assertTrue(usage.summary()['tokens_estimated'])
+    
+    def test_no_calls_have_no_percentiles(self):
+        summary = LLMUsage().summary()
+        self.assertEqual(summary['llm_calls'], 0)
+        self.assertIsNone(summary['llm_latency_p50'])
+        self.assertIsNone(summary['llm_latency_p99'])
+        self.assertEqual(summary['llm_cost'], 0)
+
+class StoredUsageTests(ModerationTestCase):
+    
+    def setUp(self):
+        super().setUp()
+        self.patch(llm, 'LLM_PROMPT_COST_PER_MTOK', 0.59)
+        self.patch(llm, 'LLM_COMPLETION_COST_PER_MTOK', 0.79)
+        self.build_policy_store()
+    
+    def test_run_usage_is_stored_on_the_result(self):
+        data = self.moderate(self.write_pdf('document.pdf', document_pages(2, 200, 4)))
+        
+        self.assertEqual(data['llm_calls'], data['evaluated_chunks'])
+        self.assertGreater(data['prompt_tokens'], data['completion_tokens'])
+        self.assertTrue(data['tokens_estimated'])
+        self.assertLessEqual(data['llm_latency_p50'], data['llm_latency_p95'])
+        self.assertLessEqual(data['llm_latency_p95'], data['llm_latency_p99'])
+        self.assertAlmostEqual(
+            data['llm_cost'], llm.estimate_llm_cost(data['prompt_tokens'], data['completion_tokens'])
+        )
+        
+        result = jobs.create_moderation_result(self.user, self.upload())
+        jobs.record_moderation_result(result, data)
+        result.refresh_from_db()
+        self.assertEqual(result.prompt_tokens, data['prompt_tokens'])
+        self.assertEqual(result.completion_tokens, data['completion_tokens'])
+        self.assertTrue(result.tokens_estimated)
+        self.assertEqual(result.llm_calls, data['llm_calls'])
+        self.assertAlmostEqual(result.llm_latency_p95, data['llm_latency_p95'])
+        self.assertEqual(result.llm_cost, Decimal(str(round(data['llm_cost'], 6))))
+    
+    def test_cached_run_costs_nothing(self):
+        path = self.write_pdf('document.pdf', document_pages(2, 200, 4))
+        self.moderate(path, use_cache=True)
+        data = self.moderate(path, use_cache=True)
+        
+        self.assertEqual(data['cache_hits'], data['total_chunks'])
+        self.assertEqual(data['llm_calls'], 0)
+        self.assertEqual(data['prompt_tokens'], 0)
+        self.assertEqual(data['llm_cost'], 0)
+        self.assertIsNone(data['llm_latency_p50'])
@@ -0,0 +1,71 @@
+from datetime import timedelta
+from django.utils import timezone
+from ..models import VerdictCacheEntry
+from ..modules import policy_store, verdict_cache
+from ..modules.verdict_cache import VerdictCache
+from .fixtures import document_pages
+from .helpers import ModerationTestCase
+
+class VerdictCacheTests(ModerationTestCase):
+    
+    def setUp(self):
+        super().setUp()
+        self.patch(verdict_cache, '_last_eviction', {})
+        self.build_policy_store()
+        self.document = self.write_pdf('document.pdf', document_pages(6, 300, 3))
+    
+    def fill(self, cache: VerdictCache, count: int, prefix: str = 'chunk'):
+        cache.set_many({
+            cache.key_for(f'{prefix} {i}'): {'verdict': 'ok', 'explanation': '', 'sources': []}
+            for i in range(count)
+        })
+    
+    def test_verdict_cache_answers_repeats_until_the_policy_changes(self):
+        first = self.moderate(self.document, use_cache=True)
+        self.assertEqual(first['cache_hits'], 0)
+        self.assertGreater(first['llm_calls'], 0)
+        
+        second = self.moderate(self.document, use_cache=True)
+        self.assertEqual(second['cache_hits'], first['evaluated_chunks'])
+        self.assertEqual(second['cache_misses'], 0)
+        self.assertEqual(second['llm_calls'], 0)
+        self.assertEqual(second['violation_chunks'], first['violation_chunks'])
+        self.assertEqual(second['review_chunks'], first['review_chunks'])
+        
+        policy_store.bump_policy_store_version(self.tenant)
+        third = self.moderate(self.document, use_cache=True)
+        self.assertEqual(third['cache_hits'], 0)
+        self.assertEqual(third['cache_misses'], first['evaluated_chunks'])
+    
+    def test_eviction_deletes_a_bounded_batch_per_pass(self):
+        self.patch(verdict_cache, 'CACHE_EVICT_INTERVAL', 3600)
+        self.patch(verdict_cache, 'CACHE_MAX_ENTRIES', 10)
+        self.patch(verdict_cache, 'CACHE_EVICT_BATCH_SIZE', 15)
+        cache = VerdictCache(self.tenant, 'v1', '1', 3)
+        self.fill(cache, 50)
+        
+        # The write's own pass stopped at the batch limit
+        self.assertEqual(VerdictCacheEntry.objects.count(), 35)
+        self.assertEqual(cache.evict(), 15)
+        self.assertEqual(cache.evict(), 10)
+        self.assertEqual(cache.evict(), 0)
+        self.assertEqual(VerdictCacheEntry.objects.count(), 10)
+    
+    def test_unfinished_eviction_continues_on_the_next_write(self):
+        self.patch(verdict_cache, 'CACHE_EVICT_INTERVAL', 3600)
+        self.patch(verdict_cache, 'CACHE_MAX_ENTRIES', 1000)
+        self.patch(verdict_cache, 'CACHE_EVICT_BATCH_SIZE', 5)
+        self.fill(VerdictCache(self.tenant, 'v1', '1', 3), 8)
+        # The interval has passed
+        verdict_cache._last_eviction.clear()
+        
+        current = VerdictCache(self.tenant, 'v2', '1', 3)
+        self.fill(current, 1, prefix='new')
+        self.assertEqual(VerdictCacheEntry.objects.filter(policy_version='v1').count(), 3)
+        self.fill(current, 1, prefix='newer')
+        self.assertFalse(VerdictCacheEntry.objects.filter(policy_version='v1').exists())
+        
+        # Done: the next write waits for the interval again
+        VerdictCacheEntry.objects.update(last_used_at=timezone.now() - timedelta(days=365))
+        self.fill(current, 1, prefix='newest')
+        self.assertEqual(VerdictCacheEntry.objects.count(), 3)
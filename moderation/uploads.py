@@ -0,0 +1,50 @@
+"""
+Upload handlers that hash files while the request body is being received
+"""
+import hashlib
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+class _HashingMixin:
+    """
+    Compute the SHA-256 of an uploaded file from the chunks this handler
+    stores, and attach it to the resulting UploadedFile as `sha256`.
+    """
+    
+    def new_file(self, *args, **kwargs):
+        # Set up first: MemoryFileUploadHandler.new_file raises StopFutureHandlers
+        self.sha256 = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+    
+    def receive_data_chunk(self, raw_data, start):
+        passed_on = super().receive_data_chunk(raw_data, start)
+        if passed_on is None:
+            # This handler stored the chunk
+            self.sha256.update(raw_data)
+        return passed_on
+    
+    def file_complete(self, file_size):
+        uploaded_file = super().file_complete(file_size)
+        if uploaded_file is not None:
+            uploaded_file.sha256 = self.sha256.hexdigest()
+        return uploaded_file
+
+class HashingMemoryFileUploadHandler(_HashingMixin, MemoryFileUploadHandler):
+    pass
+
+class HashingTemporaryFileUploadHandler(_HashingMixin, TemporaryFileUploadHandler):
+    pass
+
+def uploaded_file_sha256(uploaded_file) -> str:
+    """
+    SHA-256 of an uploaded file, reusing the digest computed while it was
+    received when available.
+    """
+    sha256 = getattr(uploaded_file, 'sha256', None)
+    if sha256:
+        return sha256
+    
+    digest = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        digest.update(chunk)
+    uploaded_file.seek(0)
+    return digest.hexdigest()
@@ -5,8 +5,11 @@ from .views import (
     delete_policy_view,
     clear_policies_view,
     moderate_file_view,
+    moderate_file_stream_view,
     moderation_history_view,
+    moderation_stats_view,
     moderation_detail_view,
+    moderation_status_view,
     update_final_verdict_view
 )
 
@@ -19,7 +22,10 @@ urlpatterns = [
     
     # Moderation
     path('moderate/', moderate_file_view, name='moderate_file'),
+    path('moderate/stream/', moderate_file_stream_view, name='moderate_file_stream'),
     path('history/', moderation_history_view, name='moderation_history'),
+    path('stats/', moderation_stats_view, name='moderation_stats'),
     path('history/<int:pk>/', moderation_detail_view, name='moderation_detail'),
+    path('history/<int:pk>/status/', moderation_status_view, name='moderation_status'),
     path('history/<int:pk>/verdict/', update_final_verdict_view, name='update_final_verdict'),
 ]
\ No newline at end of file
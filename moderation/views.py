@@ -1,8 +1,12 @@
 """
 Views for moderation API endpoints
 """
-import os
-import tempfile
+import hmac
+import ipaddress
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
 from pathlib import Path
 from rest_framework import status, generics
 from rest_framework.decorators import api_view, permission_classes, parser_classes
@@ -10,31 +14,104 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import MultiPartParser, FormParser
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from django.views.decorators.http import require_GET
 from .models import PolicyDocument, ModerationResult, ViolationDetail
 from .serializers import (
     PolicyDocumentSerializer,
     ModerationResultSerializer,
     ModerationResultListSerializer,
-    FinalVerdictSerializer
+    ModerationStatusSerializer,
+    FinalVerdictSerializer,
+    ModerationStatsSerializer
 )
+from .pagination import HistoryCursorPagination
+from . import metrics
+from .stats import get_stats, refresh_policy_count, result_stats_snapshot, update_result_stats
 from .modules.policy_store import (
-    build_or_update_policy_store,
-    load_policy_store,
+    acquire_policy_store,
     clear_policy_store,
-    policy_store_exists
+    delete_policy_vectors,
+    policy_store_exists,
+    release_policy_store,
+    tenant_for_user
+)
+from .modules.moderation_engine import moderate_file_against_policy, iter_moderation_events
+from .jobs import (
+    create_moderation_result, record_moderation_result, record_moderation_failure,
+    find_duplicate_result, clone_moderation_result, progress_reporter,
+    enqueue_moderation_job, ingest_policy_documents
 )
-from .modules.moderation_engine import moderate_file_against_policy
 import logging
 
 logger = logging.getLogger('moderation')
 
+METRICS_ALLOWED_NETWORKS = [
+    ipaddress.ip_network(network.strip())
+    for network in settings.METRICS_ALLOWED_NETWORKS.split(',') if network.strip()
+]
+
+def _is_truthy(value) -> bool:
+    """
+    Interpret a form/query flag such as 'true', '1' or 'yes'.
+    """
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'on')
+
+def _sse_message(event: str, data) -> str:
+    """
+    Format one Server-Sent Events message.
+    """
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _parse_date_param(value: str, end_of_day: bool = False) -> datetime:
+    """
+    Parse an ISO date or datetime query parameter into an aware datetime.
+    
+    A bare date means the start of that day, or the start of the next day
+    with end_of_day=True so that the whole day is included.
+    
+    Raises:
+        ValueError: If the value is not a valid date or datetime
+    """
+    day = parse_date(value)
+    if day is not None:
+        if end_of_day:
+            day += timedelta(days=1)
+        parsed = datetime.combine(day, datetime.min.time())
+    else:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise ValueError(f'Invalid date "{value}"')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+def _sse_response(stream) -> StreamingHttpResponse:
+    """
+    Wrap an iterator of SSE messages in an unbuffered streaming response.
+    """
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 @parser_classes([MultiPartParser, FormParser])
 def upload_policy_view(request):
     """
     Upload one or more policy PDFs and store them in the vector database.
+    
+    With async=true the files are queued for a background worker and the
+    response (202) lists them with status 'queued'; list policies to follow
+    their status.
     """
     try:
         files = request.FILES.getlist('files')
@@ -47,9 +124,11 @@ def upload_policy_view(request):
         
         logger.info(f"User {request.user.username} uploading {len(files)} policy files")
         
+        asynchronous = _is_truthy(request.data.get('async', ''))
+        ingest_batch = uuid.uuid4().hex if asynchronous else ''
+        
         # Save files to media directory and create PolicyDocument records
         saved_files = []
-        file_paths = []
         
         for uploaded_file in files:
             # Save file
@@ -57,21 +136,31 @@ def upload_policy_view(request):
                 user=request.user,
                 file=uploaded_file,
                 filename=uploaded_file.name,
-                file_size=uploaded_file.size
+                file_size=uploaded_file.size,
+                status='queued' if asynchronous else 'processing',
+                ingest_batch=ingest_batch
             )
             saved_files.append(policy_doc)
-            file_paths.append(policy_doc.file.path)
             logger.info(f"Saved policy file: {uploaded_file.name}")
+        refresh_policy_count(request.user.pk)
+        
+        if asynchronous:
+            serializer = PolicyDocumentSerializer(saved_files, many=True)
+            return Response({
+                'message': f'{len(files)} policy file(s) queued for processing',
+                'policy_documents': serializer.data
+            }, status=status.HTTP_202_ACCEPTED)
         
-        # Build or update policy store
+        # Build or update policy store; a file named like an existing policy replaces it
         try:
-            policy_store = build_or_update_policy_store(file_paths)
+            ingestion = ingest_policy_documents(request.user, saved_files)
             logger.info("Policy store updated successfully")
         except Exception as e:
             logger.exception("Error building policy store")
             # Delete the saved files if vector store creation fails
             for policy_doc in saved_files:
                 policy_doc.delete()
+            refresh_policy_count(request.user.pk)
             return Response(
                 {'error': f'Error building policy store: {str(e)}'},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -82,7 +171,13 @@ def upload_policy_view(request):
         return Response({
             'message': f'{len(files)} policy file(s) uploaded and processed successfully',
             'policy_documents': serializer.data,
-            'policy_store_path': str(settings.POLICY_STORE_DIR)
+            'ingestion': {
+                'new_chunks': ingestion['new_chunks'],
+                'unchanged_chunks': ingestion['unchanged_chunks'],
+                'removed_chunks': ingestion['removed_chunks'],
+                'unchanged_documents': ingestion['unchanged_documents']
+            },
+            'policy_store_path': str(settings.POLICY_STORE_DIR / tenant_for_user(request.user))
         }, status=status.HTTP_201_CREATED)
         
     except Exception as e:
@@ -105,7 +200,7 @@ def list_policies_view(request):
         return Response({
             'count': policies.count(),
             'policies': serializer.data,
-            'policy_store_exists': policy_store_exists()
+            'policy_store_exists': policy_store_exists(tenant_for_user(request.user))
         }, status=status.HTTP_200_OK)
         
     except Exception as e:
@@ -119,20 +214,21 @@ def list_policies_view(request):
 @permission_classes([IsAuthenticated])
 def delete_policy_view(request, pk):
     """
-    Delete a specific policy document.
-    Note: This does not remove the policy from the vector store.
-    Use clear_policies_view to reset the entire policy store.
+    Delete a specific policy document and its chunks from the vector store.
     """
     try:
         policy = PolicyDocument.objects.get(pk=pk, user=request.user)
         filename = policy.filename
+        removed = delete_policy_vectors(tenant_for_user(request.user), policy.vector_ids)
         policy.delete()
+        refresh_policy_count(request.user.pk)
         
-        logger.info(f"User {request.user.username} deleted policy: {filename}")
+        logger.info(f"User {request.user.username} deleted policy: {filename} "
+                   f"({removed} vectors removed)")
         
         return Response({
             'message': f'Policy "{filename}" deleted successfully',
-            'note': 'To fully reset the policy store, use the clear-policies endpoint'
+            'removed_chunks': removed
         }, status=status.HTTP_200_OK)
         
     except PolicyDocument.DoesNotExist:
@@ -151,16 +247,17 @@ def delete_policy_view(request, pk):
 @permission_classes([IsAuthenticated])
 def clear_policies_view(request):
     """
-    Clear all policy documents and reset the vector store.
+    Clear all of the user's policy documents and reset their vector store.
     """
     try:
         # Delete all policy documents for the user
         user_policies = PolicyDocument.objects.filter(user=request.user)
         count = user_policies.count()
         user_policies.delete()
+        refresh_policy_count(request.user.pk)
         
-        # Clear the policy store (affects all users)
-        clear_policy_store()
+        # Clear the user's policy store; other users' stores are untouched
+        clear_policy_store(tenant_for_user(request.user))
         
         logger.info(f"User {request.user.username} cleared {count} policies and reset policy store")
         
@@ -181,6 +278,12 @@ def clear_policies_view(request):
 def moderate_file_view(request):
     """
     Moderate a single file against the stored policies.
+    
+    With async=true the file is queued for a background worker and the
+    response (202) carries the job id; poll history/<id>/status/ for progress.
+    With mode=fail_fast moderation stops at the first confirmed violation.
+    A byte-identical file already moderated against the current policy store
+    is answered straight away from the earlier result; force=true re-runs it.
     """
     try:
         # Check if file is provided
@@ -191,76 +294,253 @@ def moderate_file_view(request):
             )
         
         uploaded_file = request.FILES['file']
+        mode = request.data.get('mode', 'full')
+        if mode not in dict(ModerationResult.MODE_CHOICES):
+            return Response(
+                {'error': f'Invalid mode "{mode}". Use "full" or "fail_fast".'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         logger.info(f"User {request.user.username} moderating file: {uploaded_file.name}")
         
         # Check if policy store exists
-        if not policy_store_exists():
+        if not policy_store_exists(tenant_for_user(request.user)):
             return Response(
                 {'error': 'Policy store is empty. Please upload policy documents first.'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        if not _is_truthy(request.data.get('force', '')):
+            duplicate = find_duplicate_result(request.user, uploaded_file, mode=mode)
+            if duplicate is not None:
+                moderation_result = clone_moderation_result(duplicate, uploaded_file)
+                serializer = ModerationResultSerializer(moderation_result, context={'request': request})
+                return Response(serializer.data, status=status.HTTP_200_OK)
+        
+        if _is_truthy(request.data.get('async', '')):
+            job = enqueue_moderation_job(request.user, uploaded_file, mode=mode)
+            return Response({
+                'id': job.id,
+                'status': job.status,
+                'status_url': request.build_absolute_uri(
+                    reverse('moderation_status', args=[job.id])
+                )
+            }, status=status.HTTP_202_ACCEPTED)
+        
         # Load policy store
+        tenant = tenant_for_user(request.user)
         try:
-            policy_store = load_policy_store()
+            policy_store = acquire_policy_store(tenant)
         except FileNotFoundError as e:
             return Response(
                 {'error': str(e)},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-            for chunk in uploaded_file.chunks():
-                temp_file.write(chunk)
-            temp_file_path = temp_file.name
+        try:
+            # Store the upload once and moderate it from storage
+            moderation_result = create_moderation_result(request.user, uploaded_file, mode=mode)
+            started = time.perf_counter()
+            
+            try:
+                moderation_result_data = moderate_file_against_policy(
+                    policy_store,
+                    moderation_result.file.path,
+                    uploaded_file.name,
+                    tenant,
+                    k=3,
+                    fail_fast=mode == 'fail_fast',
+                    # Keeps the heartbeat fresh so workers don't requeue the result
+                    progress_callback=progress_reporter(moderation_result)
+                )
+            except Exception as e:
+                record_moderation_failure(moderation_result, e)
+                raise
+        finally:
+            release_policy_store(tenant, policy_store)
+        
+        # Record verdict and ViolationDetail records
+        record_moderation_result(moderation_result, moderation_result_data)
+        metrics.observe_file('sync', started)
+        
+        logger.info(f"Moderation complete for {uploaded_file.name}: "
+                   f"verdict={moderation_result.verdict}")
+        
+        # Serialize and return result
+        serializer = ModerationResultSerializer(moderation_result, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_200_OK)
         
+    except Exception as e:
+        logger.exception("Error in moderate_file_view")
+        return Response(
+            {'error': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@parser_classes([MultiPartParser, FormParser])
+def moderate_file_stream_view(request):
+    """
+    Moderate a single file and stream verdicts as Server-Sent Events.
+    
+    Emits a 'start' event with the page count (total_pages) before the file
+    is read, a 'chunk' event as each chunk gets its verdict, then a
+    'summary' event with the saved moderation result (including its id). Failures after the stream has
+    started are reported as an 'error' event. Duplicate submissions are
+    answered with the 'summary' event alone unless force=true.
+    """
+    try:
+        if 'file' not in request.FILES:
+            return Response(
+                {'error': 'No file provided'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        uploaded_file = request.FILES['file']
+        mode = request.data.get('mode', 'full')
+        if mode not in dict(ModerationResult.MODE_CHOICES):
+            return Response(
+                {'error': f'Invalid mode "{mode}". Use "full" or "fail_fast".'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        logger.info(f"User {request.user.username} streaming moderation of: {uploaded_file.name}")
+        
+        if not _is_truthy(request.data.get('force', '')):
+            duplicate = find_duplicate_result(request.user, uploaded_file, mode=mode)
+            if duplicate is not None:
+                moderation_result = clone_moderation_result(duplicate, uploaded_file)
+                serializer = ModerationResultSerializer(moderation_result, context={'request': request})
+                return _sse_response(iter([_sse_message('summary', serializer.data)]))
+        
+        tenant = tenant_for_user(request.user)
+        if not policy_store_exists(tenant):
+            return Response(
+                {'error': "Policy store is empty. Upload policy PDFs first."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Store the upload once and moderate it from storage
+        moderation_result = create_moderation_result(request.user, uploaded_file, mode=mode)
+        
+    except Exception as e:
+        logger.exception("Error in moderate_file_stream_view")
+        return Response(
+            {'error': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+    
+    def event_stream():
+        started = time.perf_counter()
+        policy_store = events = None
+        finished = False
+        # Keeps the heartbeat fresh so workers don't requeue the result
+        report_progress = progress_reporter(moderation_result)
         try:
-            # Run moderation
-            moderation_result_data = moderate_file_against_policy(
+            # Held only while the stream runs, so a response that is never
+            # iterated does not pin the store
+            policy_store = acquire_policy_store(tenant)
+            events = iter_moderation_events(
                 policy_store,
-                temp_file_path,
+                moderation_result.file.path,
                 uploaded_file.name,
-                k=3
+                tenant,
+                k=3,
+                fail_fast=mode == 'fail_fast'
             )
-            
-            # Create ModerationResult record
-            moderation_result = ModerationResult.objects.create(
-                user=request.user,
-                file=uploaded_file,
-                filename=uploaded_file.name,
-                verdict=moderation_result_data['verdict'],
-                total_chunks=moderation_result_data['total_chunks'],
-                allowed_chunks=moderation_result_data['allowed_chunks'],
-                review_chunks=moderation_result_data['review_chunks'],
-                violation_chunks=moderation_result_data['violation_chunks']
+            for event in events:
+                if event['type'] != 'summary':
+                    if event['type'] == 'chunk':
+                        report_progress(event['done'], event['total'])
+                    yield _sse_message(event['type'], event)
+                    continue
+                
+                record_moderation_result(moderation_result, event['result'])
+                metrics.observe_file('stream', started)
+                finished = True
+                logger.info(f"Moderation complete for {uploaded_file.name}: "
+                           f"verdict={moderation_result.verdict}")
+                
+                serializer = ModerationResultSerializer(moderation_result, context={'request': request})
+                yield _sse_message('summary', serializer.data)
+        except Exception as e:
+            logger.exception("Error streaming moderation")
+            record_moderation_failure(moderation_result, e)
+            finished = True
+            yield _sse_message('error', {'error': str(e)})
+        finally:
+            # Also runs when the client disconnects, which cancels pending LLM calls
+            if events is not None:
+                events.close()
+            if policy_store is not None:
+                release_policy_store(tenant, policy_store)
+            if not finished:
+                record_moderation_failure(moderation_result, 'Client disconnected before moderation finished')
+    
+    return _sse_response(event_stream())
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def moderation_history_view(request):
+    """
+    Get moderation history for the current user, newest first.
+    
+    Results are cursor-paginated: follow the 'next' URL for the following
+    page. Optional filters: verdict, final_verdict, created_after and
+    created_before (ISO date or datetime), and page_size.
+    """
+    try:
+        violation_counts = (
+            ViolationDetail.objects
+            .filter(moderation_result=OuterRef('pk'))
+            .order_by()
+            .values('moderation_result')
+            .annotate(count=Count('id'))
+            .values('count')
+        )
+        results = (
+            ModerationResult.objects
+            .filter(user=request.user)
+            .select_related('user')
+            .only(
+                'id', 'user__username', 'filename', 'verdict', 'final_verdict', 'status',
+                'total_chunks', 'allowed_chunks', 'review_chunks', 'violation_chunks',
+                'created_at', 'reviewed_at'
             )
+            .annotate(violation_count=Coalesce(Subquery(violation_counts), 0))
+        )
+        
+        params = request.query_params
+        try:
+            for field, choices in (
+                ('verdict', ModerationResult.VERDICT_CHOICES),
+                ('final_verdict', ModerationResult.FINAL_VERDICT_CHOICES),
+            ):
+                value = params.get(field)
+                if value:
+                    if value not in dict(choices):
+                        raise ValueError(f'Invalid {field} "{value}"')
+                    results = results.filter(**{field: value})
             
-            # Create ViolationDetail records
-            for violation in moderation_result_data['violations']:
-                ViolationDetail.objects.create(
-                    moderation_result=moderation_result,
-                    chunk_id=violation['chunk_id'],
-                    chunk_text=violation['chunk_text'],
-                    verdict=violation['verdict'],
-                    explanation=violation['explanation'],
-                    sources=violation['sources']
+            if params.get('created_after'):
+                results = results.filter(created_at__gte=_parse_date_param(params['created_after']))
+            if params.get('created_before'):
+                results = results.filter(
+                    created_at__lt=_parse_date_param(params['created_before'], end_of_day=True)
                 )
             
-            logger.info(f"Moderation complete for {uploaded_file.name}: "
-                       f"verdict={moderation_result.verdict}")
-            
-            # Serialize and return result
-            serializer = ModerationResultSerializer(moderation_result, context={'request': request})
-            return Response(serializer.data, status=status.HTTP_200_OK)
-            
-        finally:
-            # Clean up temporary file
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
+            paginator = HistoryCursorPagination()
+            page = paginator.paginate_queryset(results, request)
+        except ValueError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        serializer = ModerationResultListSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
         
     except Exception as e:
-        logger.exception("Error in moderate_file_view")
+        logger.exception("Error in moderation_history_view")
         return Response(
             {'error': str(e)},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -268,21 +548,19 @@ def moderate_file_view(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
-def moderation_history_view(request):
+def moderation_stats_view(request):
     """
-    Get moderation history for the current user.
+    Get the dashboard totals for the current user.
+    
+    Served from counters that are updated whenever a result is saved or
+    reviewed, so the cost does not grow with the size of the history.
     """
     try:
-        results = ModerationResult.objects.filter(user=request.user)
-        serializer = ModerationResultListSerializer(results, many=True)
-        
-        return Response({
-            'count': results.count(),
-            'results': serializer.data
-        }, status=status.HTTP_200_OK)
+        serializer = ModerationStatsSerializer(get_stats(request.user))
+        return Response(serializer.data, status=status.HTTP_200_OK)
         
     except Exception as e:
-        logger.exception("Error in moderation_history_view")
+        logger.exception("Error in moderation_stats_view")
         return Response(
             {'error': str(e)},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
@@ -312,6 +590,30 @@ def moderation_detail_view(request, pk):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def moderation_status_view(request, pk):
+    """
+    Get the processing status and progress of a moderation job.
+    """
+    try:
+        result = ModerationResult.objects.get(pk=pk, user=request.user)
+        serializer = ModerationStatusSerializer(result)
+        
+        return Response(serializer.data, status=status.HTTP_200_OK)
+        
+    except ModerationResult.DoesNotExist:
+        return Response(
+            {'error': 'Moderation result not found'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    except Exception as e:
+        logger.exception("Error in moderation_status_view")
+        return Response(
+            {'error': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def update_final_verdict_view(request, pk):
@@ -327,7 +629,10 @@ def update_final_verdict_view(request, pk):
         final_verdict = serializer.validated_data['final_verdict']
         result.final_verdict = final_verdict
         result.reviewed_at = timezone.now()
-        result.save()
+        with transaction.atomic():
+            before = result_stats_snapshot(result)
+            result.save()
+            update_result_stats(result, before)
         
         logger.info(f"User {request.user.username} set final verdict to {final_verdict} "
                    f"for moderation {pk}")
@@ -347,4 +652,37 @@ def update_final_verdict_view(request, pk):
         return Response(
             {'error': str(e)},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
\ No newline at end of file
+        )
+
+def _is_internal_request(request) -> bool:
+    """
+    Whether a request comes straight from an address in METRICS_ALLOWED_NETWORKS.
+    
+    Requests relayed by a proxy are refused: the proxy's own address says
+    nothing about the client behind it.
+    """
+    if any(header in request.headers for header in ('Forwarded', 'X-Forwarded-For', 'X-Real-IP')):
+        return False
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in network for network in METRICS_ALLOWED_NETWORKS)
+
+@require_GET
+def metrics_view(request):
+    """
+    Expose the moderation metrics in the Prometheus text format.
+    
+    A plain Django view so scrapers need no JWT. With METRICS_AUTH_TOKEN set,
+    'Authorization: Bearer <token>' is required; without it, only direct
+    requests from METRICS_ALLOWED_NETWORKS are served.
+    """
+    token = settings.METRICS_AUTH_TOKEN
+    if token:
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+            return HttpResponse('Unauthorized\n', status=401, content_type='text/plain')
+    elif not _is_internal_request(request):
+        return HttpResponse('Forbidden\n', status=403, content_type='text/plain')
+    
+    return HttpResponse(metrics.render_metrics(), content_type=metrics.CONTENT_TYPE)